@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+依伺服器回應調整爬取的並行數（AIMD）
+- 回應正常：每完成目前並行數個請求，並行數加 1（additive increase）
+- 回應變慢（超過基準延遲的 slow_factor 倍）或錯誤：並行數乘以 decrease_factor（multiplicative decrease），
+  同一批進行中的請求只會減一次，避免一次慢回應連續砍半
+- 基準延遲為近期最快回應的估計，伺服器閒置時快速加大並行數，尖峰時自動退回
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class AIMDController:
+    """可調整上限的並行數控制器，搭配 slot() 使用"""
+
+    def __init__(self, initial: int = 2, min_limit: int = 1, max_limit: int = 8,
+                 slow_factor: float = 2.0, min_slow_ms: float = 200.0, decrease_factor: float = 0.5,
+                 alpha: float = 0.2):
+        """
+        :param slow_factor: 延遲超過基準的幾倍視為變慢
+        :param min_slow_ms: 低於這個延遲一律不視為變慢（避免基準極小時過度敏感）
+        :param alpha: 延遲 EWMA 的權重
+        """
+        self.min_limit = max(min_limit, 1)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.slow_factor = slow_factor
+        self.min_slow_ms = min_slow_ms
+        self.decrease_factor = decrease_factor
+        self.alpha = alpha
+
+        self.in_flight = 0
+        self.ewma_ms: Optional[float] = None
+        self.baseline_ms: Optional[float] = None
+        self.increases = 0
+        self.decreases = 0
+        self.peak_limit = int(self.limit)
+        self._successes = 0
+        self._issued = 0           # 已發出的請求序號
+        self._last_decrease_at = 0  # 上次減少時已發出的請求序號
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """取得一個並行名額（超過目前上限時等待）"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            self._issued += 1
+            issued_at = self._issued
+        try:
+            yield issued_at
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def record(self, latency_ms: float, ok: bool = True, issued_at: Optional[int] = None):
+        """
+        記錄一次請求的結果並調整並行數
+        :param issued_at: slot() 產生的序號；在上次減少之前就已發出的請求不再觸發減少
+        """
+        with self._cond:
+            slow = False
+            if ok:
+                self.ewma_ms = latency_ms if self.ewma_ms is None else (
+                    self.alpha * latency_ms + (1 - self.alpha) * self.ewma_ms)
+                if self.baseline_ms is None or latency_ms < self.baseline_ms:
+                    self.baseline_ms = latency_ms
+                slow = latency_ms > max(self.baseline_ms * self.slow_factor, self.min_slow_ms)
+                # 基準延遲：遇到更快的回應立即下修；正常回應與已降到最低並行數時的慢回應
+                # （伺服器本身變慢，與並行數無關）讓基準緩慢上修
+                if not slow or self.limit <= self.min_limit:
+                    self.baseline_ms += 0.01 * (latency_ms - self.baseline_ms)
+
+            if not ok or slow:
+                if issued_at is None or issued_at > self._last_decrease_at:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.decreases += 1
+                    self._last_decrease_at = self._issued
+                    self._successes = 0
+                return
+
+            self._successes += 1
+            if self._successes >= int(self.limit) and self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1)
+                self.increases += 1
+                self.peak_limit = max(self.peak_limit, int(self.limit))
+                self._successes = 0
+                self._cond.notify_all()
+
+    def snapshot(self) -> Dict:
+        """目前狀態（寫入爬取摘要）"""
+        with self._cond:
+            return {
+                'limit': int(self.limit),
+                'peak_limit': self.peak_limit,
+                'in_flight': self.in_flight,
+                'ewma_ms': round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+                'baseline_ms': round(self.baseline_ms, 1) if self.baseline_ms is not None else None,
+                'increases': self.increases,
+                'decreases': self.decreases,
+            }
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+社團資料的唯讀 JSON API（供其他校內工具查詢）
+
+端點（僅 GET / HEAD）:
+    /api/health                                          資料版本號
+    /api/semesters                                       所有學期
+    /api/semesters/<semester_id>/clubs                   某學期的社團（含人數）
+    /api/semesters/<semester_id>/clubs/<社團編號>/roster  某社團的學生名單
+    /api/search?name=姓名[&semester_id=&grade_year=&class_num=&after=&limit=]
+                                                         搜尋學生（keyset 分頁，以 next_cursor 接續）
+
+- 固定數量的工作執行緒處理請求，每個執行緒重複使用自己的查詢連線（ClubDatabase 的執行緒連線）
+- 回應依資料版本號快取：資料沒有更新前，相同的請求直接回傳已序列化的 JSON
+- 回應附 ETag，用戶端帶 If-None-Match 且內容未變時回傳 304
+
+使用方式:
+    python3 api_server.py [--host 127.0.0.1] [--port 8080] [--db club_data.db] [--workers 8]
+                          [--snapshots 快照目錄]   # 由唯讀快照查詢（見 snapshots.py）
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, parse_qsl, unquote, urlsplit
+
+from club_database import ClubDatabase, CursorError
+from instrumentation import recorder
+from snapshots import SnapshotDatabase
+
+
+DEFAULT_WORKERS = 8
+DEFAULT_CACHE_ENTRIES = 1024
+MAX_PAGE_SIZE = 200
+
+
+class BadRequest(ValueError):
+    """請求參數錯誤（回傳 400）"""
+
+
+def _int_param(params: Dict, name: str, default: Optional[int] = None) -> Optional[int]:
+    values = params.get(name)
+    if not values or values[0] == '':
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise BadRequest(f"{name} 必須是整數")
+
+
+def _records(rows) -> list:
+    return [row.to_dict() for row in rows]
+
+
+def health(db, params):
+    return {'status': 'ok', 'generation': db.get_data_generation()}
+
+
+def semesters(db, params):
+    return _records(db.get_all_semesters())
+
+
+def clubs(db, params, semester_id):
+    return _records(db.get_clubs(int(semester_id)))
+
+
+def roster(db, params, semester_id, club_number):
+    return _records(db.get_club_roster(int(semester_id), unquote(club_number)))
+
+
+def search(db, params):
+    name = (params.get('name') or [''])[0].strip()
+    if not name:
+        raise BadRequest("缺少 name 參數")
+
+    limit = _int_param(params, 'limit', 50)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise BadRequest(f"limit 必須介於 1 到 {MAX_PAGE_SIZE}")
+
+    semester_id = _int_param(params, 'semester_id')
+    grade_year = _int_param(params, 'grade_year')
+    class_num = _int_param(params, 'class_num')
+    after = (params.get('after') or [None])[0]
+
+    try:
+        page = db.search_student_page(name, semester_id, grade_year=grade_year, class_num=class_num,
+                                      after=after, limit=limit)
+    except CursorError:
+        raise BadRequest("after 不是有效的游標")
+
+    return {'items': _records(page.items), 'next_cursor': page.next_cursor}
+
+
+# (路徑, 處理函式)；路徑中的群組依序傳給處理函式
+ROUTES = [
+    (re.compile(r'^/api/health$'), health),
+    (re.compile(r'^/api/semesters$'), semesters),
+    (re.compile(r'^/api/semesters/(\d+)/clubs$'), clubs),
+    (re.compile(r'^/api/semesters/(\d+)/clubs/([^/]+)/roster$'), roster),
+    (re.compile(r'^/api/search$'), search),
+]
+
+
+def route(path: str):
+    """找出路徑對應的處理函式與參數，沒有時回傳 (None, None)"""
+    for pattern, handler in ROUTES:
+        match = pattern.match(path)
+        if match:
+            return handler, match.groups()
+    return None, None
+
+
+class ResponseCache:
+    """
+    已序列化回應的 LRU 快取
+    每筆記錄產生時的資料版本號，版本號改變（資料更新）後視為過期
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generation: int) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != generation:
+                return None
+            self._entries.move_to_end(key)
+            return cached[1]
+
+    def put(self, key, generation: int, entry: Tuple[bytes, str]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:20] + '"'
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    """唯讀 JSON API 的請求處理"""
+
+    protocol_version = 'HTTP/1.1'  # 保持連線，用戶端可重複使用同一條連線
+    server_version = 'JkesClubAPI/1.0'
+    timeout = 5  # 閒置的保持連線在這段時間後關閉，釋出工作執行緒
+    # 標頭與內容分兩次寫出，開著 Nagle 時第二次寫出要等用戶端的延遲 ACK（約 40ms）
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def _method_not_allowed(self):
+        self._send(405, self._json({'error': '唯讀 API，僅支援 GET'}), extra={'Allow': 'GET, HEAD'})
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = _method_not_allowed
+
+    @staticmethod
+    def _json(payload) -> bytes:
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def _handle(self, send_body: bool):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        handler, args = route(url.path)
+        name = handler.__name__ if handler else 'not_found'
+
+        if handler is None:
+            self._send(404, self._json({'error': f"沒有這個端點：{url.path}"}), send_body=send_body)
+        else:
+            db = self.server.db
+            cache = self.server.cache
+            generation = db.get_data_generation()
+            key = (url.path, tuple(sorted(parse_qsl(url.query))))
+
+            entry = cache.get(key, generation)
+            recorder.count('api.cache_hit' if entry is not None else 'api.cache_miss')
+            if entry is None:
+                body = None
+                try:
+                    body = self._json(handler(db, parse_qs(url.query), *args))
+                except BadRequest as e:
+                    self._send(400, self._json({'error': str(e)}), send_body=send_body)
+                except Exception as e:
+                    print(f"⚠️ API {url.path} 錯誤: {e}")
+                    self._send(500, self._json({'error': '查詢失敗'}), send_body=send_body)
+                if body is not None:
+                    entry = (body, make_etag(body))
+                    cache.put(key, generation, entry)
+
+            if entry is not None:
+                body, etag = entry
+                headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+                if etag in (self.headers.get('If-None-Match') or ''):
+                    self._send(304, b'', extra=headers, send_body=False)
+                else:
+                    self._send(200, body, extra=headers, send_body=send_body)
+
+        recorder.observe(f"api.{name}", (time.perf_counter() - start) * 1000)
+
+    def _send(self, status: int, body: bytes, extra: Optional[Dict] = None, send_body: bool = True):
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+        for header, value in (extra or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        if send_body and status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 大量請求時逐筆輸出會拖慢服務，需要時以 --verbose 開啟
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class APIServer(ThreadingHTTPServer):
+    """以固定數量的工作執行緒處理請求（每個執行緒重複使用自己的查詢連線）"""
+
+    def __init__(self, address, db: ClubDatabase, workers: int = DEFAULT_WORKERS,
+                 cache_entries: int = DEFAULT_CACHE_ENTRIES, verbose: bool = False):
+        super().__init__(address, APIRequestHandler)
+        self.db = db
+        self.cache = ResponseCache(cache_entries)
+        self.verbose = verbose
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="社團資料唯讀 JSON API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--db', default='club_data.db')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--cache-entries', type=int, default=DEFAULT_CACHE_ENTRIES,
+                        help="回應快取筆數（0 表示不快取）")
+    parser.add_argument('--snapshots', default=None, help="快照目錄（由唯讀快照查詢）")
+    parser.add_argument('--verbose', action='store_true', help="輸出每個請求")
+    args = parser.parse_args()
+
+    db = SnapshotDatabase(args.db, args.snapshots) if args.snapshots else ClubDatabase(args.db)
+    server = APIServer((args.host, args.port), db, workers=args.workers,
+                       cache_entries=args.cache_entries, verbose=args.verbose)
+    print(f"✓ API 服務啟動：http://{args.host}:{server.server_address[1]}/api/semesters"
+          f"（{args.workers} 個工作執行緒）", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nAPI 服務已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+唯讀 JSON API 的吞吐量量測
+以模擬資料庫在另一個程序啟動 api_server.py，多個用戶端執行緒以保持連線重複送出
+搜尋、社團列表、社團名單與學期列表的混合請求，比較不快取、依資料版本快取、以及帶 ETag 時的每秒請求數與延遲
+使用方式: python3 bench_api.py [--semesters 8] [--clubs 50] [--students 20] [--clients 8] [--seconds 5]
+"""
+
+import argparse
+import http.client
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+from bench_utils import build_legacy_database
+from club_database import ClubDatabase
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path: str, port: int, workers: int, cache_entries: int) -> subprocess.Popen:
+    """在另一個程序啟動 API 服務並等待可以連線"""
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.py'),
+         '--db', db_path, '--port', str(port), '--workers', str(workers),
+         '--cache-entries', str(cache_entries)],
+        stdout=subprocess.DEVNULL)
+
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            conn.getresponse().read()
+            conn.close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+
+    server.kill()
+    raise RuntimeError("API 服務無法啟動")
+
+
+def make_paths(db: ClubDatabase, names: list, count: int = 500, seed: int = 7) -> list:
+    """混合請求：搜尋 60%、社團名單 25%、社團列表 10%、學期列表 5%"""
+    rng = random.Random(seed)
+    semesters = [semester.id for semester in db.get_all_semesters()]
+    clubs = {semester_id: [club.club_number for club in db.get_clubs(semester_id)]
+             for semester_id in semesters}
+
+    paths = []
+    for _ in range(count):
+        roll = rng.random()
+        semester_id = rng.choice(semesters)
+        if roll < 0.6:
+            paths.append(f"/api/search?name={quote(rng.choice(names))}")
+        elif roll < 0.85:
+            club_number = quote(rng.choice(clubs[semester_id]))
+            paths.append(f"/api/semesters/{semester_id}/clubs/{club_number}/roster")
+        elif roll < 0.95:
+            paths.append(f"/api/semesters/{semester_id}/clubs")
+        else:
+            paths.append("/api/semesters")
+    return paths
+
+
+def run_load(port: int, paths: list, clients: int, seconds: float, use_etag: bool) -> dict:
+    """多個用戶端執行緒持續送出請求，回傳每秒請求數、延遲百分位數與各狀態碼次數"""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        rng = random.Random(index)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        etags = {}
+        local_latencies = []
+        local_statuses = {}
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths)
+            headers = {'If-None-Match': etags[path]} if use_etag and path in etags else {}
+            start = time.perf_counter()
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            local_latencies.append((time.perf_counter() - start) * 1000)
+            local_statuses[response.status] = local_statuses.get(response.status, 0) + 1
+            if response.getheader('ETag'):
+                etags[path] = response.getheader('ETag')
+        conn.close()
+
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+        'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="唯讀 JSON API 吞吐量量測")
+    parser.add_argument('--semesters', type=int, default=8)
+    parser.add_argument('--clubs', type=int, default=50)
+    parser.add_argument('--students', type=int, default=20, help="每個社團的學生數")
+    parser.add_argument('--clients', type=int, default=8, help="同時連線的用戶端數")
+    parser.add_argument('--workers', type=int, default=8, help="服務的工作執行緒數")
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='club_bench_')
+    try:
+        db_path = os.path.join(workdir, 'club.db')
+        info = build_legacy_database(db_path, args.semesters, args.clubs, args.students)
+        db = ClubDatabase(db_path)  # 套用 migration、建立搜尋表
+        paths = make_paths(db, info['sample_names'])
+
+        print(f"模擬資料：{info['semesters']} 學期、{info['clubs']} 個社團、{info['students']} 筆學生；"
+              f"{args.clients} 個用戶端、{args.workers} 個工作執行緒、每項 {args.seconds:g} 秒")
+        print("=" * 78)
+        print(f"{'情境':16s}{'請求數':>10s}{'每秒請求':>12s}{'p50(ms)':>10s}{'p99(ms)':>10s}  狀態碼")
+
+        cases = [
+            ('不快取', 0, False),
+            ('依資料版本快取', 1024, False),
+            ('快取 + ETag', 1024, True),
+        ]
+        for label, cache_entries, use_etag in cases:
+            port = free_port()
+            server = start_server(db_path, port, args.workers, cache_entries)
+            try:
+                run_load(port, paths, args.clients, 0.5, use_etag)  # 暖機
+                result = run_load(port, paths, args.clients, args.seconds, use_etag)
+            finally:
+                server.terminate()
+                server.wait()
+
+            statuses = ', '.join(f"{status}×{count}" for status, count in sorted(result['statuses'].items()))
+            print(f"{label:14s}{result['requests']:>10d}{result['rps']:>14.0f}"
+                  f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}  {statuses}")
+        print("=" * 78)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
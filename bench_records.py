@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+查詢結果型別的記憶體與配置量測
+比較每列一個 dict（舊版）與 records.py 的 NamedTuple，
+量測單一學期、所有學期的結果集以及爬蟲解析一頁名單時的記憶體用量與配置次數
+使用方式: python3 bench_records.py [--semesters 8] [--clubs 50] [--students 20]
+"""
+
+import argparse
+import gc
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+from bench_utils import build_legacy_database, time_call
+from club_crawler import parse_class_page
+from club_database import ClubDatabase
+from records import RosterEntry, RosterRow, SearchResult
+
+
+# 與 search_student 相同的欄位，不加姓名條件以取得所有學期的所有學生
+ALL_SEMESTERS_SQL = '''
+    SELECT s.semester, c.class_id, c.club_number, c.club_name,
+           st.student_id, st.student_name, st.grade, st.seat_number
+    FROM students st
+    JOIN clubs c ON st.club_id = c.id
+    JOIN semesters s ON c.semester_id = s.id
+    ORDER BY s.semester DESC, c.class_id
+'''
+
+# 與 get_grade_roster 相同的欄位（單一學期）
+SEMESTER_SQL = '''
+    SELECT st.grade_year, st.class_num, st.seat_number, st.student_id, st.student_name,
+           st.grade, c.class_id, c.club_number, c.club_name
+    FROM students st
+    JOIN clubs c ON st.club_id = c.id
+    WHERE c.semester_id = ?
+    ORDER BY st.grade_year, st.class_num, st.seat_number, c.class_id
+'''
+
+
+def as_dicts(db, name, sql, params, record):
+    """舊版做法：查詢後每列另外建立一個 dict"""
+    rows = db._query(db._read_conn(), name, sql, params)
+    return [dict(zip(record._fields, row)) for row in rows]
+
+
+def as_records(db, name, sql, params, record):
+    """新版做法：查詢時直接建立 NamedTuple"""
+    return db._query(db._read_conn(), name, sql, params, record=record)
+
+
+def measure_memory(func) -> dict:
+    """
+    量測一次呼叫的記憶體：
+    retained_kb 為結果仍保留時佔用的記憶體，peak_kb 為過程中的最高用量，blocks 為保留的配置次數
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = func()
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    return {
+        'rows': len(result),
+        'retained_kb': current / 1024,
+        'peak_kb': peak / 1024,
+        'blocks': blocks,
+    }
+
+
+def class_page_html(num_students: int) -> str:
+    """產生一頁與 list.asp 相同格式的名單"""
+    rows = ''.join(
+        f"<tr><td>{i}</td><td>11{i:04d}</td><td>{i % 6 + 1}年{i % 8 + 1}班</td>"
+        f"<td>{i % 30 + 1:02d}</td><td>學生{i:03d}</td></tr>"
+        for i in range(1, num_students + 1))
+    return (f"<h3>社團編號 1-7</h3><table><tr><td>序號</td><td>學號</td><td>班級</td>"
+            f"<td>座號</td><td>姓名</td></tr>{rows}</table>")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查詢結果型別記憶體量測")
+    parser.add_argument('--semesters', type=int, default=8)
+    parser.add_argument('--clubs', type=int, default=50)
+    parser.add_argument('--students', type=int, default=20, help="每個社團的學生數")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='club_bench_')
+    try:
+        db_path = os.path.join(workdir, 'club.db')
+        info = build_legacy_database(db_path, args.semesters, args.clubs, args.students)
+        db = ClubDatabase(db_path)
+        semester_id = db.get_all_semesters()[0].id
+
+        print(f"模擬資料：{info['semesters']} 學期、{info['clubs']} 個社團、{info['students']} 筆學生")
+        print("=" * 86)
+
+        cases = [
+            ('單一學期', 'semester', SEMESTER_SQL, (semester_id,), RosterRow),
+            ('所有學期', 'all_semesters', ALL_SEMESTERS_SQL, (), SearchResult),
+        ]
+
+        print(f"{'結果集':10s}{'型別':8s}{'筆數':>8s}{'保留(KB)':>12s}{'峰值(KB)':>12s}"
+              f"{'配置次數':>10s}{'耗時(ms)':>12s}")
+        for label, name, sql, params, record in cases:
+            for kind, func in (('dict', as_dicts), ('record', as_records)):
+                stats = measure_memory(lambda: func(db, name, sql, params, record))
+                ms = time_call(lambda: func(db, name, sql, params, record), args.repeat)
+                print(f"{label:10s}{kind:10s}{stats['rows']:>8d}{stats['retained_kb']:>14.1f}"
+                      f"{stats['peak_kb']:>14.1f}{stats['blocks']:>12d}{ms:>14.2f}")
+
+        # 爬蟲解析：一頁名單解析後保留的學生資料
+        html = class_page_html(args.students)
+        entries = parse_class_page(html)
+
+        def parsed_dicts():
+            return [dict(zip(RosterEntry._fields, entry)) for entry in parse_class_page(html)]
+
+        for kind, func in (('dict', parsed_dicts), ('record', lambda: parse_class_page(html))):
+            stats = measure_memory(func)
+            print(f"{'解析名單頁':8s}{kind:10s}{stats['rows']:>8d}{stats['retained_kb']:>14.1f}"
+                  f"{stats['peak_kb']:>14.1f}{stats['blocks']:>12d}{'':>14s}")
+        print("=" * 86)
+        print(f"每筆大小：dict {entries[0].to_dict().__sizeof__()} bytes、"
+              f"NamedTuple {entries[0].__sizeof__()} bytes（不含欄位值）")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
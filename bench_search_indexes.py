@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+search_student 索引效能量測
+以原始資料表結構建立模擬資料庫，量測查詢與清除學期的耗時，
+再由 ClubDatabase 開啟（自動套用新索引與搜尋表）後重新量測並比較查詢計畫
+使用方式: python3 bench_search_indexes.py [--semesters 8] [--clubs 50] [--students 20]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from bench_utils import build_legacy_database, time_call
+from club_database import ClubDatabase
+
+
+DELETE_SQL = 'DELETE FROM students WHERE club_id IN (SELECT id FROM clubs WHERE semester_id = ?)'
+
+
+def query_plan(db_path: str, sql: str, params) -> list:
+    conn = sqlite3.connect(db_path)
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+    conn.close()
+    return plan
+
+
+def measure(db_path: str, sql: str, names: list, semester_filter: str, grade_params: tuple,
+            clear_path: str, repeat: int) -> dict:
+    """
+    量測各種查詢條件與清除學期的平均耗時（毫秒）
+    查詢共用同一個連線，只比較索引造成的差異
+    """
+    conn = sqlite3.connect(db_path)
+
+    def run_query(query, params):
+        return conn.execute(query, params).fetchall()
+
+    by_name = sql.format(filter='')
+    by_semester = sql.format(filter=semester_filter)
+    by_grade = sql.format(filter=grade_params[0])
+    semester_id = 1
+
+    results = {
+        'name': time_call(lambda: [run_query(by_name, (n,)) for n in names],
+                          repeat) / len(names),
+        'name+semester': time_call(lambda: [run_query(by_semester, (n, semester_id))
+                                            for n in names], repeat) / len(names),
+        'name+grade': time_call(lambda: run_query(by_grade, (names[0],) + grade_params[1:]),
+                                repeat),
+    }
+
+    # 清除學期（與 clear_semester_data 相同的刪除）在複本上執行，避免影響其他量測
+    def clear_semester():
+        conn = sqlite3.connect(clear_path)
+        conn.execute(DELETE_SQL, (semester_id,))
+        conn.execute('DELETE FROM clubs WHERE semester_id = ?', (semester_id,))
+        conn.commit()
+        conn.close()
+
+    results['clear_semester'] = time_call(clear_semester, 1)
+    conn.close()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="search_student 索引效能量測")
+    parser.add_argument('--semesters', type=int, default=8)
+    parser.add_argument('--clubs', type=int, default=50)
+    parser.add_argument('--students', type=int, default=20, help="每個社團的學生數")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='club_bench_')
+    try:
+        legacy_path = os.path.join(workdir, 'legacy.db')
+        info = build_legacy_database(legacy_path, args.semesters, args.clubs, args.students)
+        names = info['sample_names']
+
+        print(f"模擬資料：{info['semesters']} 學期、{info['clubs']} 個社團、{info['students']} 筆學生")
+        print("=" * 72)
+
+        # 舊版 search_student：三表 JOIN，以年級班級字串比對
+        legacy_sql = '''
+            SELECT s.semester, c.class_id, c.club_number, c.club_name,
+                   st.student_id, st.student_name, st.grade, st.seat_number
+            FROM students st
+            JOIN clubs c ON st.club_id = c.id
+            JOIN semesters s ON c.semester_id = s.id
+            WHERE st.student_name = ? {filter}
+            ORDER BY s.semester DESC, c.class_id
+        '''
+        # 新版 search_student：直接查詢搜尋表，以整數年級、班級比對
+        new_sql = '''
+            SELECT st.semester, st.class_id, st.club_number, st.club_name,
+                   st.student_id, st.student_name, st.grade, st.seat_number
+            FROM search_index st
+            WHERE st.student_name = ? {filter}
+            ORDER BY st.semester_key DESC, st.class_id
+        '''
+        legacy_grade = ('AND st.grade = ?', '1年1班')
+        new_grade = ('AND st.grade_year = ? AND st.class_num = ?', 1, 1)
+
+        # 舊索引
+        legacy_clear = os.path.join(workdir, 'legacy_clear.db')
+        shutil.copy(legacy_path, legacy_clear)
+        before = measure(legacy_path, legacy_sql, names, 'AND c.semester_id = ?', legacy_grade,
+                         legacy_clear, args.repeat)
+        before_plan = query_plan(legacy_path, legacy_sql.format(filter=legacy_grade[0]),
+                                 (names[0], '1年1班'))
+        before_delete = query_plan(legacy_path, DELETE_SQL, (1,))
+
+        # 新索引與搜尋表：ClubDatabase 開啟舊資料庫時自動套用
+        ClubDatabase(legacy_path)
+        migrated_clear = os.path.join(workdir, 'migrated_clear.db')
+        shutil.copy(legacy_path, migrated_clear)
+        full_clear = os.path.join(workdir, 'full_clear.db')
+        shutil.copy(legacy_path, full_clear)
+        after = measure(legacy_path, new_sql, names, 'AND +st.semester_id = ?', new_grade,
+                        migrated_clear, args.repeat)
+        after_plan = query_plan(legacy_path, new_sql.format(filter=new_grade[0]), (names[0], 1, 1))
+        after_delete = query_plan(legacy_path, DELETE_SQL, (1,))
+
+        print(f"{'查詢':18s}{'舊索引(ms)':>14s}{'新索引(ms)':>14s}{'加速':>10s}")
+        for key in before:
+            speedup = before[key] / after[key] if after[key] else float('inf')
+            print(f"{key:20s}{before[key]:>14.3f}{after[key]:>14.3f}{speedup:>10.1f}x")
+
+        # 實際的 clear_semester_data 另外維護衍生資料表（學生身分、搜尋表、異動、統計）與姓名 filter
+        clear_db = ClubDatabase(full_clear)
+        full_ms = time_call(lambda: clear_db.clear_semester_data(1), 1)
+        print(f"{'clear_semester_data':20s}{'':>14s}{full_ms:>14.3f}  （含衍生資料表與姓名 filter）")
+
+        print("=" * 72)
+        print("search_student 查詢計畫（姓名 + 年級班級）")
+        print("  舊: " + " / ".join(before_plan))
+        print("  新: " + " / ".join(after_plan))
+        print("clear_semester_data 查詢計畫")
+        print("  舊: " + " / ".join(before_delete))
+        print("  新: " + " / ".join(after_delete))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
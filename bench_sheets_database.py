@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+SheetsDatabase 效能量測
+使用 FakeGSheetsConnection 模擬一次完整爬取與搜尋，統計 API 呼叫次數與模擬延遲
+使用方式: python3 bench_sheets_database.py [--clubs 44] [--students 19] [--latency 0.3] [--output result.json]
+"""
+
+import argparse
+import json
+import time
+
+from fake_gsheets import FakeGSheetsConnection
+from sheets_database import SheetsDatabase
+
+
+def run_phase(conn, name, func):
+    """執行一個階段並回傳該階段的統計"""
+    conn.reset_stats()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    stats = conn.stats()
+    stats['phase'] = name
+    stats['wall_seconds'] = round(elapsed, 3)
+    return stats
+
+
+def make_students(class_id, students_per_club):
+    """產生一個社團的模擬學生 [(student_name, student_id, grade, seat_number)]"""
+    return [
+        (f"學生{class_id:02d}{seat:02d}", f"11{class_id:02d}{seat:02d}",
+         f"{seat % 6 + 1}年{seat % 5 + 1}班", f"{seat:02d}")
+        for seat in range(1, students_per_club + 1)
+    ]
+
+
+def simulate_crawl(db, num_clubs, students_per_club):
+    """依照 ClubCrawler.crawl_all_data 的呼叫順序寫入資料（暫存後一次發佈）"""
+    semester_id = db.get_or_create_semester("2026/3/1")
+    db.is_semester_cached(semester_id)
+
+    run_id = db.begin_staging(semester_id)
+    for class_id in range(1, num_clubs + 1):
+        db.stage_club(run_id, class_id, f"1-{class_id}", f"測試社團{class_id}",
+                      make_students(class_id, students_per_club))
+    db.publish_staging(run_id)
+
+
+def simulate_legacy_crawl(db, num_clubs, students_per_club):
+    """舊版逐筆寫入：每個社團、每位學生各讀寫一次整張工作表"""
+    semester_id = db.get_or_create_semester("2026/3/1")
+    db.is_semester_cached(semester_id)
+
+    for class_id in range(1, num_clubs + 1):
+        club_id = db.save_club(semester_id, class_id, f"1-{class_id}", f"測試社團{class_id}")
+        for student in make_students(class_id, students_per_club):
+            db.save_student(club_id, *student)
+
+    db.update_semester_timestamp(semester_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SheetsDatabase API 呼叫量測")
+    parser.add_argument('--clubs', type=int, default=44, help="社團數量（預設與 club_data.db 相同）")
+    parser.add_argument('--students', type=int, default=19, help="每個社團的學生數")
+    parser.add_argument('--latency', type=float, default=0.3, help="每次 API 呼叫的模擬延遲（秒）")
+    parser.add_argument('--output', help="將結果以 JSON 寫入檔案")
+    args = parser.parse_args()
+
+    legacy_conn = FakeGSheetsConnection(latency=args.latency)
+    legacy_db = SheetsDatabase(conn=legacy_conn)
+
+    conn = FakeGSheetsConnection(latency=args.latency)
+    db = SheetsDatabase(conn=conn)
+
+    results = [
+        run_phase(legacy_conn, 'crawl_legacy',
+                  lambda: simulate_legacy_crawl(legacy_db, args.clubs, args.students)),
+        run_phase(conn, 'crawl', lambda: simulate_crawl(db, args.clubs, args.students)),
+        run_phase(conn, 'search_hit', lambda: db.search_student("學生0101")),
+        run_phase(conn, 'search_miss', lambda: db.search_student("不存在的學生")),
+        run_phase(conn, 'get_all_semesters', db.get_all_semesters),
+    ]
+
+    print("SheetsDatabase 量測結果")
+    print(f"社團 {args.clubs} 個 × 學生 {args.students} 位，每次呼叫延遲 {args.latency}s")
+    print("=" * 72)
+    print(f"{'階段':18s}{'讀取':>8s}{'寫入':>8s}{'傳輸列數':>12s}{'模擬延遲(s)':>14s}{'實際(s)':>10s}")
+    for r in results:
+        print(f"{r['phase']:20s}{r['reads']:>8d}{r['updates']:>8d}{r['rows_transferred']:>14d}"
+              f"{r['simulated_seconds']:>14.1f}{r['wall_seconds']:>12.3f}")
+    print("=" * 72)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'params': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"結果已寫入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
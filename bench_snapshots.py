@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+多程序讀取吞吐量量測：主資料庫 vs 唯讀快照
+以 1、2、4… 個讀取程序持續搜尋學生，同時由一個寫入程序反覆發佈學期資料（模擬爬蟲），
+比較直接查詢 club_data.db（WAL，與寫入共用 -wal/-shm）與查詢 immutable 快照時的總查詢數
+使用方式: python3 bench_snapshots.py [--processes 1,2,4] [--seconds 3] [--no-writer]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bench_utils import build_legacy_database
+from club_database import ClubDatabase
+from snapshots import SnapshotDatabase, publish_snapshot
+
+
+def reader(db_path: str, snapshot_dir, names: list, start_at: float, seconds: float, results):
+    db = SnapshotDatabase(db_path, snapshot_dir) if snapshot_dir else ClubDatabase(db_path)
+    rng = random.Random(os.getpid())
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    queries = 0
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        db.search_student(rng.choice(names))
+        queries += 1
+    results.put(queries)
+
+
+def writer(db_path: str, snapshot_dir, start_at: float, seconds: float):
+    """反覆以暫存表重新發佈第一個學期（與爬蟲相同的寫入路徑），快照模式時一併發佈快照"""
+    if snapshot_dir:
+        os.environ['JKES_SNAPSHOT_DIR'] = snapshot_dir
+    db = ClubDatabase(db_path)
+    semester_id = db.get_all_semesters()[-1].id
+    roster = [(club.class_id, club.club_number, club.club_name, [
+        (row.student_name, row.student_id, row.grade, row.seat_number)
+        for row in db.get_club_roster(semester_id, club.club_number)]) for club in db.get_clubs(semester_id)]
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    while time.time() < start_at + seconds:
+        run_id = db.begin_staging(semester_id)
+        for class_id, club_number, club_name, students in roster:
+            db.stage_club(run_id, class_id, club_number, club_name, students)
+        db.publish_staging(run_id)
+
+
+def measure(db_path: str, snapshot_dir, names: list, processes: int, seconds: float, with_writer: bool) -> float:
+    """回傳所有讀取程序合計的每秒查詢數"""
+    results = multiprocessing.Queue()
+    start_at = time.time() + 1.0  # 等所有程序都開好資料庫
+    workers = [multiprocessing.Process(target=reader, args=(db_path, snapshot_dir, names, start_at, seconds,
+                                                            results))
+               for _ in range(processes)]
+    if with_writer:
+        workers.append(multiprocessing.Process(target=writer, args=(db_path, snapshot_dir, start_at, seconds)))
+
+    for worker in workers:
+        worker.start()
+    total = sum(results.get() for _ in range(processes))
+    for worker in workers:
+        worker.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多程序讀取吞吐量：主資料庫 vs 唯讀快照")
+    parser.add_argument('--semesters', type=int, default=8)
+    parser.add_argument('--clubs', type=int, default=50)
+    parser.add_argument('--students', type=int, default=20, help="每個社團的學生數")
+    parser.add_argument('--processes', default='1,2,4', help="讀取程序數（逗號分隔）")
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--no-writer', action='store_true', help="不同時寫入")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='club_bench_')
+    try:
+        db_path = os.path.join(workdir, 'club.db')
+        snapshot_dir = os.path.join(workdir, 'snapshots')
+        info = build_legacy_database(db_path, args.semesters, args.clubs, args.students)
+        ClubDatabase(db_path)  # 套用 migration、建立搜尋表
+        publish_snapshot(db_path, snapshot_dir)
+        names = info['sample_names']
+
+        print(f"模擬資料：{info['semesters']} 學期、{info['clubs']} 個社團、{info['students']} 筆學生；"
+              f"CPU {os.cpu_count()} 核、{'同時' if not args.no_writer else '不'}寫入")
+        print("=" * 60)
+        print(f"{'讀取程序':8s}{'主資料庫(次/秒)':>18s}{'快照(次/秒)':>16s}{'快照/主資料庫':>12s}")
+        for processes in (int(n) for n in args.processes.split(',')):
+            primary = measure(db_path, None, names, processes, args.seconds, not args.no_writer)
+            snapshot = measure(db_path, snapshot_dir, names, processes, args.seconds, not args.no_writer)
+            print(f"{processes:<12d}{primary:>16.0f}{snapshot:>16.0f}{snapshot / primary:>14.2f}x")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+效能量測共用工具：產生模擬的多學期社團資料庫
+"""
+
+import random
+import sqlite3
+import time
+
+
+# 原始版本（建立索引前）的資料表結構，用來模擬既有的 club_data.db
+LEGACY_SCHEMA = '''
+    CREATE TABLE semesters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        semester TEXT UNIQUE NOT NULL,
+        year INTEGER NOT NULL,
+        term TEXT NOT NULL,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        source_date TEXT
+    );
+    CREATE TABLE clubs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        semester_id INTEGER NOT NULL,
+        class_id INTEGER NOT NULL,
+        club_number TEXT NOT NULL,
+        club_name TEXT NOT NULL,
+        FOREIGN KEY (semester_id) REFERENCES semesters(id),
+        UNIQUE(semester_id, class_id)
+    );
+    CREATE TABLE students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        club_id INTEGER NOT NULL,
+        student_id TEXT,
+        student_name TEXT NOT NULL,
+        grade TEXT,
+        seat_number TEXT,
+        FOREIGN KEY (club_id) REFERENCES clubs(id)
+    );
+    CREATE INDEX idx_student_name ON students(student_name);
+    CREATE INDEX idx_semester ON clubs(semester_id);
+    CREATE INDEX idx_grade ON students(grade);
+'''
+
+SURNAMES = "陳林黃張李王吳劉蔡楊許鄭謝郭洪邱曾廖賴徐周葉蘇莊呂江何蕭羅高"
+GIVEN_CHARS = "語涵家耀惟寧桐安昱凱胤侖宇恩晴翔柏睿品妍子傑詠心承佑芷若思辰沛"
+
+
+def make_students(count: int, seed: int = 42) -> list:
+    """產生學生名冊 [(學號, 姓名, 入學年)]，姓名可能重複"""
+    rng = random.Random(seed)
+    students = []
+    for i in range(count):
+        name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_CHARS) for _ in range(2))
+        entry_year = 109 + i % 6
+        students.append((f"{entry_year}{i:04d}", name, entry_year))
+    return students
+
+
+def build_legacy_database(path: str, num_semesters: int = 8, clubs_per_semester: int = 50,
+                          students_per_club: int = 20, seed: int = 42) -> dict:
+    """
+    以原始資料表結構建立模擬資料庫
+    每學期每位學生約參加一個社團，年級隨學年遞增
+    :return: 資料量統計
+    """
+    rng = random.Random(seed)
+    roster = make_students(clubs_per_semester * students_per_club, seed)
+
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+
+    start = time.perf_counter()
+    total_students = 0
+    for n in range(num_semesters):
+        year = 110 + n // 2
+        term = "上" if n % 2 == 0 else "下"
+        cur = conn.execute(
+            'INSERT INTO semesters (semester, year, term, source_date) VALUES (?, ?, ?, ?)',
+            (f"{year}{term}", year, term, f"{year + 1911 + (n % 2)}/{9 if term == '上' else 3}/1"))
+        semester_id = cur.lastrowid
+
+        club_ids = []
+        for class_id in range(1, clubs_per_semester + 1):
+            cur = conn.execute(
+                'INSERT INTO clubs (semester_id, class_id, club_number, club_name) VALUES (?, ?, ?, ?)',
+                (semester_id, class_id, f"{class_id % 6 + 1}-{class_id}", f"模擬社團{class_id}"))
+            club_ids.append(cur.lastrowid)
+
+        rows = []
+        for student_id, name, entry_year in roster:
+            grade_year = year - entry_year + 1
+            if not 1 <= grade_year <= 6:
+                continue
+            class_num = int(student_id[-2:]) % 8 + 1
+            rows.append((rng.choice(club_ids), student_id, name, f"{grade_year}年{class_num}班",
+                         f"{int(student_id[-3:]) % 30 + 1:02d}"))
+
+        conn.executemany('''
+            INSERT INTO students (club_id, student_id, student_name, grade, seat_number)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        total_students += len(rows)
+
+    conn.commit()
+    conn.close()
+
+    return {
+        'semesters': num_semesters,
+        'clubs': num_semesters * clubs_per_semester,
+        'students': total_students,
+        'build_seconds': round(time.perf_counter() - start, 2),
+        'sample_names': [name for _, name, _ in roster[:20]],
+    }
+
+
+def time_call(func, repeat: int = 200) -> float:
+    """重複呼叫並回傳平均耗時（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
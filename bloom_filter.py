@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+姓名 Bloom filter
+快速搜尋中有不少是打錯字或沒有參加社團的學生，先以 Bloom filter 判斷「一定不存在」的姓名，
+不必查詢資料庫或讀取 Google Sheets；判斷為「可能存在」時才照常查詢
+每學期一個 filter，另有一個涵蓋所有學期的 filter（ALL_SEMESTERS）
+"""
+
+import hashlib
+import math
+import os
+import re
+import struct
+import unicodedata
+from typing import Dict, Iterable, Optional, Tuple
+
+
+ALL_SEMESTERS = 0  # 所有學期的 filter 以 0 作為學期ID
+
+MAGIC = b'JKBF'
+FORMAT_VERSION = 1
+# magic, 格式版本, 資料版本號, filter 數
+FILE_HEADER = struct.Struct('<4sHQI')
+# 學期ID, 位元數, 雜湊次數, 位元組數
+FILTER_HEADER = struct.Struct('<IIHI')
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_name(name: str) -> str:
+    """姓名正規化：NFKC（全形轉半形等）並移除所有空白"""
+    return _WHITESPACE.sub('', unicodedata.normalize('NFKC', name or ''))
+
+
+class BloomFilter:
+    """固定大小的 Bloom filter，以 blake2b 雜湊搭配 double hashing 產生各個位元位置"""
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[bytes] = None):
+        self.num_bits = max(num_bits, 8)
+        self.num_hashes = max(num_hashes, 1)
+        size = (self.num_bits + 7) // 8
+        self.bits = bytearray(bits) if bits is not None else bytearray(size)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp_rate: float = 0.01) -> 'BloomFilter':
+        """依預計的姓名數與可接受的誤判率決定大小"""
+        capacity = max(capacity, 1)
+        num_bits = math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        num_hashes = round(num_bits / capacity * math.log(2))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, name: str):
+        digest = hashlib.blake2b(normalize_name(name).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, name: str):
+        for position in self._positions(name):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, name: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(name))
+
+
+class NameFilters:
+    """各學期與所有學期的姓名 filter，並記錄建立時的資料版本號"""
+
+    def __init__(self, filters: Dict[int, BloomFilter], generation: int = 0):
+        self.filters = filters
+        self.generation = generation
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[int, str]], generation: int = 0,
+              fp_rate: float = 0.01) -> 'NameFilters':
+        """由 [(學期ID, 姓名)] 建立"""
+        names_by_semester = {ALL_SEMESTERS: set()}
+        for semester_id, name in rows:
+            normalized = normalize_name(name)
+            names_by_semester.setdefault(int(semester_id), set()).add(normalized)
+            names_by_semester[ALL_SEMESTERS].add(normalized)
+
+        filters = {}
+        for semester_id, names in names_by_semester.items():
+            bloom = BloomFilter.for_capacity(len(names), fp_rate)
+            for name in names:
+                bloom.add(name)
+            filters[semester_id] = bloom
+
+        return cls(filters, generation)
+
+    def may_contain(self, name: str, semester_id: Optional[int] = None) -> bool:
+        """
+        姓名是否可能存在（False 表示一定不存在）
+        指定的學期沒有 filter 代表該學期沒有任何學生
+        """
+        bloom = self.filters.get(semester_id or ALL_SEMESTERS)
+        if bloom is None:
+            return False
+        return name in bloom
+
+    def save(self, path: str):
+        """寫入檔案（先寫暫存檔再替換）"""
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(FILE_HEADER.pack(MAGIC, FORMAT_VERSION, self.generation, len(self.filters)))
+            for semester_id, bloom in sorted(self.filters.items()):
+                f.write(FILTER_HEADER.pack(semester_id, bloom.num_bits, bloom.num_hashes, len(bloom.bits)))
+                f.write(bloom.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'NameFilters':
+        """讀取檔案；格式不符時拋出 ValueError"""
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if len(data) < FILE_HEADER.size:
+            raise ValueError(f"{path} 不是支援的姓名 filter 檔")
+        magic, version, generation, count = FILE_HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} 不是支援的姓名 filter 檔")
+
+        filters = {}
+        position = FILE_HEADER.size
+        for _ in range(count):
+            semester_id, num_bits, num_hashes, size = FILTER_HEADER.unpack_from(data, position)
+            position += FILTER_HEADER.size
+            filters[semester_id] = BloomFilter(num_bits, num_hashes, data[position:position + size])
+            position += size
+
+        return cls(filters, generation)
@@ -3,155 +3,282 @@
 社團資料爬蟲
 """
 
-import requests
 from bs4 import BeautifulSoup
 import time
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from instrumentation import Recorder, recorder
+from records import RosterEntry
+from school_client import SchoolClient, LoginError
+from rate_limiter import get_rate_limiter
+from adaptive_concurrency import AIMDController
+from page_archive import PageArchive, DEFAULT_ROOT as ARCHIVE_ROOT, content_digest, decode_page
+from resilience import (RetryPolicy, ErrorBudget, CircuitBreaker, CircuitOpenError, CrawlAborted,
+                        RETRYABLE_ERRORS, check_response)
 try:
     from cloud_database import CloudDatabase as Database
 except ImportError:
     from club_database import ClubDatabase as Database
 
 
-class ClubCrawler:
-    def __init__(self, username: str, password: str):
-        self.username = username
-        self.password = password
-        self.base_url = "http://www2.jkes.tp.edu.tw"
-        self.session = None
-        self.db = Database()
+def parse_semester_date(html: str) -> Optional[str]:
+    """從 main.asp 取得學期日期（類似 "預計2026/3/1" 的文字）"""
+    match = re.search(r'(\d{4}/\d{1,2}/\d{1,2})', html)
+    return match.group(1) if match else None
 
-    def create_session(self):
-        """建立並登入 session"""
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
 
-        try:
-            self.session.get(f"{self.base_url}/index.asp", timeout=10)
-        except Exception as e:
-            print(f"訪問首頁錯誤: {e}")
+def parse_club_list(html: str) -> Dict[str, str]:
+    """解析 main.asp 的社團編號和名稱對照表"""
+    club_dict = {}
+    soup = BeautifulSoup(html, 'html.parser')
+
+    for row in soup.find_all('tr'):
+        cells = row.find_all('td')
+        if len(cells) >= 2:
+            club_id = cells[0].get_text().strip()
+            club_name = cells[1].get_text().strip()
+
+            if '-' in club_id and club_id[0].isdigit():
+                club_dict[club_id] = club_name
+
+    return club_dict
+
 
-        login_attempts = [
-            {'username': self.username, 'password': self.password},
-            {'userid': self.username, 'pwd': self.password},
-        ]
+def parse_class_page(html: str) -> List[RosterEntry]:
+    """解析 list.asp 的學生名單頁面"""
+    students = []
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # 找到社團編號
+    club_number = None
+    for tag in soup.find_all(['h3', 'p']):
+        text = tag.get_text().strip()
+        if '編號' in text and '-' in text:
+            match = re.search(r'編號\s*(\d+-\d+)', text)
+            if match:
+                club_number = match.group(1)
+                break
+
+    # 解析學生名單表格
+    for row in soup.find_all('tr'):
+        cells = row.find_all('td')
+        if len(cells) >= 5:
+            # 跳過表頭
+            if cells[0].get_text().strip() == '序號':
+                continue
 
-        for login_data in login_attempts:
             try:
-                self.session.post(f"{self.base_url}/index.asp", data=login_data, timeout=10)
+                student_id = cells[1].get_text().strip()
+                grade = cells[2].get_text().strip()
+                seat = cells[3].get_text().strip()
+                name = cells[4].get_text().strip()
+
+                if name and student_id:  # 確保有資料
+                    students.append(RosterEntry(student_id, name, grade, seat, club_number))
             except:
-                pass
+                continue
 
-    def get_semester_date(self) -> str:
-        """從 reindex.asp 取得學期日期"""
-        try:
-            response = self.session.get(f"{self.base_url}/main.asp", timeout=10)
-            response.encoding = 'big5'
+    return students
 
-            # 尋找類似 "預計2026/3/1" 的文字
-            match = re.search(r'(\d{4}/\d{1,2}/\d{1,2})', response.text)
-            if match:
-                return match.group(1)
 
-        except Exception as e:
-            print(f"取得學期日期錯誤: {e}")
+# 斷路器開啟超過這個次數（伺服器持續無回應）時中止爬取
+MAX_CIRCUIT_OPENS = 3
 
-        return None
+# 依日曆判斷可能已換學期、但網站仍顯示已快取的學期時（例如寒暑假），這段時間內不再連線確認
+SEMESTER_RECHECK_SECONDS = 6 * 60 * 60
 
-    def get_club_list(self) -> dict:
-        """取得所有社團編號和名稱對照表"""
-        club_dict = {}
+# 各資料庫最近一次連線確認的結果：{資料庫: (time.time(), semester_id, 學期名稱)}
+_confirmed_semesters = {}
 
-        try:
-            url = f"{self.base_url}/main.asp"
-            response = self.session.get(url, timeout=10)
-            response.encoding = 'big5'
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+class ClubCrawler:
+    def __init__(self, username: str, password: str, db=None):
+        """
+        :param db: 寫入的資料庫，預設開啟 club_data.db（或雲端資料庫）
+        """
+        self.username = username
+        self.password = password
+        self.base_url = "http://www2.jkes.tp.edu.tw"
+        self.session = None
+        self.client = None
+        self.db = db if db is not None else Database()
+        self.metrics = Recorder(parent=recorder)  # 每次爬取重新計算
+        self.last_summary = None
+        self.retry_policy = RetryPolicy()
+        self.breaker = CircuitBreaker()
+        self.max_failed_classes = 5  # 每次爬取的錯誤預算：重試後仍失敗的 ClassID 數
+        self.rate_limiter = get_rate_limiter()  # 與其他程序共用的請求速率
+        self.concurrency = AIMDController()    # 名單頁的並行數
+        self._slot = threading.local()
+        # 抓到的原始頁面，爬取結束時存入封存（JKES_PAGE_ARCHIVE 設為空字串時不封存）
+        self.archive = PageArchive(ARCHIVE_ROOT) if ARCHIVE_ROOT else None
+        self._pages = {}
+        self._pages_lock = threading.Lock()
+        self.semester_recheck = SEMESTER_RECHECK_SECONDS
+
+    def create_session(self):
+        """登入（有未過期的 session 時直接沿用）；帳密錯誤時拋出 LoginError"""
+        self.client = SchoolClient(self.username, self.password, base_url=self.base_url,
+                                   rate_limiter=self.rate_limiter)
 
-            for row in soup.find_all('tr'):
-                cells = row.find_all('td')
-                if len(cells) >= 2:
-                    club_id = cells[0].get_text().strip()
-                    club_name = cells[1].get_text().strip()
+        with self.metrics.span('login') as event:
+            self.session = self.retry_policy.call(self.client.login)
+            event['reused'] = self.client.reused
+            event['requests'] = self.client.login_requests
 
-                    if '-' in club_id and club_id[0].isdigit():
-                        club_dict[club_id] = club_name
+        self.metrics.count('login_requests', self.client.login_requests)
+        if self.client.reused:
+            print("✓ 沿用已登入的 session")
 
-        except Exception as e:
-            print(f"取得社團列表錯誤: {e}")
+    def _fetch(self, page: str, **fields):
+        """
+        抓取頁面並記錄耗時與位元組數
+        暫時性錯誤依 retry_policy 重試；斷路器開啟時先暫停，伺服器持續無回應則拋出 CrawlAborted
+        """
+        def on_retry(attempt, error, delay):
+            self.metrics.count('retries')
+            print(f"⚠️ {page} 失敗（{error}），{delay:.1f} 秒後第 {attempt} 次重試")
 
-        return club_dict
+        return self.retry_policy.call(self._fetch_once, page, on_retry=on_retry, **fields)
 
-    def get_class_students(self, class_id: int) -> list:
-        """取得某個 ClassID 的所有學生名單"""
-        students = []
+    def _fetch_once(self, page: str, **fields):
+        self._wait_for_circuit()
+        # 名單頁的延遲與錯誤用來調整並行數
+        adaptive = page.startswith('list.asp')
 
         try:
-            url = f"{self.base_url}/list.asp?ClassID={class_id}"
-            response = self.session.get(url, timeout=10)
-            response.encoding = 'big5'
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # 找到社團編號
-            club_number = None
-            for tag in soup.find_all(['h3', 'p']):
-                text = tag.get_text().strip()
-                if '編號' in text and '-' in text:
-                    match = re.search(r'編號\s*(\d+-\d+)', text)
-                    if match:
-                        club_number = match.group(1)
-                        break
-
-            # 解析學生名單表格
-            for row in soup.find_all('tr'):
-                cells = row.find_all('td')
-                if len(cells) >= 5:
-                    # 跳過表頭
-                    if cells[0].get_text().strip() == '序號':
-                        continue
-
-                    try:
-                        student_id = cells[1].get_text().strip()
-                        grade = cells[2].get_text().strip()
-                        seat = cells[3].get_text().strip()
-                        name = cells[4].get_text().strip()
-
-                        if name and student_id:  # 確保有資料
-                            students.append({
-                                'student_id': student_id,
-                                'name': name,
-                                'grade': grade,
-                                'seat': seat,
-                                'club_number': club_number
-                            })
-                    except:
-                        continue
+            with self.metrics.span('fetch', page=page, **fields) as event:
+                response = self.client.get(page, timeout=10)
+                event['status'] = response.status_code
+                check_response(response)
+                response.encoding = 'big5'
+                event['bytes'] = len(response.content)
+        except RETRYABLE_ERRORS:
+            self.breaker.record_failure()
+            if adaptive:
+                self.concurrency.record(0, ok=False, issued_at=getattr(self._slot, 'issued_at', None))
+            raise
+
+        self.breaker.record_success()
+        if adaptive:
+            # response.elapsed 不含等待請求額度的時間
+            elapsed = getattr(response, 'elapsed', None)
+            latency_ms = elapsed.total_seconds() * 1000 if elapsed is not None else event['ms']
+            self.concurrency.record(latency_ms, issued_at=getattr(self._slot, 'issued_at', None))
+        self.metrics.count('bytes', len(response.content))
+        self.metrics.count('pages')
+        if self.archive is not None:
+            with self._pages_lock:
+                self._pages[page] = {'content': response.content,
+                                     'fetched_at': datetime.now().isoformat(timespec='seconds'), **fields}
+        return response
+
+    def _wait_for_circuit(self):
+        """斷路器開啟時暫停爬取，等到可以試探時再繼續"""
+        while True:
+            try:
+                self.breaker.before_call()
+                return
+            except CircuitOpenError as e:
+                if self.breaker.open_count > MAX_CIRCUIT_OPENS:
+                    raise CrawlAborted("伺服器持續無回應") from e
+                self.metrics.count('circuit_pauses')
+                print(f"⏸️ {e}")
+                time.sleep(e.remaining)
 
+    def get_semester_date(self) -> str:
+        """
+        從 main.asp 取得學期日期
+        重試後仍無法取得或頁面沒有日期時拋出 CrawlAborted，不會改用當天日期而寫錯學期
+        """
+        response = self._fetch_main_page()
+        date_str = parse_semester_date(response.text)
+        if not date_str:
+            raise CrawlAborted("main.asp 沒有學期日期")
+        return date_str
+
+    def get_club_list(self) -> dict:
+        """
+        取得所有社團編號和名稱對照表
+        重試後仍無法取得或解析不到任何社團時拋出 CrawlAborted，不會把每個社團都發佈成「未知社團」
+        """
+        response = self._fetch_main_page()
+        with self.metrics.span('parse', page='main.asp'):
+            club_list = parse_club_list(response.text)
+        if not club_list:
+            raise CrawlAborted("main.asp 沒有社團列表")
+        return club_list
+
+    def _fetch_main_page(self):
+        try:
+            return self._fetch('main.asp')
+        except (CrawlAborted, LoginError):
+            raise
         except Exception as e:
-            print(f"取得 ClassID {class_id} 學生名單錯誤: {e}")
+            raise CrawlAborted(f"無法取得 main.asp（{e}）") from e
 
+    def get_class_page(self, class_id: int) -> str:
+        """取得某個 ClassID 的名單頁 HTML；重試後仍無法取得時拋出錯誤"""
+        return self._fetch(f"list.asp?ClassID={class_id}", class_id=class_id).text
+
+    def parse_class_students(self, class_id: int, html: str) -> List[RosterEntry]:
+        """解析名單頁（記錄解析時間）"""
+        with self.metrics.span('parse', page='list.asp', class_id=class_id) as event:
+            students = parse_class_page(html)
+            event['rows'] = len(students)
         return students
 
-    def crawl_all_data(self, class_id_range=range(1, 51), force_update=False):
+    def get_class_students(self, class_id: int) -> List[RosterEntry]:
+        """
+        取得某個 ClassID 的所有學生名單
+        沒有這個 ClassID 時回傳空列表；重試後仍無法取得時拋出錯誤，不會當成沒有學生
+        """
+        return self.parse_class_students(class_id, self.get_class_page(class_id))
+
+    def crawl_all_data(self, class_id_range=range(1, 51), force_update=False, replay: Optional[str] = None,
+                       refresh: bool = False):
         """
         爬取所有資料並儲存到資料庫
+        任何 ClassID 重試後仍失敗、錯誤預算用完或伺服器持續無回應時中止，保留原有資料
         :param class_id_range: ClassID 範圍
-        :param force_update: 是否強制更新（即使已有快取）
+        :param force_update: 是否強制更新（即使已有快取，一定重新發佈）
+        :param replay: 學期名稱（如 "114下"）；指定時不連線，改由頁面封存重建該學期
+        :param refresh: 重新爬取已快取的學期，但頁面與上次發佈時完全相同時不發佈（排程更新使用）
         :return: (semester_id, 是否更新)
         """
-        print("正在建立連線...")
-        self.create_session()
+        if replay:
+            return self.replay_semester(replay)
+
+        self.metrics.reset()
+        with self._pages_lock:
+            self._pages = {}
+
+        # 不強制更新時先依已保存的學期日曆判斷，學期沒有變動就不連線
+        if not (force_update or refresh):
+            cached = self._resolve_cached_semester()
+            if cached is not None:
+                semester_id, semester_name = cached
+                print(f"✅ 學期 {semester_name} 的資料已存在，跳過連線")
+                self.metrics.count('network_skipped')
+                self._finish_crawl(semester_name, updated=False)
+                return semester_id, False
+        self.breaker = CircuitBreaker(self.breaker.failure_threshold, self.breaker.reset_timeout)
+        self.concurrency = AIMDController(min_limit=self.concurrency.min_limit,
+                                          max_limit=self.concurrency.max_limit)
 
-        print("正在取得學期資訊...")
-        date_str = self.get_semester_date()
-        if not date_str:
-            print("⚠️ 無法取得學期日期，使用當前日期")
-            from datetime import datetime
-            date_str = datetime.now().strftime("%Y/%m/%d")
+        print("正在建立連線...")
+        try:
+            self.create_session()
+            print("正在取得學期資訊...")
+            date_str = self.get_semester_date()
+        except (LoginError, CrawlAborted) as e:
+            print(f"\n⚠️ 爬取中止：{e}")
+            self._finish_crawl(None, updated=False, aborted=str(e))
+            return None, False
 
         print(f"學期日期: {date_str}")
 
@@ -162,63 +289,297 @@ class ClubCrawler:
         print(f"學期: {semester_name} (ID: {semester_id})")
 
         # 檢查是否已經有快取
-        if not force_update and self.db.is_semester_cached(semester_id):
+        if not (force_update or refresh) and self.db.is_semester_cached(semester_id):
+            _confirmed_semesters[self._db_key] = (time.time(), semester_id, semester_name)
             print(f"✅ 學期 {semester_name} 的資料已存在，跳過更新")
+            self._finish_crawl(semester_name, updated=False)
             return semester_id, False
 
         print(f"🔄 開始更新學期 {semester_name} 的資料...")
 
-        # 清除舊資料（如果是強制更新）
-        if force_update:
-            print("清除舊資料...")
-            self.db.clear_semester_data(semester_id)
+        budget = ErrorBudget(self.max_failed_classes)
+        try:
+            # 取得社團列表
+            print("正在取得社團列表...")
+            club_list = self.get_club_list()
+            print(f"找到 {len(club_list)} 個社團")
+
+            # 先抓齊每個 ClassID 的名單頁，確定要發佈時才解析、寫入
+            htmls = self._fetch_class_pages(class_id_range, budget)
+
+            # 失敗的 ClassID 最後再試一次（暫時性問題多半已恢復）
+            if budget.unresolved:
+                print(f"\n🔁 重新爬取失敗的 ClassID：{budget.unresolved}")
+                htmls.update(self._fetch_class_pages(list(budget.unresolved), budget))
+
+            if budget.unresolved:
+                raise CrawlAborted(f"ClassID {budget.unresolved} 無法取得")
+        except (LoginError, CrawlAborted) as e:
+            print(f"\n⚠️ 爬取中止：{e}，保留原有資料")
+            self._finish_crawl(semester_name, updated=False, aborted=str(e),
+                               failed_classes=budget.unresolved)
+            return semester_id, False
+
+        # 頁面與上次發佈時完全相同時不解析、不發佈，資料版本號不變，各種快取與索引檔不會失效
+        if (refresh and not force_update and self.db.is_semester_cached(semester_id)
+                and self._pages_unchanged(semester_name)):
+            print(f"\n✅ 頁面內容與上次發佈時相同，學期 {semester_name} 的資料沒有變動")
+            self.metrics.count('unchanged')
+            self._finish_crawl(semester_name, updated=False)
+            return semester_id, False
 
-        # 取得社團列表
-        print("正在取得社團列表...")
-        club_list = self.get_club_list()
-        print(f"找到 {len(club_list)} 個社團")
+        # 寫入暫存表後一次切換，搜尋不會看到清空或只寫一半的學期
+        run_id = self.db.begin_staging(semester_id)
+        total_clubs = total_students = 0
+        for class_id in sorted(htmls):
+            print(f"正在寫入 ClassID {class_id}...", end=" ")
+            count = self._stage_class(run_id, class_id, self.parse_class_students(class_id, htmls[class_id]),
+                                      club_list)
+            total_students += count
+            total_clubs += bool(count)
+
+        if total_clubs == 0:
+            print("\n⚠️ 沒有爬到任何社團，保留原有資料")
+            self.db.discard_staging(run_id)
+            self._finish_crawl(semester_name, updated=False)
+            return semester_id, False
 
-        # 爬取每個 ClassID
-        total_students = 0
-        total_clubs = 0
+        # 一次切換為新資料（同時更新時間戳）
+        with self.metrics.span('publish', clubs=total_clubs, rows=total_students):
+            self.db.publish_staging(run_id)
+        with self._pages_lock:
+            digests = {page: content_digest(info['content']) for page, info in self._pages.items()}
+        self._record_published(semester_name, digests)
 
-        for class_id in class_id_range:
-            print(f"正在爬取 ClassID {class_id}...", end=" ")
+        print(f"\n✅ 完成！共爬取 {total_clubs} 個社團，{total_students} 位學生")
+        self._finish_crawl(semester_name, updated=True)
 
-            students = self.get_class_students(class_id)
+        return semester_id, True
 
-            if students:
-                club_number = students[0]['club_number']
-                club_name = club_list.get(club_number, f"未知社團 ({club_number})")
+    @property
+    def _db_key(self) -> str:
+        db = getattr(self.db, 'db', self.db)  # CloudDatabase 代理實際的資料庫
+        return f"{type(db).__name__}:{getattr(db, 'db_path', '')}"
 
-                # 儲存社團
-                db_club_id = self.db.save_club(semester_id, class_id, club_number, club_name)
+    def _resolve_cached_semester(self) -> Optional[Tuple[int, str]]:
+        """
+        不連線判斷目前學期是否已有快取
+        1. 依學期判斷規則，今天所屬的學期已由網站日期建立且有資料 → 學期沒有變動
+        2. 日曆上已換學期，但最近已連線確認網站仍是已快取的學期 → 短時間內不再確認
+        :return: (semester_id, 學期名稱)，需要連線確認時回傳 None
+        """
+        try:
+            semester = self.db.get_current_semester()
+            if semester is not None and self.db.is_semester_cached(semester.id):
+                return semester.id, semester.semester
+
+            confirmed = _confirmed_semesters.get(self._db_key)
+            if confirmed is not None and time.time() - confirmed[0] < self.semester_recheck:
+                checked_at, semester_id, semester_name = confirmed
+                if self.db.is_semester_cached(semester_id):
+                    return semester_id, semester_name
+        except Exception as e:
+            print(f"⚠️ 無法由學期日曆判斷快取: {e}")
 
-                # 儲存學生
-                for student in students:
-                    self.db.save_student(
-                        db_club_id,
-                        student['name'],
-                        student['student_id'],
-                        student['grade'],
-                        student['seat']
-                    )
+        return None
 
-                print(f"✓ {len(students)} 位學生")
-                total_students += len(students)
-                total_clubs += 1
-            else:
-                print("✗")
+    def replay_semester(self, semester_name: str):
+        """
+        由頁面封存重建學期資料（不連線）：名單頁以多個程序並行解析，依 ClassID 順序寫入暫存表後一次切換
+        :param semester_name: 學期名稱（如 "114下"）
+        :return: (semester_id, 是否更新)
+        """
+        self.metrics.reset()
+        with self._pages_lock:
+            self._pages = {}
 
-            time.sleep(0.3)  # 避免請求過快
+        manifest = self.archive.load_manifest(semester_name) if self.archive is not None else None
+        main_html = self.archive.read_page(semester_name, 'main.asp') if manifest else None
+        date_str = parse_semester_date(main_html) if main_html else None
+        if not date_str:
+            message = f"沒有學期 {semester_name} 的頁面封存"
+            print(f"⚠️ {message}")
+            self._finish_crawl(semester_name, updated=False, aborted=message)
+            return None, False
 
-        # 更新時間戳
-        self.db.update_semester_timestamp(semester_id)
+        semester_id = self.db.get_or_create_semester(date_str)
+        print(f"🗄️ 由封存重建學期 {semester_name} (ID: {semester_id})，日期 {date_str}")
+
+        with self.metrics.span('parse', page='main.asp'):
+            club_list = parse_club_list(main_html)
+        if not club_list:
+            message = f"學期 {semester_name} 的 main.asp 封存沒有社團列表"
+            print(f"⚠️ {message}")
+            self._finish_crawl(semester_name, updated=False, aborted=message)
+            return semester_id, False
 
-        print(f"\n✅ 完成！共爬取 {total_clubs} 個社團，{total_students} 位學生")
+        pages = sorted((int(entry.get('class_id') or page.rsplit('=', 1)[1]), entry['sha256'])
+                       for page, entry in manifest['pages'].items() if page.startswith('list.asp'))
+        class_ids = [class_id for class_id, _ in pages]
+
+        with self.metrics.span('archive_read', pages=len(pages)):
+            htmls = [decode_page(self.archive.get(semester_name, digest)) for _, digest in pages]
+        self.metrics.count('pages', len(htmls))
+
+        # 解析（BeautifulSoup）是重建時主要的耗時，交給多個程序
+        with self.metrics.span('parse', page='list.asp', pages=len(htmls)):
+            with ProcessPoolExecutor() as pool:
+                rosters = list(pool.map(parse_class_page, htmls, chunksize=4))
+
+        run_id = self.db.begin_staging(semester_id)
+        total_clubs = total_students = 0
+        for class_id, students in zip(class_ids, rosters):
+            print(f"正在重建 ClassID {class_id}...", end=" ")
+            count = self._stage_class(run_id, class_id, students, club_list)
+            total_students += count
+            total_clubs += bool(count)
+
+        if total_clubs == 0:
+            print("\n⚠️ 封存中沒有任何社團，保留原有資料")
+            self.db.discard_staging(run_id)
+            self._finish_crawl(semester_name, updated=False)
+            return semester_id, False
+
+        with self.metrics.span('publish', clubs=total_clubs, rows=total_students):
+            self.db.publish_staging(run_id)
+        self._record_published(semester_name, {
+            page: entry['sha256'] for page, entry in manifest['pages'].items()
+            if page == 'main.asp' or page.startswith('list.asp')})
+
+        print(f"\n✅ 完成！由封存重建 {total_clubs} 個社團，{total_students} 位學生")
+        self._finish_crawl(semester_name, updated=True)
 
         return semester_id, True
 
+    def _fetch_class_pages(self, class_ids, budget: ErrorBudget) -> Dict[int, str]:
+        """
+        並行抓取多個 ClassID 的名單頁（不解析）
+        重試後仍失敗時記入錯誤預算（預算用完時拋出 CrawlAborted）
+        :return: {ClassID: HTML}，失敗的 ClassID 不在其中
+        """
+        htmls = {}
+        with closing(self._fetch_classes(class_ids)) as results:
+            for class_id, html, error in results:
+                print(f"正在爬取 ClassID {class_id}...", end=" ")
+                if isinstance(error, (CrawlAborted, LoginError)):
+                    raise error
+                if error is not None:
+                    print(f"✗ {error}")
+                    self.metrics.count('failed_classes')
+                    budget.record_failure(class_id)
+                    if budget.exhausted:
+                        raise CrawlAborted(f"失敗的 ClassID 超過 {budget.max_failures} 個")
+                    continue
+
+                budget.record_success(class_id)
+                htmls[class_id] = html
+                print("✓")
+        return htmls
+
+    def _fetch_classes(self, class_ids):
+        """
+        以執行緒並行抓取名單頁，並行數由 self.concurrency 依回應延遲與錯誤調整
+        依 ClassID 順序產生 (class_id, HTML, 錯誤)；中途停止時取消尚未開始的抓取
+        """
+        pool = ThreadPoolExecutor(max_workers=self.concurrency.max_limit)
+        try:
+            futures = [(class_id, pool.submit(self._fetch_class, class_id)) for class_id in class_ids]
+            for class_id, future in futures:
+                try:
+                    yield class_id, future.result(), None
+                except Exception as e:
+                    yield class_id, None, e
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _fetch_class(self, class_id: int) -> str:
+        with self.concurrency.slot() as issued_at:
+            self._slot.issued_at = issued_at
+            return self.get_class_page(class_id)
+
+    def _stage_class(self, run_id: int, class_id: int, students: List[RosterEntry], club_list: dict) -> int:
+        """
+        將一個 ClassID 的名單寫入暫存表
+        :return: 學生數（沒有這個 ClassID 時為 0）
+        """
+        if students:
+            club_number = students[0].club_number
+            club_name = club_list.get(club_number, f"未知社團 ({club_number})")
+
+            with self.metrics.span('db_write', class_id=class_id, rows=len(students)):
+                self.db.stage_club(run_id, class_id, club_number, club_name, [
+                    (student.name, student.student_id, student.grade, student.seat)
+                    for student in students
+                ])
+            self.metrics.count('rows', len(students))
+
+            print(f"✓ {len(students)} 位學生")
+        else:
+            print("✗")
+
+        return len(students)
+
+    def _pages_unchanged(self, semester_name: str) -> bool:
+        """
+        本次抓到的頁面是否與該學期最近一次發佈時的頁面完全相同
+        沒有發佈紀錄、或之後資料庫又有其他寫入（資料版本號不同）時視為有變動
+        """
+        published = self.archive.load_published(semester_name) if self.archive is not None else None
+        if not published or published.get('generation') != self.db.get_data_generation():
+            return False
+
+        with self._pages_lock:
+            digests = {page: content_digest(info['content']) for page, info in self._pages.items()}
+
+        # 上次有、這次沒抓到的名單頁也算變動
+        return digests == published['pages']
+
+    def _record_published(self, semester_name: str, digests: Dict[str, str]):
+        """發佈成功後記錄資料來自哪些頁面，供下次更新判斷頁面是否有變動"""
+        if self.archive is None:
+            return
+        try:
+            self.archive.save_published(semester_name, digests, self.db.get_data_generation())
+        except OSError as e:
+            print(f"⚠️ 無法寫入發佈紀錄: {e}")
+
+    def _archive_pages(self, semester_name: Optional[str]):
+        """將本次抓到的頁面存入該學期的封存（中止的爬取也保存已抓到的頁面）"""
+        with self._pages_lock:
+            pages, self._pages = self._pages, {}
+        if self.archive is None or not semester_name or not pages:
+            return
+
+        try:
+            with self.metrics.span('archive_write', pages=len(pages)):
+                self.archive.save_pages(semester_name, pages)
+            self.metrics.count('archived_pages', len(pages))
+        except OSError as e:
+            print(f"⚠️ 無法寫入頁面封存: {e}")
+
+    def _finish_crawl(self, semester_name: Optional[str], updated: bool, aborted: Optional[str] = None,
+                      failed_classes: Optional[List[int]] = None):
+        """輸出並保存本次爬取的計時摘要，並將抓到的頁面存入封存"""
+        self._archive_pages(semester_name)
+        if self.client is not None and self.client.rate_limit_wait:
+            self.metrics.count('rate_limit_wait_ms', round(self.client.rate_limit_wait * 1000))
+        self.last_summary = self.metrics.summary()
+        self.last_summary['semester'] = semester_name
+        self.last_summary['updated'] = updated
+        self.last_summary['aborted'] = aborted
+        self.last_summary['failed_classes'] = list(failed_classes or [])
+        self.last_summary['circuit_opens'] = self.breaker.open_count
+        self.last_summary['concurrency'] = self.concurrency.snapshot()
+
+        self.metrics.log_event('crawl_summary', **self.last_summary)
+
+        # 更新 session 的最後使用時間，下次爬取可以沿用
+        if self.client is not None:
+            self.client.save()
+
+        print("\n⏱️ 計時摘要")
+        print(self.metrics.format_summary())
+
 
 if __name__ == "__main__":
     # 測試用
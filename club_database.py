@@ -3,70 +3,503 @@
 社團資料庫管理系統
 """
 
+import os
+import base64
 import sqlite3
 import json
 import re
+import time
+import threading
+from collections import OrderedDict, deque
+from collections.abc import Mapping
 from datetime import datetime
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Tuple, Iterator
 import requests
 from bs4 import BeautifulSoup
+from instrumentation import recorder
+from bloom_filter import NameFilters
+from records import (Page, SearchResult, RosterRow, ClubRecord, StudentSummary, SemesterRecord,
+                     SemesterChange, ClubGradeCount, ClassParticipation)
+from db_migrations import run_migrations
+
+
+# 最近的慢查詢紀錄（供除錯面板顯示）
+slow_queries = deque(maxlen=100)
+
+
+class _ThreadConnections(dict):
+    """
+    單一執行緒的查詢連線 {db_path: connection}
+    存放在 threading.local 中，執行緒結束時隨之釋放並關閉所有連線（不會一直佔用 WAL 的讀取位置）
+    """
+
+    def close(self, db_path: Optional[str] = None):
+        for path in ([db_path] if db_path is not None else list(self)):
+            conn = self.pop(path, None)
+            if conn is not None:
+                conn.close()
+
+    def __del__(self):
+        self.close()
+
+
+# 每個執行緒共用的查詢連線
+_read_connections = threading.local()
+
+
+def close_read_connections(db_path: Optional[str] = None):
+    """關閉本執行緒共用的查詢連線（未指定 db_path 時全部關閉）"""
+    conns = getattr(_read_connections, 'conns', None)
+    if conns is not None:
+        conns.close(db_path)
+
+
+# 已載入的姓名 filter {檔案路徑: ((inode, mtime), NameFilters)}
+_name_filter_cache = {}
+
+# 無法寫入的姓名 filter {檔案路徑: 資料版本號}；同一版本不在每次建立 ClubDatabase 時重新掃描搜尋表
+_name_filter_failures = {}
+
+# 社團名單快取 {(db_path, semester_id): (資料版本號, {社團編號: [RosterRow]})}，保留最近使用的學期
+_roster_cache = OrderedDict()
+_roster_cache_lock = threading.Lock()
+ROSTER_CACHE_SEMESTERS = 8
+
+# 學期排序鍵：同學年的下學期排在上學期之後（s 為 semesters 的別名）
+SEMESTER_SORT_KEY = "(s.year * 2 + CASE s.term WHEN '下' THEN 1 ELSE 0 END)"
+
+# 搜尋結果欄位（對應 SearchResult）與分頁排序鍵（與搜尋表主鍵相同）
+SEARCH_COLUMNS = ('st.semester, st.class_id, st.club_number, st.club_name, '
+                  'st.student_id, st.student_name, st.grade, st.seat_number')
+SEARCH_KEYS = [('st.semester_key', 'DESC'), ('st.class_id', 'ASC'), ('st.student_row_id', 'ASC')]
+
+# 學期欄位（對應 SemesterRecord）與分頁排序鍵
+SEMESTER_COLUMNS = 's.id, s.semester, s.year, s.term, s.last_updated, s.source_date'
+SEMESTER_KEYS = [(SEMESTER_SORT_KEY, 'DESC'), ('s.id', 'ASC')]
+
+# 年級名單欄位（對應 RosterRow）與分頁排序鍵；可能為 NULL 的欄位以 COALESCE 轉為可比較的值
+ROSTER_COLUMNS = ('st.grade_year, st.class_num, st.seat_number, st.student_id, st.student_name, '
+                  'st.grade, c.class_id, c.club_number, c.club_name')
+ROSTER_KEYS = [('COALESCE(st.grade_year, 0)', 'ASC'), ('COALESCE(st.class_num, 0)', 'ASC'),
+               ("COALESCE(st.seat_number, '')", 'ASC'), ('c.class_id', 'ASC'), ('st.id', 'ASC')]
+
+# 學期異動欄位（對應 SemesterChange）
+CHANGE_COLUMNS = 'change_type, student_id, student_name, grade_year, class_num, old_clubs, new_clubs'
+
+CHINESE_DIGITS = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
+
+
+class CursorError(ValueError):
+    """分頁游標格式錯誤或與查詢不符"""
+
+
+def encode_cursor(values) -> str:
+    """分頁游標：排序鍵的值編碼為不透明字串（可放在網址或 session 中）"""
+    return base64.urlsafe_b64encode(json.dumps(list(values), ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> list:
+    """解回分頁游標的排序鍵；格式不符時拋出 CursorError"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise CursorError(f"分頁游標格式錯誤: {cursor}") from e
+    if not isinstance(values, list):
+        raise CursorError(f"分頁游標格式錯誤: {cursor}")
+    return values
+
+
+def parse_grade(grade: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    將年級班級字串解析為整數
+    例如: "1年5班" -> (1, 5)，"三年二班" -> (3, 2)，無法解析 -> (None, None)
+    """
+    if not grade:
+        return None, None
+
+    match = re.search(r'([\d一二三四五六七八九十]+)\s*年\s*([\d一二三四五六七八九十]+)\s*班', grade)
+    if not match:
+        return None, None
+
+    def to_int(text):
+        if text.isdigit():
+            return int(text)
+        if len(text) == 1:
+            return CHINESE_DIGITS.get(text)
+        return None
+
+    grade_year, class_num = to_int(match.group(1)), to_int(match.group(2))
+    if grade_year is None or class_num is None:
+        return None, None
+    return grade_year, class_num
+
+
+def refresh_student_identities(cursor, semester_id: int):
+    """
+    依該學期目前的名單更新學生身分表（student_identities）與年級歷程（student_grade_history），
+    並將 students.identity_id 連到對應的身分
+    需在呼叫端的交易中執行
+    """
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS affected_identities (id INTEGER PRIMARY KEY)')
+    cursor.execute('DELETE FROM affected_identities')
+
+    # 舊歷程（學期重新發佈或清除時）
+    cursor.execute('''
+        INSERT OR IGNORE INTO affected_identities
+        SELECT identity_id FROM student_grade_history WHERE semester_id = ?
+    ''', (semester_id,))
+    cursor.execute('DELETE FROM student_grade_history WHERE semester_id = ?', (semester_id,))
+
+    # 新出現的學號建立身分
+    cursor.execute('''
+        INSERT OR IGNORE INTO student_identities (student_id, student_name)
+        SELECT st.student_id, MIN(st.student_name)
+        FROM students st
+        JOIN clubs c ON st.club_id = c.id
+        WHERE c.semester_id = ? AND st.student_id IS NOT NULL AND st.student_id != ''
+        GROUP BY st.student_id
+    ''', (semester_id,))
+
+    cursor.execute('''
+        UPDATE students
+        SET identity_id = (
+            SELECT i.id FROM student_identities i WHERE i.student_id = students.student_id
+        )
+        WHERE club_id IN (SELECT id FROM clubs WHERE semester_id = ?)
+    ''', (semester_id,))
+
+    # 每位學生每學期一筆歷程（參加多個社團時年級班級相同）
+    cursor.execute('''
+        INSERT OR REPLACE INTO student_grade_history
+            (identity_id, semester_id, student_name, grade_year, class_num, grade)
+        SELECT st.identity_id, c.semester_id, MIN(st.student_name), MIN(st.grade_year),
+               MIN(st.class_num), MIN(st.grade)
+        FROM students st
+        JOIN clubs c ON st.club_id = c.id
+        WHERE c.semester_id = ? AND st.identity_id IS NOT NULL
+        GROUP BY st.identity_id
+    ''', (semester_id,))
+    cursor.execute('''
+        INSERT OR IGNORE INTO affected_identities
+        SELECT identity_id FROM student_grade_history WHERE semester_id = ?
+    ''', (semester_id,))
+
+    # 已沒有任何歷程的身分移除，其餘更新為最近一學期的姓名與年級
+    cursor.execute('''
+        DELETE FROM student_identities
+        WHERE id IN (SELECT id FROM affected_identities)
+          AND NOT EXISTS (
+              SELECT 1 FROM student_grade_history h WHERE h.identity_id = student_identities.id
+          )
+    ''')
+    # 每位身分一次 GROUP BY（歷程主鍵已依身分排列，不需排序）；只有一個 MAX()/MIN() 時，
+    # 其他欄位取自最大（最小）值所在的列（SQLite 的 bare column 規則），比視窗函式少兩次排序
+    cursor.execute(f'''
+        WITH history AS (
+            SELECT h.identity_id, h.semester_id, h.student_name, h.grade_year, h.class_num,
+                   {SEMESTER_SORT_KEY} AS semester_key
+            FROM student_grade_history h
+            JOIN semesters s ON s.id = h.semester_id
+            WHERE h.identity_id IN (SELECT id FROM affected_identities)
+        )
+        UPDATE student_identities
+        SET student_name = latest.student_name,
+            first_semester_id = earliest.semester_id,
+            last_semester_id = latest.semester_id,
+            last_grade_year = latest.grade_year,
+            last_class_num = latest.class_num,
+            semester_count = latest.semester_count
+        FROM (
+            SELECT identity_id, semester_id, student_name, grade_year, class_num,
+                   MAX(semester_key), COUNT(*) AS semester_count
+            FROM history
+            GROUP BY identity_id
+        ) AS latest
+        JOIN (
+            SELECT identity_id, semester_id, MIN(semester_key)
+            FROM history
+            GROUP BY identity_id
+        ) AS earliest ON earliest.identity_id = latest.identity_id
+        WHERE student_identities.id = latest.identity_id
+    ''')
+
+
+def refresh_search_index(cursor, semester_id: int):
+    """
+    重建某學期在搜尋表（search_index）中的資料
+    搜尋表已合併學生、社團、學期欄位並依顯示順序排列，search_student 不需 JOIN 與排序
+    需在呼叫端的交易中執行
+    """
+    cursor.execute('DELETE FROM search_index WHERE semester_id = ?', (semester_id,))
+    cursor.execute(f'''
+        INSERT INTO search_index (
+            student_name, semester_key, class_id, student_row_id, semester_id,
+            grade_year, class_num, semester, club_number, club_name,
+            student_id, grade, seat_number
+        )
+        SELECT st.student_name, {SEMESTER_SORT_KEY}, c.class_id, st.id, c.semester_id,
+               st.grade_year, st.class_num, s.semester, c.club_number, c.club_name,
+               st.student_id, st.grade, st.seat_number
+        FROM students st
+        JOIN clubs c ON st.club_id = c.id
+        JOIN semesters s ON c.semester_id = s.id
+        WHERE c.semester_id = ?
+    ''', (semester_id,))
+
+
+# 跨學期比對學生的鍵：有學號時以學號比對，否則以姓名加年級（換算到比較學期的年級）比對
+_STUDENT_KEY = (
+    "CASE WHEN st.student_id IS NOT NULL AND st.student_id != '' THEN 'id:' || st.student_id "
+    "ELSE 'name:' || st.student_name || ':' || COALESCE(st.grade_year + :{delta}, '') END"
+)
+
+# 某學期每位學生一列，社團編號依序以逗號串接，兩學期的社團列表可以直接比較
+# 一般的 group_concat 不保證串接順序（外層 GROUP BY 會重新排序，子查詢的 ORDER BY 不會保留）；
+# 視窗函式依視窗的 ORDER BY 逐列累加，整個分區的結果即為排序後的社團列表
+_SEMESTER_STUDENTS = '''
+        SELECT student_key, MIN(student_id) AS student_id, MIN(student_name) AS student_name,
+               MIN(grade_year) AS grade_year, MIN(class_num) AS class_num, MIN(clubs) AS clubs
+        FROM (
+            SELECT student_key, student_id, student_name, grade_year, class_num,
+                   group_concat(club_number, ',') OVER (
+                       PARTITION BY student_key ORDER BY club_number
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                   ) AS clubs
+            FROM (
+                SELECT {student_key} AS student_key, st.student_id, st.student_name,
+                       st.grade_year, st.class_num, c.club_number
+                FROM students st
+                JOIN clubs c ON st.club_id = c.id
+                WHERE c.semester_id = :{semester}
+            )
+        )
+        GROUP BY student_key
+'''
+
+# 兩個學期間的異動：joined（新加入）、dropped（沒有再參加）、changed（換社團）
+SEMESTER_DIFF_SQL = f'''
+    WITH cur AS ({_SEMESTER_STUDENTS.format(student_key=_STUDENT_KEY.format(delta='zero'), semester='new_id')}),
+    prev AS ({_SEMESTER_STUDENTS.format(student_key=_STUDENT_KEY.format(delta='delta'), semester='old_id')})
+    SELECT 'joined' AS change_type, cur.student_key AS student_key, cur.student_id AS student_id,
+           cur.student_name AS student_name, cur.grade_year AS grade_year, cur.class_num AS class_num,
+           NULL AS old_clubs, cur.clubs AS new_clubs
+    FROM cur LEFT JOIN prev ON prev.student_key = cur.student_key
+    WHERE prev.student_key IS NULL
+    UNION ALL
+    SELECT 'dropped', prev.student_key, prev.student_id, prev.student_name, prev.grade_year, prev.class_num,
+           prev.clubs, NULL
+    FROM prev LEFT JOIN cur ON cur.student_key = prev.student_key
+    WHERE cur.student_key IS NULL
+    UNION ALL
+    SELECT 'changed', cur.student_key, cur.student_id, cur.student_name, cur.grade_year, cur.class_num,
+           prev.clubs, cur.clubs
+    FROM cur JOIN prev ON prev.student_key = cur.student_key
+    WHERE cur.clubs != prev.clubs
+'''
+
+
+def _semester_diff_params(cursor, old_id: int, new_id: int) -> dict:
+    """比對參數；年級差為兩學期的學年差（同學年的上、下學期年級相同）"""
+    years = dict(cursor.execute(
+        'SELECT id, year FROM semesters WHERE id IN (?, ?)', (old_id, new_id)).fetchall())
+    return {'old_id': old_id, 'new_id': new_id, 'zero': 0,
+            'delta': years.get(new_id, 0) - years.get(old_id, 0)}
+
+
+def _adjacent_semester(cursor, semester_id: int, newer: bool) -> Optional[int]:
+    """有資料的前一個（或下一個）學期"""
+    comparison, order = ('>', 'ASC') if newer else ('<', 'DESC')
+    row = cursor.execute(f'''
+        SELECT s.id FROM semesters s
+        WHERE {SEMESTER_SORT_KEY} {comparison} (
+                  SELECT {SEMESTER_SORT_KEY} FROM semesters s WHERE s.id = ?
+              )
+          AND EXISTS (SELECT 1 FROM clubs c WHERE c.semester_id = s.id)
+        ORDER BY {SEMESTER_SORT_KEY} {order}
+        LIMIT 1
+    ''', (semester_id,)).fetchone()
+    return row[0] if row else None
+
+
+def refresh_semester_changes(cursor, semester_id: int):
+    """
+    重新計算該學期與前一學期的異動（semester_changes）
+    下一個學期以該學期為比較基準，一併重新計算
+    需在呼叫端的交易中執行
+    """
+    targets = [semester_id]
+    next_id = _adjacent_semester(cursor, semester_id, newer=True)
+    if next_id is not None:
+        targets.append(next_id)
+
+    for target in targets:
+        cursor.execute('DELETE FROM semester_changes WHERE semester_id = ?', (target,))
+
+        has_data = cursor.execute(
+            'SELECT 1 FROM clubs WHERE semester_id = ? LIMIT 1', (target,)).fetchone()
+        previous_id = _adjacent_semester(cursor, target, newer=False)
+        if not has_data or previous_id is None:
+            continue
+
+        params = _semester_diff_params(cursor, previous_id, target)
+        params['target'] = target
+        cursor.execute(f'''
+            INSERT INTO semester_changes (
+                change_type, student_key, student_id, student_name, grade_year, class_num,
+                old_clubs, new_clubs, semester_id, previous_semester_id
+            )
+            SELECT *, :target, :old_id FROM ({SEMESTER_DIFF_SQL})
+        ''', params)
+
+
+def refresh_club_stats(cursor, semester_id: int):
+    """
+    重新計算某學期的統計表（club_grade_stats、class_participation）
+    每張表一次 GROUP BY，查詢統計時不必讀取學生資料
+    需在呼叫端的交易中執行
+    """
+    cursor.execute('DELETE FROM club_grade_stats WHERE semester_id = ?', (semester_id,))
+    cursor.execute('''
+        INSERT INTO club_grade_stats (semester_id, class_id, grade_year, club_number, club_name, student_count)
+        SELECT c.semester_id, c.class_id, COALESCE(st.grade_year, 0), c.club_number, c.club_name, COUNT(*)
+        FROM clubs c
+        JOIN students st ON st.club_id = c.id
+        WHERE c.semester_id = ?
+        GROUP BY c.class_id, COALESCE(st.grade_year, 0)
+    ''', (semester_id,))
+
+    # 同一位學生參加多個社團只算一次：有學號時以學號區分，否則以姓名區分
+    cursor.execute('DELETE FROM class_participation WHERE semester_id = ?', (semester_id,))
+    cursor.execute('''
+        INSERT INTO class_participation (semester_id, grade_year, class_num, participants, enrollments,
+                                         max_seat_number)
+        SELECT c.semester_id, st.grade_year, st.class_num,
+               COUNT(DISTINCT CASE WHEN st.student_id IS NOT NULL AND st.student_id != ''
+                                   THEN 'id:' || st.student_id ELSE 'name:' || st.student_name END),
+               COUNT(*),
+               NULLIF(MAX(CAST(st.seat_number AS INTEGER)), 0)
+        FROM clubs c
+        JOIN students st ON st.club_id = c.id
+        WHERE c.semester_id = ? AND st.grade_year IS NOT NULL AND st.class_num IS NOT NULL
+        GROUP BY st.grade_year, st.class_num
+    ''', (semester_id,))
+
+
+def refresh_derived_tables(cursor, semester_id: int):
+    """
+    重新計算某學期所有由學生名單衍生的資料表（學生身分、搜尋表、學期異動、統計表）
+    需在呼叫端的交易中執行
+    """
+    refresh_student_identities(cursor, semester_id)
+    refresh_search_index(cursor, semester_id)
+    refresh_semester_changes(cursor, semester_id)
+    refresh_club_stats(cursor, semester_id)
+
+
+def rebuild_derived_tables(cursor):
+    """
+    重新計算所有學期的衍生資料表（資料表 migration 後補上既有資料時使用）
+    需在呼叫端的交易中執行
+    """
+    for (semester_id,) in cursor.execute('SELECT id FROM semesters ORDER BY id').fetchall():
+        refresh_derived_tables(cursor, semester_id)
 
 
 class ClubDatabase:
-    def __init__(self, db_path='club_data.db'):
+    def __init__(self, db_path='club_data.db', slow_query_ms: Optional[float] = None):
+        """
+        :param db_path: SQLite 檔案路徑
+        :param slow_query_ms: 慢查詢門檻（毫秒），超過時記錄 SQL、參數與查詢計畫；
+                              未指定時讀取環境變數 CLUB_SLOW_QUERY_MS，皆未設定則不記錄
+        """
         self.db_path = db_path
+        self.name_filter_path = f"{db_path}.bloom"
+
+        if slow_query_ms is None and os.getenv('CLUB_SLOW_QUERY_MS'):
+            try:
+                slow_query_ms = float(os.getenv('CLUB_SLOW_QUERY_MS'))
+            except ValueError:
+                print(f"⚠️ CLUB_SLOW_QUERY_MS 不是數字（{os.getenv('CLUB_SLOW_QUERY_MS')!r}），不記錄慢查詢")
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = os.getenv('CLUB_SLOW_QUERY_LOG')
+
         self.init_database()
 
     def init_database(self):
-        """初始化資料庫"""
-        conn = sqlite3.connect(self.db_path)
+        """初始化資料庫：套用尚未執行的資料表 migration（已是最新版本時不執行任何 DDL）"""
+        run_migrations(self.db_path)
+
+        # 姓名 filter 不存在或與資料庫版本不符（例如資料庫檔案被整個替換）時重建；版本相同時不重建
+        filters = self._name_filters()
+        generation = self.get_data_generation()
+        if (filters is None or filters.generation != generation) and \
+                _name_filter_failures.get(self.name_filter_path) != generation:
+            self.rebuild_name_filters()
+
+    def _read_conn(self):
+        """
+        取得本執行緒共用的查詢連線
+        WAL 模式下每次開啟連線都要重新對應 -wal/-shm 檔案，查詢共用連線可省去這段成本；
+        查詢不開啟交易，每次都會讀到最新提交的資料
+        """
+        conns = getattr(_read_connections, 'conns', None)
+        if conns is None:
+            conns = _read_connections.conns = _ThreadConnections()
+
+        conn = conns.get(self.db_path)
+        if conn is None:
+            conn = conns[self.db_path] = sqlite3.connect(self.db_path)
+        return conn
+
+    def close(self):
+        """關閉本執行緒的查詢連線（之後的查詢會重新開啟）"""
+        close_read_connections(self.db_path)
+
+    def _query(self, conn, name: str, sql: str, params=(), record=None) -> list:
+        """
+        執行查詢並記錄延遲到直方圖 query.<name>
+        超過慢查詢門檻時一併記錄查詢計畫
+        :param record: 結果型別（records.py 的 NamedTuple），指定時每列直接建立為該型別
+        """
+        start = time.perf_counter()
         cursor = conn.cursor()
+        if record is not None:
+            make = record._make
+            cursor.row_factory = lambda _cursor, row: make(row)
+        rows = cursor.execute(sql, params).fetchall()
+        ms = (time.perf_counter() - start) * 1000
 
-        # 學期資料表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS semesters (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                semester TEXT UNIQUE NOT NULL,  -- 例如: "114下", "115上"
-                year INTEGER NOT NULL,           -- 例如: 114, 115
-                term TEXT NOT NULL,              -- "上" 或 "下"
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                source_date TEXT                 -- 原始日期字串，如 "2026/3/1"
-            )
-        ''')
+        recorder.observe(f"query.{name}", ms)
+        recorder.record({'span': f"query.{name}", 'ms': round(ms, 3), 'rows': len(rows)})
 
-        # 社團資料表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clubs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                semester_id INTEGER NOT NULL,
-                class_id INTEGER NOT NULL,       -- ClassID (1-50)
-                club_number TEXT NOT NULL,       -- 社團編號 (如 "1-7")
-                club_name TEXT NOT NULL,         -- 社團名稱
-                FOREIGN KEY (semester_id) REFERENCES semesters(id),
-                UNIQUE(semester_id, class_id)
-            )
-        ''')
+        if self.slow_query_ms is not None and ms >= self.slow_query_ms:
+            self._log_slow_query(conn, name, sql, params, ms)
 
-        # 學生資料表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                club_id INTEGER NOT NULL,
-                student_id TEXT,                 -- 學號
-                student_name TEXT NOT NULL,      -- 姓名
-                grade TEXT,                      -- 年級班級 (如 "1年5班")
-                seat_number TEXT,                -- 座號
-                FOREIGN KEY (club_id) REFERENCES clubs(id)
-            )
-        ''')
+        return rows
 
-        # 建立索引加速查詢
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_student_name ON students(student_name)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_semester ON clubs(semester_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_grade ON students(grade)')
+    def _log_slow_query(self, conn, name: str, sql: str, params, ms: float):
+        """記錄慢查詢：SQL、參數與 EXPLAIN QUERY PLAN"""
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
 
-        conn.commit()
-        conn.close()
+        entry = {
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'query': name,
+            'ms': round(ms, 3),
+            'sql': ' '.join(sql.split()),
+            # 具名參數保留名稱與值（list() 只會留下名稱）
+            'params': dict(params) if isinstance(params, Mapping) else list(params),
+            'plan': plan,
+        }
+        slow_queries.append(entry)
+
+        if self.slow_query_log:
+            try:
+                with open(self.slow_query_log, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            except OSError as e:
+                print(f"⚠️ 無法寫入慢查詢紀錄 {self.slow_query_log}: {e}")
+        else:
+            print(f"🐢 慢查詢 {name}: {entry['ms']}ms | {' / '.join(plan)}")
 
     def parse_semester_from_date(self, date_str: str) -> Tuple[int, str]:
         """
@@ -125,18 +558,31 @@ class ClubDatabase:
 
     def is_semester_cached(self, semester_id: int) -> bool:
         """檢查該學期資料是否已經快取"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self._read_conn()
 
-        cursor.execute('''
+        count = self._query(conn, 'is_semester_cached', '''
             SELECT COUNT(*) FROM clubs WHERE semester_id = ?
-        ''', (semester_id,))
-
-        count = cursor.fetchone()[0]
-        conn.close()
+        ''', (semester_id,))[0][0]
 
         return count > 0
 
+    def get_current_semester(self, today: Optional[str] = None) -> Optional[SemesterRecord]:
+        """
+        依學期判斷規則找出今天所屬、且已由網站日期（source_date）建立的學期，不需連線
+        :param today: 日期字串（如 "2026/3/15"），預設為今天
+        :return: 尚未建立時回傳 None（可能已換學期，需要連線確認）
+        """
+        year, term = self.parse_semester_from_date(today or datetime.now().strftime("%Y/%m/%d"))
+        conn = self._read_conn()
+
+        rows = self._query(conn, 'get_current_semester', f'''
+            SELECT {SEMESTER_COLUMNS}
+            FROM semesters s
+            WHERE s.year = ? AND s.term = ? AND s.source_date IS NOT NULL
+        ''', (year, term), record=SemesterRecord)
+
+        return rows[0] if rows else None
+
     def save_club(self, semester_id: int, class_id: int, club_number: str, club_name: str) -> int:
         """儲存社團資料，返回 club_id"""
         conn = sqlite3.connect(self.db_path)
@@ -148,6 +594,7 @@ class ClubDatabase:
         ''', (semester_id, class_id, club_number, club_name))
 
         club_id = cursor.lastrowid
+        self._bump_generation(cursor)
         conn.commit()
         conn.close()
 
@@ -159,27 +606,367 @@ class ClubDatabase:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
+        grade_year, class_num = parse_grade(grade)
         cursor.execute('''
-            INSERT INTO students (club_id, student_id, student_name, grade, seat_number)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (club_id, student_id, student_name, grade, seat_number))
+            INSERT INTO students (club_id, student_id, student_name, grade, seat_number,
+                                  grade_year, class_num)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (club_id, student_id, student_name, grade, seat_number, grade_year, class_num))
 
+        self._bump_generation(cursor)
         conn.commit()
         conn.close()
 
     def search_student(self, student_name: str, semester_id: Optional[int] = None,
-                      grade: Optional[str] = None) -> List[Dict]:
+                      grade: Optional[str] = None, grade_year: Optional[int] = None,
+                      class_num: Optional[int] = None) -> List[SearchResult]:
         """
-        搜尋學生
+        搜尋學生（查詢搜尋表 search_index，一次索引範圍掃描即依學期由新到舊取得結果）
         :param student_name: 學生姓名
         :param semester_id: 學期ID（可選）
         :param grade: 年級班級（可選，如 "1年5班"）
+        :param grade_year: 年級（可選，如 3）
+        :param class_num: 班級（可選，如 5）
         :return: 學生參加的社團列表
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # 姓名一定不存在時直接回傳，不查詢資料庫
+        if not self._may_contain(student_name, semester_id):
+            return []
+
+        conn = self._read_conn()
+
+        where, params = self._search_filter(student_name, semester_id, grade, grade_year, class_num)
+        # 與搜尋表主鍵順序相同，不需另外排序
+        query = f'''
+            SELECT {SEARCH_COLUMNS}
+            FROM search_index st
+            WHERE {where}
+            ORDER BY st.semester_key DESC, st.class_id
+        '''
+
+        rows = self._query(conn, 'search_student', query, params, record=SearchResult)
+
+        return rows
+
+    def search_student_page(self, student_name: str, semester_id: Optional[int] = None,
+                            grade: Optional[str] = None, grade_year: Optional[int] = None,
+                            class_num: Optional[int] = None, after: Optional[str] = None,
+                            limit: int = 50) -> Page:
+        """
+        分頁搜尋學生（keyset 分頁：以上一頁最後一筆的排序鍵接續，不使用 OFFSET）
+        :param after: 上一頁回傳的 next_cursor，第一頁為 None
+        :param limit: 每頁筆數
+        :return: Page(items, next_cursor)，沒有下一頁時 next_cursor 為 None
+        """
+        if not self._may_contain(student_name, semester_id):
+            return Page([], None)
+
+        where, params = self._search_filter(student_name, semester_id, grade, grade_year, class_num)
+        return self._page('search_student_page', SEARCH_COLUMNS, f'FROM search_index st WHERE {where}',
+                          params, SEARCH_KEYS, after, limit, SearchResult)
+
+    def iter_search_student(self, student_name: str, semester_id: Optional[int] = None,
+                            grade: Optional[str] = None, grade_year: Optional[int] = None,
+                            class_num: Optional[int] = None,
+                            batch_size: int = 500) -> Iterator[SearchResult]:
+        """逐筆產生搜尋結果，每次只取一批（記憶體用量與結果總數無關）"""
+        return self._iter_pages(lambda after: self.search_student_page(
+            student_name, semester_id, grade, grade_year, class_num, after, batch_size))
+
+    def _may_contain(self, student_name: str, semester_id: Optional[int]) -> bool:
+        """依姓名 filter 判斷姓名是否可能存在（沒有 filter 時一律視為可能存在）"""
+        filters = self._name_filters()
+        if filters is not None and not filters.may_contain(student_name, semester_id):
+            recorder.count('search.bloom_skip')
+            return False
+        return True
+
+    def _search_filter(self, student_name: str, semester_id: Optional[int], grade: Optional[str],
+                       grade_year: Optional[int], class_num: Optional[int]) -> Tuple[str, list]:
+        """搜尋表的 WHERE 條件與參數"""
+        where = 'st.student_name = ?'
+        params = [student_name]
+
+        if semester_id:
+            # 加上 + 讓查詢規劃器不改用 idx_search_index_semester，維持主鍵範圍掃描、免排序
+            where += ' AND +st.semester_id = ?'
+            params.append(semester_id)
+
+        if grade:
+            parsed_year, parsed_class = parse_grade(grade)
+            if parsed_year is None:
+                where += ' AND st.grade = ?'
+                params.append(grade)
+            else:
+                grade_year, class_num = parsed_year, parsed_class
+
+        where += self._grade_filter(grade_year, class_num, params)
+        return where, params
+
+    def _page(self, name: str, columns: str, from_where: str, params: list,
+              keys: List[Tuple[str, str]], after: Optional[str], limit: int, record) -> Page:
+        """
+        keyset 分頁查詢
+        :param columns: 結果欄位（依 record 欄位順序）
+        :param from_where: FROM ... WHERE ... 子句
+        :param keys: 排序鍵 [(運算式, 'ASC' 或 'DESC')]，需能唯一決定順序且不為 NULL
+        """
+        params = list(params)
+        if after:
+            values = decode_cursor(after)
+            if len(values) != len(keys):
+                raise CursorError(f"分頁游標不符: {after}")
+
+            # (k1, k2, ...) 在排序上位於游標之後：前 i 個鍵相等且第 i+1 個鍵較後
+            clauses = []
+            for i, (expr, direction) in enumerate(keys):
+                parts = [f'{keys[j][0]} = ?' for j in range(i)]
+                parts.append(f"{expr} {'<' if direction == 'DESC' else '>'} ?")
+                clauses.append('(' + ' AND '.join(parts) + ')')
+                params.extend(values[:i + 1])
+            from_where += ' AND (' + ' OR '.join(clauses) + ')'
+
+        key_columns = ', '.join(expr for expr, _ in keys)
+        order_by = ', '.join(f'{expr} {direction}' for expr, direction in keys)
+        query = f'SELECT {columns}, {key_columns} {from_where} ORDER BY {order_by} LIMIT ?'
+        params.append(limit + 1)
+
+        rows = self._query(self._read_conn(), name, query, params)
+
+        width = len(record._fields)
+        items = [record._make(row[:width]) for row in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1][width:]) if len(rows) > limit else None
+        return Page(items, next_cursor)
+
+    @staticmethod
+    def _iter_pages(fetch_page) -> Iterator:
+        """依序取得每一頁並逐筆產生；每頁為獨立的短查詢，不會長時間佔用讀取交易"""
+        after = None
+        while True:
+            page = fetch_page(after)
+            yield from page.items
+            if page.next_cursor is None:
+                return
+            after = page.next_cursor
+
+    def _grade_filter(self, grade_year: Optional[int], class_num: Optional[int], params: list) -> str:
+        """年級、班級的篩選條件（使用整數欄位以便走索引）"""
+        clause = ''
+        if grade_year is not None:
+            clause += ' AND st.grade_year = ?'
+            params.append(grade_year)
+        if class_num is not None:
+            clause += ' AND st.class_num = ?'
+            params.append(class_num)
+        return clause
+
+    def get_grade_roster(self, semester_id: int, grade_year: Optional[int] = None,
+                         class_num: Optional[int] = None) -> List[RosterRow]:
+        """
+        取得某學期某年級/班級所有參加社團的學生
+        :param semester_id: 學期ID
+        :param grade_year: 年級（可選）
+        :param class_num: 班級（可選）
+        :return: 依年級、班級、座號排序的名單
+        """
+        conn = self._read_conn()
+
+        query = '''
+            SELECT
+                st.grade_year,
+                st.class_num,
+                st.seat_number,
+                st.student_id,
+                st.student_name,
+                st.grade,
+                c.class_id,
+                c.club_number,
+                c.club_name
+            FROM students st
+            JOIN clubs c ON st.club_id = c.id
+            WHERE c.semester_id = ?
+        '''
+        params = [semester_id]
+        query += self._grade_filter(grade_year, class_num, params)
+        query += ' ORDER BY st.grade_year, st.class_num, st.seat_number, c.class_id'
+
+        rows = self._query(conn, 'get_grade_roster', query, params, record=RosterRow)
+
+        return rows
+
+    def get_clubs(self, semester_id: int) -> List[ClubRecord]:
+        """取得某學期的所有社團與人數（依 ClassID 排序）"""
+        conn = self._read_conn()
+
+        rows = self._query(conn, 'get_clubs', '''
+            SELECT c.id, c.class_id, c.club_number, c.club_name,
+                   (SELECT COUNT(*) FROM students st WHERE st.club_id = c.id)
+            FROM clubs c
+            WHERE c.semester_id = ?
+            ORDER BY c.class_id
+        ''', (semester_id,), record=ClubRecord)
+
+        return rows
+
+    def get_club_roster(self, semester_id: int, club_number: str) -> List[RosterRow]:
+        """
+        取得某學期某社團的學生名單（順序同 list.asp）
+        第一次查詢某學期時一次載入該學期所有社團的名單並快取，資料版本號變更後重新載入
+        """
+        generation = self.get_data_generation()
+        key = (self.db_path, semester_id)
+
+        with _roster_cache_lock:
+            cached = _roster_cache.get(key)
+            if cached is not None and cached[0] == generation:
+                _roster_cache.move_to_end(key)
+                recorder.count('roster_cache.hit')
+                return cached[1].get(club_number, [])
+
+        recorder.count('roster_cache.miss')
+        rosters = self._load_semester_rosters(semester_id)
+
+        with _roster_cache_lock:
+            _roster_cache[key] = (generation, rosters)
+            _roster_cache.move_to_end(key)
+            while len(_roster_cache) > ROSTER_CACHE_SEMESTERS:
+                _roster_cache.popitem(last=False)
+
+        return rosters.get(club_number, [])
+
+    def _load_semester_rosters(self, semester_id: int) -> Dict[str, List[RosterRow]]:
+        """讀取某學期所有社團的名單 {社團編號: [RosterRow]}"""
+        conn = self._read_conn()
+
+        rows = self._query(conn, 'load_semester_rosters', f'''
+            SELECT {ROSTER_COLUMNS}
+            FROM clubs c
+            JOIN students st ON st.club_id = c.id
+            WHERE c.semester_id = ?
+            ORDER BY c.class_id, st.id
+        ''', (semester_id,), record=RosterRow)
+
+        rosters = {}
+        for row in rows:
+            rosters.setdefault(row.club_number, []).append(row)
+        return rosters
+
+    def get_semester_changes(self, semester_id: int,
+                             change_type: Optional[str] = None) -> List[SemesterChange]:
+        """
+        取得某學期與前一學期相比的異動（發佈學期時已計算好）
+        :param change_type: 'joined'、'dropped' 或 'changed'，未指定時全部取出
+        """
+        conn = self._read_conn()
+
+        query = f'''
+            SELECT {CHANGE_COLUMNS}
+            FROM semester_changes
+            WHERE semester_id = ?
+        '''
+        params = [semester_id]
+        if change_type:
+            query += ' AND change_type = ?'
+            params.append(change_type)
+        query += ' ORDER BY change_type, grade_year, class_num, student_name'
+
+        rows = self._query(conn, 'get_semester_changes', query, params, record=SemesterChange)
+
+        return rows
+
+    def get_change_summary(self, semester_id: int) -> Dict:
+        """
+        某學期異動的人數統計
+        :return: {'previous_semester_id', 'joined', 'dropped', 'changed'}
+        """
+        conn = self._read_conn()
+
+        rows = self._query(conn, 'get_change_summary', '''
+            SELECT change_type, COUNT(*), MIN(previous_semester_id)
+            FROM semester_changes
+            WHERE semester_id = ?
+            GROUP BY change_type
+        ''', (semester_id,))
+
+        summary = {'previous_semester_id': None, 'joined': 0, 'dropped': 0, 'changed': 0}
+        for change_type, count, previous_semester_id in rows:
+            summary[change_type] = count
+            summary['previous_semester_id'] = previous_semester_id
+        return summary
+
+    def diff_semesters(self, old_semester_id: int, new_semester_id: int) -> List[SemesterChange]:
+        """任意兩個學期間的異動（即時計算，不寫入資料庫）"""
+        conn = self._read_conn()
+        params = _semester_diff_params(conn, old_semester_id, new_semester_id)
+
+        rows = self._query(conn, 'diff_semesters', f'''
+            SELECT change_type, student_id, student_name, grade_year, class_num, old_clubs, new_clubs
+            FROM ({SEMESTER_DIFF_SQL})
+            ORDER BY change_type, grade_year, class_num, student_name
+        ''', params, record=SemesterChange)
+
+        return rows
+
+    def get_club_grade_stats(self, semester_id: int) -> List[ClubGradeCount]:
+        """某學期各社團各年級的人數（讀取發佈時已計算好的統計表）"""
+        conn = self._read_conn()
+
+        rows = self._query(conn, 'get_club_grade_stats', '''
+            SELECT class_id, club_number, club_name, grade_year, student_count
+            FROM club_grade_stats
+            WHERE semester_id = ?
+            ORDER BY class_id, grade_year
+        ''', (semester_id,), record=ClubGradeCount)
+
+        return rows
+
+    def get_class_participation(self, semester_id: int,
+                                grade_year: Optional[int] = None) -> List[ClassParticipation]:
+        """某學期各班參加社團的人數與最大座號（讀取發佈時已計算好的統計表）"""
+        conn = self._read_conn()
 
         query = '''
+            SELECT grade_year, class_num, participants, enrollments, max_seat_number
+            FROM class_participation
+            WHERE semester_id = ?
+        '''
+        params = [semester_id]
+        if grade_year is not None:
+            query += ' AND grade_year = ?'
+            params.append(grade_year)
+        query += ' ORDER BY grade_year, class_num'
+
+        rows = self._query(conn, 'get_class_participation', query, params, record=ClassParticipation)
+
+        return rows
+
+    def find_students(self, student_name: str) -> List[StudentSummary]:
+        """
+        依姓名找出所有不同的學生（以學號區分同名學生）
+        :return: 每位學生一筆 StudentSummary，依最近年級、班級排序
+        """
+        conn = self._read_conn()
+
+        rows = self._query(conn, 'find_students', '''
+            SELECT i.student_id, i.student_name, i.last_grade_year, i.last_class_num,
+                   s.semester, i.semester_count
+            FROM student_identities i
+            LEFT JOIN semesters s ON s.id = i.last_semester_id
+            WHERE i.student_name = ?
+            ORDER BY i.last_grade_year, i.last_class_num
+        ''', (student_name,), record=StudentSummary)
+
+        return rows
+
+    def get_student_history(self, student_id: str) -> List[SearchResult]:
+        """
+        取得某位學生（以學號識別）歷年參加的所有社團
+        透過 student_identities 找到身分後，以 students.identity_id 索引一次取出
+        :return: 依學期由新到舊排序，欄位與 search_student 相同
+        """
+        conn = self._read_conn()
+
+        rows = self._query(conn, 'get_student_history', f'''
             SELECT
                 s.semester,
                 c.class_id,
@@ -189,84 +976,67 @@ class ClubDatabase:
                 st.student_name,
                 st.grade,
                 st.seat_number
-            FROM students st
+            FROM student_identities i
+            JOIN students st ON st.identity_id = i.id
             JOIN clubs c ON st.club_id = c.id
             JOIN semesters s ON c.semester_id = s.id
-            WHERE st.student_name = ?
-        '''
+            WHERE i.student_id = ?
+            ORDER BY {SEMESTER_SORT_KEY} DESC, c.class_id
+        ''', (student_id,), record=SearchResult)
 
-        params = [student_name]
-
-        if semester_id:
-            query += ' AND c.semester_id = ?'
-            params.append(semester_id)
-
-        if grade:
-            query += ' AND st.grade = ?'
-            params.append(grade)
-
-        query += ' ORDER BY s.semester DESC, c.class_id'
-
-        cursor.execute(query, params)
-
-        results = []
-        for row in cursor.fetchall():
-            results.append({
-                'semester': row[0],
-                'class_id': row[1],
-                'club_number': row[2],
-                'club_name': row[3],
-                'student_id': row[4],
-                'student_name': row[5],
-                'grade': row[6],
-                'seat_number': row[7]
-            })
-
-        conn.close()
-        return results
+        return rows
 
     def get_latest_semester(self) -> Optional[Tuple[int, str]]:
         """取得最新的學期資料"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self._read_conn()
 
-        cursor.execute('''
+        rows = self._query(conn, 'get_latest_semester', '''
             SELECT id, semester FROM semesters
             ORDER BY year DESC,
                      CASE term WHEN '下' THEN 1 ELSE 0 END DESC
             LIMIT 1
         ''')
 
-        result = cursor.fetchone()
-        conn.close()
-
-        return result if result else None
+        return rows[0] if rows else None
 
-    def get_all_semesters(self) -> List[Dict]:
+    def get_all_semesters(self) -> List[SemesterRecord]:
         """取得所有學期列表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self._read_conn()
 
-        cursor.execute('''
+        rows = self._query(conn, 'get_all_semesters', '''
             SELECT id, semester, year, term, last_updated, source_date
             FROM semesters
             ORDER BY year DESC,
                      CASE term WHEN '下' THEN 1 ELSE 0 END DESC
-        ''')
+        ''', record=SemesterRecord)
 
-        results = []
-        for row in cursor.fetchall():
-            results.append({
-                'id': row[0],
-                'semester': row[1],
-                'year': row[2],
-                'term': row[3],
-                'last_updated': row[4],
-                'source_date': row[5]
-            })
+        return rows
 
-        conn.close()
-        return results
+    def get_semesters_page(self, after: Optional[str] = None, limit: int = 20) -> Page:
+        """分頁取得學期列表（由新到舊）"""
+        return self._page('get_semesters_page', SEMESTER_COLUMNS, 'FROM semesters s WHERE 1 = 1',
+                          [], SEMESTER_KEYS, after, limit, SemesterRecord)
+
+    def iter_semesters(self, batch_size: int = 100) -> Iterator[SemesterRecord]:
+        """逐筆產生學期（由新到舊）"""
+        return self._iter_pages(lambda after: self.get_semesters_page(after, batch_size))
+
+    def get_grade_roster_page(self, semester_id: int, grade_year: Optional[int] = None,
+                              class_num: Optional[int] = None, after: Optional[str] = None,
+                              limit: int = 50) -> Page:
+        """分頁取得某學期某年級/班級的名單（順序同 get_grade_roster）"""
+        params = [semester_id]
+        from_where = 'FROM students st JOIN clubs c ON st.club_id = c.id WHERE c.semester_id = ?'
+        from_where += self._grade_filter(grade_year, class_num, params)
+        return self._page('get_grade_roster_page', ROSTER_COLUMNS, from_where, params,
+                          ROSTER_KEYS, after, limit, RosterRow)
+
+    def iter_grade_roster(self, semester_id: int, grade_year: Optional[int] = None,
+                          class_num: Optional[int] = None,
+                          batch_size: int = 500) -> Iterator[RosterRow]:
+        """逐筆產生某學期某年級/班級的名單"""
+        return self._iter_pages(lambda after: self.get_grade_roster_page(
+            semester_id, grade_year, class_num, after, batch_size))
 
     def update_semester_timestamp(self, semester_id: int):
         """更新學期的最後更新時間"""
@@ -279,11 +1049,20 @@ class ClubDatabase:
             WHERE id = ?
         ''', (semester_id,))
 
+        # 逐筆寫入（save_club / save_student）的爬取最後會呼叫這裡，一併更新學生身分與搜尋表
+        refresh_derived_tables(cursor, semester_id)
+        self._bump_generation(cursor)
         conn.commit()
         conn.close()
 
+        self.rebuild_name_filters()
+
     def clear_semester_data(self, semester_id: int):
-        """清除某學期的所有資料（重新爬取時使用）"""
+        """
+        清除某學期的所有資料（重新爬取時使用）
+        姓名 filter 只移除該學期的部分，不重新掃描整張搜尋表
+        """
+        filters = self._name_filters()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
@@ -300,5 +1079,275 @@ class ClubDatabase:
             DELETE FROM clubs WHERE semester_id = ?
         ''', (semester_id,))
 
+        # 刪除後已取得寫入鎖，此時讀到的版本號不會被其他寫入改變
+        generation = int(cursor.execute(
+            "SELECT value FROM meta WHERE key = 'data_generation'").fetchone()[0])
+        refresh_derived_tables(cursor, semester_id)
+        self._bump_generation(cursor)
+        conn.commit()
+        conn.close()
+
+        if filters is not None and filters.generation == generation:
+            self._drop_semester_filter(filters, semester_id, generation + 1)
+        else:
+            self.rebuild_name_filters()
+
+    def _drop_semester_filter(self, filters: NameFilters, semester_id: int, generation: int):
+        """
+        清除學期後的姓名 filter：移除該學期的 filter 即可
+        所有學期的 filter 仍含已清除的姓名，只會多一些偽陽性（多查一次資料庫），下次發佈時重建
+        """
+        trimmed = NameFilters({key: bloom for key, bloom in filters.filters.items() if key != semester_id},
+                              generation)
+        try:
+            trimmed.save(self.name_filter_path)
+            # 期間若有其他寫入，這份 filter 已過期
+            if self.get_data_generation() != generation:
+                os.remove(self.name_filter_path)
+        except OSError as e:
+            print(f"⚠️ 無法寫入姓名 filter: {e}")
+            _name_filter_failures[self.name_filter_path] = generation
+
+    def _bump_generation(self, cursor):
+        """
+        資料異動後遞增資料版本號
+        姓名 filter 在提交前先移除，讀取端不會以舊的 filter 略過新加入的姓名
+        """
+        cursor.execute('''
+            UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'data_generation'
+        ''')
+        try:
+            os.remove(self.name_filter_path)
+        except FileNotFoundError:
+            pass
+
+    def rebuild_name_filters(self):
+        """依搜尋表重建各學期與所有學期的姓名 filter 並寫入 <db_path>.bloom"""
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        generation = None
+        try:
+            conn.execute('BEGIN')
+            generation = int(conn.execute(
+                "SELECT value FROM meta WHERE key = 'data_generation'").fetchone()[0])
+            rows = conn.execute('SELECT DISTINCT semester_id, student_name FROM search_index').fetchall()
+            conn.execute('COMMIT')
+
+            NameFilters.build(rows, generation).save(self.name_filter_path)
+            _name_filter_failures.pop(self.name_filter_path, None)
+
+            # 建立期間若有其他寫入，這份 filter 已過期
+            current = conn.execute(
+                "SELECT value FROM meta WHERE key = 'data_generation'").fetchone()[0]
+            if int(current) != generation:
+                os.remove(self.name_filter_path)
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ 無法建立姓名 filter: {e}")
+            _name_filter_failures[self.name_filter_path] = generation
+        finally:
+            conn.close()
+
+    def _name_filters(self) -> Optional[NameFilters]:
+        """
+        取得姓名 filter；檔案不存在（資料異動後尚未重建）時回傳 None
+        以 stat 判斷檔案是否已被替換，未變更時不重新讀取
+        """
+        try:
+            stat = os.stat(self.name_filter_path)
+        except OSError:
+            return None
+
+        key = (stat.st_ino, stat.st_mtime_ns)
+        cached = _name_filter_cache.get(self.name_filter_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        try:
+            filters = NameFilters.load(self.name_filter_path)
+        except (OSError, ValueError):
+            return None
+
+        _name_filter_cache[self.name_filter_path] = (key, filters)
+        return filters
+
+    def get_data_generation(self) -> int:
+        """取得資料版本號（每次寫入或發佈學期後遞增）"""
+        conn = self._read_conn()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'data_generation'").fetchone()
+
+        return int(row[0]) if row else 0
+
+    def begin_staging(self, semester_id: int) -> int:
+        """
+        開始一次暫存寫入（爬取期間資料只寫入暫存表，讀取端看不到）
+        同時清除超過一天仍未發佈的暫存資料
+        :return: run_id
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id FROM staging_runs WHERE started_at < datetime('now', '-1 day')
+        ''')
+        for (stale_run_id,) in cursor.fetchall():
+            self._delete_staging(cursor, stale_run_id)
+
+        cursor.execute('''
+            INSERT INTO staging_runs (semester_id) VALUES (?)
+        ''', (semester_id,))
+        run_id = cursor.lastrowid
+
         conn.commit()
         conn.close()
+
+        return run_id
+
+    def stage_club(self, run_id: int, class_id: int, club_number: str, club_name: str,
+                   students: List[Tuple]) -> int:
+        """
+        將一個社團及其學生寫入暫存表（單一交易、批次寫入）
+        同一個 ClassID 再次暫存時取代先前暫存的社團與學生
+        :param students: [(student_name, student_id, grade, seat_number)]
+        :return: 暫存社團 ID
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA synchronous = NORMAL')  # 暫存資料不需每筆都同步到磁碟
+        cursor = conn.cursor()
+
+        # 同一個 ClassID 重新暫存時取代先前的學生（INSERT OR REPLACE 會換掉社團 ID，舊學生不會跟著刪除）
+        cursor.execute('''
+            DELETE FROM staging_students
+            WHERE staging_club_id IN (
+                SELECT id FROM staging_clubs WHERE run_id = ? AND class_id = ?
+            )
+        ''', (run_id, class_id))
+        cursor.execute('''
+            INSERT OR REPLACE INTO staging_clubs (run_id, class_id, club_number, club_name)
+            VALUES (?, ?, ?, ?)
+        ''', (run_id, class_id, club_number, club_name))
+        staging_club_id = cursor.lastrowid
+
+        rows = []
+        for student_name, student_id, grade, seat_number in students:
+            grade_year, class_num = parse_grade(grade)
+            rows.append((staging_club_id, student_name, student_id, grade, seat_number,
+                         grade_year, class_num))
+
+        cursor.executemany('''
+            INSERT INTO staging_students (staging_club_id, student_name, student_id, grade, seat_number,
+                                          grade_year, class_num)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+        conn.commit()
+        conn.close()
+
+        return staging_club_id
+
+    def publish_staging(self, run_id: int) -> Tuple[int, int]:
+        """
+        在單一交易中以暫存資料取代該學期的正式資料
+        讀取端在交易提交前持續看到舊版本（WAL 模式下不會被阻擋），提交後一次看到新版本
+        :return: (社團數, 學生數)
+        """
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        cursor = conn.cursor()
+
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            row = cursor.execute('''
+                SELECT semester_id FROM staging_runs WHERE id = ?
+            ''', (run_id,)).fetchone()
+            if not row:
+                raise ValueError(f"找不到暫存資料 run_id={run_id}")
+            semester_id = row[0]
+
+            club_count = cursor.execute('''
+                SELECT COUNT(*) FROM staging_clubs WHERE run_id = ?
+            ''', (run_id,)).fetchone()[0]
+            if club_count == 0:
+                raise ValueError(f"暫存資料為空，不發佈 (run_id={run_id})")
+
+            # 移除舊版本
+            cursor.execute('''
+                DELETE FROM students
+                WHERE club_id IN (
+                    SELECT id FROM clubs WHERE semester_id = ?
+                )
+            ''', (semester_id,))
+            cursor.execute('DELETE FROM clubs WHERE semester_id = ?', (semester_id,))
+
+            # 寫入新版本
+            cursor.execute('''
+                INSERT INTO clubs (semester_id, class_id, club_number, club_name)
+                SELECT ?, class_id, club_number, club_name
+                FROM staging_clubs
+                WHERE run_id = ?
+                ORDER BY class_id
+            ''', (semester_id, run_id))
+            cursor.execute('''
+                INSERT INTO students (club_id, student_id, student_name, grade, seat_number,
+                                      grade_year, class_num)
+                SELECT c.id, ss.student_id, ss.student_name, ss.grade, ss.seat_number,
+                       ss.grade_year, ss.class_num
+                FROM staging_clubs sc
+                JOIN staging_students ss ON ss.staging_club_id = sc.id
+                JOIN clubs c ON c.semester_id = ? AND c.class_id = sc.class_id
+                WHERE sc.run_id = ?
+                ORDER BY sc.class_id, ss.id
+            ''', (semester_id, run_id))
+            student_count = cursor.rowcount
+
+            self._delete_staging(cursor, run_id)
+            refresh_derived_tables(cursor, semester_id)
+            cursor.execute('''
+                UPDATE semesters SET last_updated = CURRENT_TIMESTAMP WHERE id = ?
+            ''', (semester_id,))
+            self._bump_generation(cursor)
+
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        self.rebuild_name_filters()
+        self.publish_snapshot()
+
+        return club_count, student_count
+
+    def publish_snapshot(self) -> Optional[str]:
+        """
+        設定 JKES_SNAPSHOT_DIR 時，將目前的資料版本發佈為唯讀快照（見 snapshots.py）
+        :return: 快照檔路徑，未設定或失敗時回傳 None
+        """
+        snapshot_dir = os.getenv('JKES_SNAPSHOT_DIR')
+        if not snapshot_dir:
+            return None
+
+        from snapshots import publish_snapshot
+        try:
+            return publish_snapshot(self.db_path, snapshot_dir)
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ 無法發佈資料庫快照: {e}")
+            return None
+
+    def discard_staging(self, run_id: int):
+        """放棄暫存資料（爬取失敗時使用，正式資料不受影響）"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        self._delete_staging(cursor, run_id)
+
+        conn.commit()
+        conn.close()
+
+    def _delete_staging(self, cursor, run_id: int):
+        cursor.execute('''
+            DELETE FROM staging_students
+            WHERE staging_club_id IN (
+                SELECT id FROM staging_clubs WHERE run_id = ?
+            )
+        ''', (run_id,))
+        cursor.execute('DELETE FROM staging_clubs WHERE run_id = ?', (run_id,))
+        cursor.execute('DELETE FROM staging_runs WHERE id = ?', (run_id,))
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+club_data.db 的資料表版本管理
+以 PRAGMA user_version 記錄目前版本，啟動時依序套用尚未執行的 migration
+
+migration 只變更資料表結構；新增的衍生資料表（搜尋表、統計表等）以 request_backfill 標記，
+所有 migration 完成後才以目前程式碼的 club_database.rebuild_derived_tables 一次補上既有資料，
+衍生資料表的計算方式日後改變時，舊的 migration 不會用到與當時資料表結構不符的程式碼
+"""
+
+import sqlite3
+import time
+from typing import List, Tuple
+
+
+# [(版本, 說明, 函式)]，依版本排序
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    """註冊 migration；版本號必須連續遞增"""
+    def decorator(func):
+        expected = len(MIGRATIONS) + 1
+        if version != expected:
+            raise ValueError(f"migration 版本應為 {expected}，收到 {version}")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def latest_version() -> int:
+    """程式碼中最新的資料表版本"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_schema_version(conn) -> int:
+    """資料庫目前的資料表版本"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def request_backfill(conn):
+    """標記需要重建衍生資料表（在 migration 的交易中呼叫，與資料表變更一起提交）"""
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('derived_tables_stale', '1')")
+
+
+def _backfill_pending(conn) -> bool:
+    return conn.execute("SELECT 1 FROM meta WHERE key = 'derived_tables_stale'").fetchone() is not None
+
+
+def _run_backfill(conn):
+    """所有 migration 完成後重建衍生資料表；中途失敗時標記保留，下次啟動再試"""
+    from club_database import rebuild_derived_tables
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if _backfill_pending(conn):
+            start = time.perf_counter()
+            rebuild_derived_tables(conn.cursor())
+            conn.execute("DELETE FROM meta WHERE key = 'derived_tables_stale'")
+            print(f"✓ 已重建衍生資料表 ({(time.perf_counter() - start) * 1000:.1f}ms)")
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def run_migrations(db_path: str) -> List[Tuple[int, str, float]]:
+    """
+    套用所有尚未執行的 migration
+    每個 migration 在獨立交易中執行，並記錄耗時到 schema_migrations 資料表
+    :return: 本次套用的 [(版本, 說明, 耗時毫秒)]
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+
+    try:
+        # 已是最新版本時只需讀取 user_version 與重建標記
+        if get_schema_version(conn) >= latest_version() and not _backfill_pending(conn):
+            return applied
+
+        for version, description, func in MIGRATIONS:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # 取得寫入鎖後再確認一次，避免多個程序重複套用
+                if get_schema_version(conn) >= version:
+                    conn.execute('COMMIT')
+                    continue
+
+                start = time.perf_counter()
+                func(conn)
+                duration_ms = (time.perf_counter() - start) * 1000
+
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT NOT NULL,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        duration_ms REAL
+                    )
+                ''')
+                conn.execute('''
+                    INSERT OR REPLACE INTO schema_migrations (version, description, duration_ms)
+                    VALUES (?, ?, ?)
+                ''', (version, description, round(duration_ms, 3)))
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+            applied.append((version, description, duration_ms))
+            print(f"✓ 資料表更新至第 {version} 版：{description} ({duration_ms:.1f}ms)")
+
+        _run_backfill(conn)
+
+        # WAL 模式讓讀取不會被寫入阻擋，發佈學期時讀取端仍看到舊版本直到交易完成
+        # （journal_mode 無法在交易中切換，且設定會保存在資料庫檔案中）
+        conn.execute('PRAGMA journal_mode = WAL')
+    finally:
+        conn.close()
+
+    return applied
+
+
+@migration(1, "建立學期、社團、學生資料表")
+def _create_base_tables(conn):
+    # 學期資料表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS semesters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            semester TEXT UNIQUE NOT NULL,  -- 例如: "114下", "115上"
+            year INTEGER NOT NULL,           -- 例如: 114, 115
+            term TEXT NOT NULL,              -- "上" 或 "下"
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            source_date TEXT                 -- 原始日期字串，如 "2026/3/1"
+        )
+    ''')
+
+    # 社團資料表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS clubs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            semester_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,       -- ClassID (1-50)
+            club_number TEXT NOT NULL,       -- 社團編號 (如 "1-7")
+            club_name TEXT NOT NULL,         -- 社團名稱
+            FOREIGN KEY (semester_id) REFERENCES semesters(id),
+            UNIQUE(semester_id, class_id)
+        )
+    ''')
+
+    # 學生資料表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            club_id INTEGER NOT NULL,
+            student_id TEXT,                 -- 學號
+            student_name TEXT NOT NULL,      -- 姓名
+            grade TEXT,                      -- 年級班級 (如 "1年5班")
+            seat_number TEXT,                -- 座號
+            FOREIGN KEY (club_id) REFERENCES clubs(id)
+        )
+    ''')
+
+
+@migration(2, "依 search_student 查詢計畫建立覆蓋索引")
+def _plan_driven_indexes(conn):
+    # 姓名 + 年級班級 為查詢條件，其餘欄位附加在索引中，查學生時不必回表
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_students_name_cover
+        ON students(student_name, grade, club_id, student_id, seat_number)
+    ''')
+    # 供 clear_semester_data 的 club_id IN (...) 刪除使用
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_club ON students(club_id)')
+
+    # 舊版單欄索引：姓名已被覆蓋索引取代，學期已由 UNIQUE(semester_id, class_id) 涵蓋，
+    # 年級沒有單獨查詢，移除以減少寫入成本
+    conn.execute('DROP INDEX IF EXISTS idx_student_name')
+    conn.execute('DROP INDEX IF EXISTS idx_semester')
+    conn.execute('DROP INDEX IF EXISTS idx_grade')
+
+
+@migration(3, "建立暫存資料表與資料版本號，供學期資料一次性切換")
+def _staging_tables(conn):
+    # 每次爬取一個 staging run，完成後才一次發佈到正式資料表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS staging_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            semester_id INTEGER NOT NULL,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (semester_id) REFERENCES semesters(id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS staging_clubs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            club_number TEXT NOT NULL,
+            club_name TEXT NOT NULL,
+            FOREIGN KEY (run_id) REFERENCES staging_runs(id),
+            UNIQUE(run_id, class_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS staging_students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            staging_club_id INTEGER NOT NULL,
+            student_id TEXT,
+            student_name TEXT NOT NULL,
+            grade TEXT,
+            seat_number TEXT,
+            FOREIGN KEY (staging_club_id) REFERENCES staging_clubs(id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_staging_students_club ON staging_students(staging_club_id)')
+
+    # 資料版本號：每次發佈學期遞增，供快取判斷資料是否變更
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_generation', '0')")
+
+
+@migration(4, "年級、班級拆為整數欄位並建立複合索引")
+def _normalized_grade_columns(conn):
+    from club_database import parse_grade
+
+    for table in ('students', 'staging_students'):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN grade_year INTEGER')  # 年級 (如 1)
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN class_num INTEGER')   # 班級 (如 5)
+
+    # 既有資料補上解析結果
+    rows = conn.execute('SELECT id, grade FROM students').fetchall()
+    conn.executemany(
+        'UPDATE students SET grade_year = ?, class_num = ? WHERE id = ?',
+        [parse_grade(grade) + (student_row_id,) for student_row_id, grade in rows])
+
+    # 姓名搜尋的覆蓋索引改以整數年級、班級作為第二、三欄
+    conn.execute('DROP INDEX IF EXISTS idx_students_name_cover')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_students_name_grade
+        ON students(student_name, grade_year, class_num, club_id, student_id, grade, seat_number)
+    ''')
+    # 依年級/班級列出名單
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_students_grade_class
+        ON students(grade_year, class_num, club_id)
+    ''')
+
+
+@migration(5, "建立跨學期學生身分表與年級歷程")
+def _student_identities(conn):
+    # 以學號識別的學生，記錄最近一學期的姓名與年級
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS student_identities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT UNIQUE NOT NULL,  -- 學號
+            student_name TEXT NOT NULL,       -- 最近一學期的姓名
+            first_semester_id INTEGER,
+            last_semester_id INTEGER,
+            last_grade_year INTEGER,
+            last_class_num INTEGER,
+            semester_count INTEGER DEFAULT 0,
+            FOREIGN KEY (first_semester_id) REFERENCES semesters(id),
+            FOREIGN KEY (last_semester_id) REFERENCES semesters(id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_identities_name ON student_identities(student_name)')
+
+    # 每位學生每學期一筆的年級歷程
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS student_grade_history (
+            identity_id INTEGER NOT NULL,
+            semester_id INTEGER NOT NULL,
+            student_name TEXT NOT NULL,
+            grade_year INTEGER,
+            class_num INTEGER,
+            grade TEXT,
+            PRIMARY KEY (identity_id, semester_id),
+            FOREIGN KEY (identity_id) REFERENCES student_identities(id),
+            FOREIGN KEY (semester_id) REFERENCES semesters(id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grade_history_semester ON student_grade_history(semester_id)')
+
+    conn.execute('ALTER TABLE students ADD COLUMN identity_id INTEGER REFERENCES student_identities(id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_identity ON students(identity_id)')
+
+    # 既有學期建立身分
+    request_backfill(conn)
+
+
+@migration(6, "建立搜尋表，search_student 不需 JOIN 與排序")
+def _search_index_table(conn):
+    # 主鍵即為搜尋順序：姓名 → 學期（新到舊）→ ClassID，資料直接存在主鍵 B-tree 中
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS search_index (
+            student_name TEXT NOT NULL,
+            semester_key INTEGER NOT NULL,   -- 學年 * 2 + (下學期為 1)
+            class_id INTEGER NOT NULL,
+            student_row_id INTEGER NOT NULL, -- students.id
+            semester_id INTEGER NOT NULL,
+            grade_year INTEGER,
+            class_num INTEGER,
+            semester TEXT NOT NULL,
+            club_number TEXT NOT NULL,
+            club_name TEXT NOT NULL,
+            student_id TEXT,
+            grade TEXT,
+            seat_number TEXT,
+            PRIMARY KEY (student_name, semester_key DESC, class_id, student_row_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_search_index_semester ON search_index(semester_id)')
+
+    # 姓名搜尋改由搜尋表負責，學生表的姓名索引不再使用
+    conn.execute('DROP INDEX IF EXISTS idx_students_name_grade')
+
+    request_backfill(conn)
+
+
+@migration(7, "建立學期異動資料表（新加入、沒有再參加、換社團）")
+def _semester_changes(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS semester_changes (
+            semester_id INTEGER NOT NULL,
+            change_type TEXT NOT NULL,           -- joined / dropped / changed
+            student_key TEXT NOT NULL,           -- 學號，或姓名 + 年級
+            previous_semester_id INTEGER NOT NULL,
+            student_id TEXT,
+            student_name TEXT NOT NULL,
+            grade_year INTEGER,
+            class_num INTEGER,
+            old_clubs TEXT,                      -- 前一學期的社團編號（逗號分隔）
+            new_clubs TEXT,                      -- 本學期的社團編號（逗號分隔）
+            PRIMARY KEY (semester_id, change_type, student_key),
+            FOREIGN KEY (semester_id) REFERENCES semesters(id),
+            FOREIGN KEY (previous_semester_id) REFERENCES semesters(id)
+        ) WITHOUT ROWID
+    ''')
+
+    request_backfill(conn)
+
+
+@migration(8, "建立社團統計表（各社團各年級人數、各班參加率）")
+def _club_stats_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS club_grade_stats (
+            semester_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            grade_year INTEGER NOT NULL,        -- 無法判斷年級時為 0
+            club_number TEXT NOT NULL,
+            club_name TEXT NOT NULL,
+            student_count INTEGER NOT NULL,
+            PRIMARY KEY (semester_id, class_id, grade_year),
+            FOREIGN KEY (semester_id) REFERENCES semesters(id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS class_participation (
+            semester_id INTEGER NOT NULL,
+            grade_year INTEGER NOT NULL,
+            class_num INTEGER NOT NULL,
+            participants INTEGER NOT NULL,      -- 參加社團的學生數
+            enrollments INTEGER NOT NULL,       -- 報名社團數（一人可參加多個社團）
+            class_size INTEGER,                 -- 估計的班級人數（參加者中最大的座號）
+            PRIMARY KEY (semester_id, grade_year, class_num),
+            FOREIGN KEY (semester_id) REFERENCES semesters(id)
+        ) WITHOUT ROWID
+    ''')
+
+    request_backfill(conn)
+
+
+@migration(9, "各班參加統計的估計班級人數改為最大座號")
+def _class_participation_max_seat(conn):
+    # 資料只包含參加社團的學生，最大座號只是班級人數的下限，不能當成班級人數計算參加率
+    conn.execute('ALTER TABLE class_participation RENAME COLUMN class_size TO max_seat_number')
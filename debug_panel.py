@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Streamlit 除錯面板（各區段耗時、計數器、查詢延遲分佈與慢查詢）
+- 慢查詢紀錄含搜尋參數（其他使用者查詢的姓名），只在設定環境變數 JKES_DEBUG_PANEL=1 時顯示
+- 手機版與 v2 共用，不各自維護一份
+"""
+
+import os
+
+import streamlit as st
+import pandas as pd
+
+from instrumentation import recorder
+from club_database import slow_queries
+
+
+def debug_panel_enabled() -> bool:
+    """是否顯示除錯面板（預設關閉，僅供管理者在本機或內部部署開啟）"""
+    return os.getenv('JKES_DEBUG_PANEL', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def render_debug_panel():
+    """除錯面板：顯示各區段耗時與計數器；未開啟時不顯示任何內容"""
+    if not debug_panel_enabled():
+        return
+
+    with st.expander("🛠️ 除錯資訊", expanded=False):
+        summary = recorder.summary()
+
+        st.caption(f"統計期間：{summary['elapsed_s']} 秒")
+        if summary['spans']:
+            spans_df = pd.DataFrame.from_dict(summary['spans'], orient='index')
+            st.dataframe(spans_df.sort_values('total_ms', ascending=False), use_container_width=True)
+        else:
+            st.caption("尚無計時資料")
+
+        if summary['counters']:
+            st.json(summary['counters'])
+
+        histograms = recorder.histograms()
+        if histograms:
+            st.markdown("**查詢延遲分佈**")
+            hist_df = pd.DataFrame.from_dict(histograms, orient='index').drop(columns=['buckets'])
+            st.dataframe(hist_df, use_container_width=True)
+
+        if slow_queries:
+            st.markdown(f"**慢查詢（最近 {len(slow_queries)} 筆）**")
+            st.json(list(slow_queries)[::-1][:10], expanded=False)
+
+        last_crawl = st.session_state.get('last_crawl_summary')
+        if last_crawl:
+            st.markdown("**最近一次爬取**")
+            st.json(last_crawl, expanded=False)
+
+        if st.button("清除統計", key="reset_metrics_btn"):
+            recorder.reset()
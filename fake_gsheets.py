@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+模擬 Google Sheets 連線（離線測試與效能量測用）
+可取代 st.connection("gsheets")，注入 SheetsDatabase 使用
+"""
+
+import time
+from collections import Counter
+from typing import Optional, Dict, List
+
+import pandas as pd
+
+
+# EASY_DEPLOY.md 要求預先建立的工作表與欄位
+DEFAULT_WORKSHEETS = {
+    'semesters': ['id', 'semester', 'year', 'term', 'last_updated', 'source_date'],
+    'clubs': ['id', 'semester_id', 'class_id', 'club_number', 'club_name'],
+    'students': ['id', 'club_id', 'student_id', 'student_name', 'grade', 'seat_number'],
+}
+
+
+class WorksheetNotFound(Exception):
+    """工作表不存在（對應 gspread 的 WorksheetNotFound）"""
+
+
+class FakeGSheetsConnection:
+    """
+    記憶體內的 gsheets 連線替身
+    - read / update 依工作表名稱存取 DataFrame
+    - 每次呼叫模擬固定延遲，並記錄呼叫次數與傳輸列數
+    """
+
+    def __init__(self, latency: float = 0.0, sleep: bool = False,
+                 worksheets: Optional[Dict[str, List[str]]] = None):
+        """
+        :param latency: 每次 API 呼叫的模擬延遲（秒）
+        :param sleep: 是否真的等待延遲；False 時只累計模擬時間，量測不會變慢
+        :param worksheets: 預先建立的工作表 {名稱: 欄位}，預設為 DEFAULT_WORKSHEETS
+        """
+        self.latency = latency
+        self.sleep = sleep
+        self._sheets = {}
+
+        if worksheets is None:
+            worksheets = DEFAULT_WORKSHEETS
+        for name, columns in worksheets.items():
+            self._sheets[name] = pd.DataFrame(columns=columns)
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        """清除呼叫統計"""
+        self.calls = Counter()          # {('read', 'students'): 次數}
+        self.rows_transferred = Counter()
+        self.simulated_seconds = 0.0
+
+    def _record_call(self, method: str, worksheet: str, rows: int):
+        self.calls[(method, worksheet)] += 1
+        self.rows_transferred[(method, worksheet)] += rows
+        self.simulated_seconds += self.latency
+
+        if self.sleep and self.latency > 0:
+            time.sleep(self.latency)
+
+    def read(self, worksheet: Optional[str] = None, ttl=None, **kwargs) -> pd.DataFrame:
+        """讀取整張工作表（與 GSheetsConnection.read 相同的關鍵字參數）"""
+        if worksheet not in self._sheets:
+            self._record_call('read', worksheet, 0)
+            raise WorksheetNotFound(worksheet)
+
+        df = self._sheets[worksheet]
+        self._record_call('read', worksheet, len(df))
+        return df.copy()
+
+    def update(self, worksheet: Optional[str] = None, data=None, **kwargs) -> pd.DataFrame:
+        """以 data 覆寫整張工作表"""
+        df = pd.DataFrame(data).reset_index(drop=True)
+        self._record_call('update', worksheet, len(df))
+        self._sheets[worksheet] = df.copy()
+        return df
+
+    def stats(self) -> Dict:
+        """回傳呼叫統計摘要"""
+        reads = sum(n for (method, _), n in self.calls.items() if method == 'read')
+        updates = sum(n for (method, _), n in self.calls.items() if method == 'update')
+
+        return {
+            'reads': reads,
+            'updates': updates,
+            'total_calls': reads + updates,
+            'rows_transferred': sum(self.rows_transferred.values()),
+            'simulated_seconds': round(self.simulated_seconds, 3),
+            'per_worksheet': {
+                f"{method}:{name}": count
+                for (method, name), count in sorted(self.calls.items(), key=str)
+            },
+        }
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+輕量計時與計數工具
+記錄登入、抓取頁面、解析、寫入資料庫、搜尋與 Google Sheets 呼叫的耗時
+"""
+
+import os
+import json
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, List
+
+
+# 延遲直方圖的桶上界（毫秒），最後一桶收集超過 5 秒的值
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """固定桶的延遲直方圖，可估算百分位數"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        """記錄一次延遲"""
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> float:
+        """
+        估算百分位數（回傳所在桶的上界）
+        :param p: 0-100
+        """
+        if self.count == 0:
+            return 0.0
+
+        target = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict:
+        """回傳統計摘要"""
+        buckets = {f"<={b}": n for b, n in zip(self.buckets, self.counts) if n}
+        if self.counts[-1]:
+            buckets[f">{self.buckets[-1]}"] = self.counts[-1]
+
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max_ms, 3),
+            'buckets': buckets,
+        }
+
+
+class Recorder:
+    """
+    計時區段（span）與計數器的收集器
+    - span: 以 with 區塊計時，結果彙總為次數/總耗時/最大耗時
+    - count: 累加計數器（位元組、筆數、重試次數等）
+    - 若設定 log_path，每個事件會以 JSON lines 格式附加寫入
+    - 若設定 parent，事件同時轉送給上層收集器（例如每次爬取的收集器轉送給全域收集器）
+    """
+
+    def __init__(self, log_path: Optional[str] = None, parent: Optional['Recorder'] = None,
+                 max_events: int = 200):
+        self.log_path = log_path
+        self.parent = parent
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=max_events)
+        self.reset()
+
+    def reset(self):
+        """清除所有統計"""
+        with self._lock:
+            self._spans = {}
+            self._counters = {}
+            self._histograms = {}
+            self._events.clear()
+            self.started_at = time.time()
+
+    @contextmanager
+    def span(self, name: str, **fields):
+        """
+        計時區段，可在區塊內對 yield 出的 dict 補充欄位
+        例如:
+            with recorder.span('fetch', page='list.asp') as ev:
+                ev['bytes'] = len(response.content)
+        """
+        event = {'span': name}
+        event.update(fields)
+        start = time.perf_counter()
+        try:
+            yield event
+        except BaseException as e:
+            event['error'] = type(e).__name__
+            raise
+        finally:
+            event['ms'] = round((time.perf_counter() - start) * 1000, 3)
+            self.record(event)
+
+    def record(self, event: Dict):
+        """記錄一個已完成的區段事件"""
+        name = event['span']
+        ms = event.get('ms', 0.0)
+
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'errors': 0}
+            stats['count'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            if 'error' in event:
+                stats['errors'] += 1
+            self._events.append(event)
+
+        self._write_log(event)
+
+        if self.parent is not None:
+            self.parent.record(event)
+
+    def count(self, name: str, value: float = 1):
+        """累加計數器"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+        if self.parent is not None:
+            self.parent.count(name, value)
+
+    def observe(self, name: str, ms: float):
+        """將延遲記錄到指定名稱的直方圖"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(ms)
+
+        if self.parent is not None:
+            self.parent.observe(name, ms)
+
+    def histograms(self) -> Dict[str, Dict]:
+        """所有直方圖的摘要"""
+        with self._lock:
+            return {name: h.snapshot() for name, h in self._histograms.items()}
+
+    def log_event(self, kind: str, **fields):
+        """寫入非計時事件（例如爬取摘要）到 JSON lines 紀錄"""
+        event = {'event': kind}
+        event.update(fields)
+        self._write_log(event)
+
+        if self.parent is not None:
+            self.parent.log_event(kind, **fields)
+
+    def _write_log(self, event: Dict):
+        if not self.log_path:
+            return
+
+        line = dict(event)
+        line['ts'] = datetime.now().isoformat(timespec='milliseconds')
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"⚠️ 無法寫入計時紀錄 {self.log_path}: {e}")
+
+    def summary(self) -> Dict:
+        """回傳彙總：各區段的次數與耗時，以及所有計數器"""
+        with self._lock:
+            spans = {}
+            for name, stats in self._spans.items():
+                spans[name] = {
+                    'count': stats['count'],
+                    'total_ms': round(stats['total_ms'], 1),
+                    'avg_ms': round(stats['total_ms'] / stats['count'], 1),
+                    'max_ms': round(stats['max_ms'], 1),
+                    'errors': stats['errors'],
+                }
+
+            return {
+                'elapsed_s': round(time.time() - self.started_at, 1),
+                'spans': spans,
+                'counters': dict(self._counters),
+            }
+
+    def recent_events(self, limit: int = 50) -> List[Dict]:
+        """最近的區段事件（新到舊）"""
+        with self._lock:
+            return list(self._events)[::-1][:limit]
+
+    def format_summary(self) -> str:
+        """將彙總格式化為文字表格"""
+        summary = self.summary()
+        lines = [f"{'區段':16s}{'次數':>8s}{'總計(ms)':>12s}{'平均(ms)':>12s}{'最大(ms)':>12s}{'錯誤':>6s}"]
+
+        spans = sorted(summary['spans'].items(), key=lambda item: -item[1]['total_ms'])
+        for name, s in spans:
+            lines.append(f"{name:18s}{s['count']:>8d}{s['total_ms']:>12.1f}{s['avg_ms']:>12.1f}"
+                         f"{s['max_ms']:>12.1f}{s['errors']:>6d}")
+
+        for name, value in sorted(summary['counters'].items()):
+            lines.append(f"  {name}: {value}")
+
+        return '\n'.join(lines)
+
+
+# 全域收集器；設定環境變數 CLUB_METRICS_LOG 即會寫出 JSON lines 紀錄
+recorder = Recorder(log_path=os.getenv('CLUB_METRICS_LOG'))
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+唯讀的姓名索引檔（memory-mapped）
+由 club_data.db 的搜尋表匯出為一個排序好的二進位檔，讀取端以 mmap 開啟：
+開檔時只讀取檔頭，查詢時在姓名目錄上二分搜尋，再直接從記錄區解出結果，
+多個 Streamlit 程序可共用同一份作業系統的頁面快取，不必各自開連線與快取
+
+檔案格式（little-endian）：
+    檔頭      HEADER
+    姓名目錄  DIR_ENTRY × name_count，依姓名 UTF-8 位元組排序
+    記錄區    RECORD × record_count，同一姓名的記錄連續並依學期由新到舊、ClassID 排列
+    字串區    去除重複後的 UTF-8 字串
+
+使用方式:
+    python3 name_index.py export [club_data.db]
+    python3 name_index.py search 黃語涵 [club_data.db]
+"""
+
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+from typing import Dict, List, Optional
+
+from club_database import parse_grade
+from records import SearchResult
+
+
+MAGIC = b'JKNI'
+FORMAT_VERSION = 1
+
+# magic, 格式版本, 保留, 資料版本號, 姓名數, 記錄數, 目錄位置, 記錄區位置, 字串區位置
+HEADER = struct.Struct('<4sHHQIIQQQ')
+# 姓名字串位置, 姓名長度, 第一筆記錄, 記錄數
+DIR_ENTRY = struct.Struct('<IIII')
+# semester_id, class_id, grade_year, class_num，
+# 接著 semester, club_number, club_name, student_id, grade, seat_number 各為 (字串位置, 長度)
+RECORD = struct.Struct('<IIhh' + 'IH' * 6)
+
+NULL_LENGTH = 0xFFFF  # 字串欄位為 NULL
+NULL_INT = -1         # 整數欄位為 NULL
+
+
+def default_index_path(db_path: str) -> str:
+    """資料庫對應的索引檔路徑，如 club_data.db → club_data.nameidx"""
+    return os.path.splitext(db_path)[0] + '.nameidx'
+
+
+def export_name_index(db_path: str = 'club_data.db', index_path: Optional[str] = None) -> Dict:
+    """
+    由資料庫的搜尋表匯出姓名索引檔
+    先寫入暫存檔再以 os.replace 替換，讀取端不會讀到寫一半的檔案
+    :return: {'path', 'generation', 'names', 'records', 'bytes'}
+    """
+    index_path = index_path or default_index_path(db_path)
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # 在同一個讀取交易中取得版本號與資料，兩者一致
+        conn.execute('BEGIN')
+        generation = int(conn.execute(
+            "SELECT value FROM meta WHERE key = 'data_generation'").fetchone()[0])
+        # 逐列讀取並直接編碼，不需先取出整張搜尋表
+        rows = conn.execute('''
+            SELECT student_name, semester_id, class_id, grade_year, class_num,
+                   semester, club_number, club_name, student_id, grade, seat_number
+            FROM search_index
+            ORDER BY student_name, semester_key DESC, class_id, student_row_id
+        ''')
+        directory, records, strings = _pack_rows(rows)
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+    dir_bytes = bytearray()
+    for offset, length, first, count in directory:
+        dir_bytes.extend(DIR_ENTRY.pack(offset, length, first, count))
+
+    record_count = len(records) // RECORD.size
+    dir_offset = HEADER.size
+    records_offset = dir_offset + len(dir_bytes)
+    strings_offset = records_offset + len(records)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, generation, len(directory), record_count,
+                         dir_offset, records_offset, strings_offset)
+
+    tmp_path = f"{index_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(dir_bytes)
+        f.write(records)
+        f.write(strings)
+    os.replace(tmp_path, index_path)
+
+    return {
+        'path': index_path,
+        'generation': generation,
+        'names': len(directory),
+        'records': record_count,
+        'bytes': strings_offset + len(strings),
+    }
+
+
+def _pack_rows(rows):
+    """
+    將依姓名排序的搜尋表資料編碼為姓名目錄、記錄區與字串區
+    :return: ([(姓名字串位置, 長度, 第一筆記錄, 記錄數)], 記錄區, 字串區)
+    """
+    strings = bytearray()
+    string_refs = {}
+
+    def add_string(value):
+        if value is None:
+            return 0, NULL_LENGTH
+        ref = string_refs.get(value)
+        if ref is None:
+            data = value.encode('utf-8')[:NULL_LENGTH - 1]
+            ref = string_refs[value] = (len(strings), len(data))
+            strings.extend(data)
+        return ref
+
+    directory = []
+    records = bytearray()
+    current_name = None
+    for index, row in enumerate(rows):
+        name = row[0]
+        if name != current_name:
+            offset, length = add_string(name)
+            directory.append([offset, length, index, 0])
+            current_name = name
+        directory[-1][3] += 1
+
+        fields = [row[1], row[2],
+                  NULL_INT if row[3] is None else row[3],
+                  NULL_INT if row[4] is None else row[4]]
+        for value in row[5:]:
+            fields.extend(add_string(value))
+        records.extend(RECORD.pack(*fields))
+
+    return directory, records, strings
+
+
+class NameIndex:
+    """以 mmap 開啟的姓名索引檔，查詢介面與 ClubDatabase.search_student 相同"""
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        with open(index_path, 'rb') as f:
+            self._stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, _, self.generation, self.name_count, self.record_count,
+         self._dir_offset, self._records_offset, self._strings_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"{index_path} 不是支援的姓名索引檔")
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_stale(self) -> bool:
+        """索引檔已被重新匯出（檔案已替換）"""
+        try:
+            current = os.stat(self.index_path)
+        except OSError:
+            return True
+        return (current.st_ino, current.st_mtime_ns) != (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    def _find(self, name: bytes):
+        """在姓名目錄上二分搜尋，回傳 (第一筆記錄, 記錄數)"""
+        mm = self._mm
+        base = self._dir_offset
+        strings = self._strings_offset
+        lo, hi = 0, self.name_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length, first, count = DIR_ENTRY.unpack_from(mm, base + mid * DIR_ENTRY.size)
+            probe = mm[strings + offset:strings + offset + length]
+            if probe < name:
+                lo = mid + 1
+            elif probe > name:
+                hi = mid
+            else:
+                return first, count
+        return 0, 0
+
+    def _string(self, offset: int, length: int) -> Optional[str]:
+        if length == NULL_LENGTH:
+            return None
+        start = self._strings_offset + offset
+        return self._mm[start:start + length].decode('utf-8')
+
+    def search_student(self, student_name: str, semester_id: Optional[int] = None,
+                       grade: Optional[str] = None, grade_year: Optional[int] = None,
+                       class_num: Optional[int] = None) -> List[SearchResult]:
+        """搜尋學生（參數與結果順序同 ClubDatabase.search_student）"""
+        first, count = self._find(student_name.encode('utf-8'))
+        if not count:
+            return []
+
+        grade_text = None
+        if grade:
+            parsed_year, parsed_class = parse_grade(grade)
+            if parsed_year is None:
+                grade_text = grade
+            else:
+                grade_year, class_num = parsed_year, parsed_class
+
+        mm = self._mm
+        string = self._string
+        results = []
+        position = self._records_offset + first * RECORD.size
+        for _ in range(count):
+            fields = RECORD.unpack_from(mm, position)
+            position += RECORD.size
+
+            # 先比對整數欄位，不符合的記錄不需解碼字串
+            if semester_id and fields[0] != semester_id:
+                continue
+            if grade_year is not None and fields[2] != grade_year:
+                continue
+            if class_num is not None and fields[3] != class_num:
+                continue
+
+            grade_value = string(fields[12], fields[13])
+            if grade_text is not None and grade_value != grade_text:
+                continue
+
+            results.append(SearchResult(
+                string(fields[4], fields[5]),
+                fields[1],
+                string(fields[6], fields[7]),
+                string(fields[8], fields[9]),
+                string(fields[10], fields[11]),
+                student_name,
+                grade_value,
+                string(fields[14], fields[15])
+            ))
+
+        return results
+
+
+# 每個程序共用已開啟的索引檔，檔案重新匯出後自動改開新檔
+_open_indexes = {}
+_open_lock = threading.Lock()
+
+
+def get_name_index(index_path: str) -> Optional[NameIndex]:
+    """取得已開啟的索引檔；檔案不存在或格式不符時回傳 None"""
+    with _open_lock:
+        index = _open_indexes.get(index_path)
+        if index is not None and not index.is_stale():
+            return index
+
+        try:
+            index = NameIndex(index_path)
+        except (OSError, ValueError):
+            _open_indexes.pop(index_path, None)
+            return None
+
+        # 舊的 mmap 可能仍在其他執行緒使用中，交由垃圾回收關閉
+        _open_indexes[index_path] = index
+        return index
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('export', 'search'):
+        print(__doc__)
+        return
+
+    if sys.argv[1] == 'export':
+        db_path = sys.argv[2] if len(sys.argv) > 2 else 'club_data.db'
+        stats = export_name_index(db_path)
+        print(f"✓ 已匯出 {stats['path']}：{stats['names']} 個姓名、{stats['records']} 筆記錄、"
+              f"{stats['bytes'] / 1024:.1f} KB（資料版本 {stats['generation']}）")
+    else:
+        name = sys.argv[2]
+        db_path = sys.argv[3] if len(sys.argv) > 3 else 'club_data.db'
+        index = get_name_index(default_index_path(db_path))
+        if index is None:
+            print("⚠️ 找不到索引檔，請先執行 export")
+            return
+        for result in index.search_student(name):
+            print(f"{result.semester} {result.club_number} {result.club_name} {result.grade}")
+
+
+if __name__ == "__main__":
+    main()
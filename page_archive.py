@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+原始頁面封存
+爬取時抓到的每個頁面以 gzip 壓縮、依內容的 SHA-256 存檔（相同內容只存一份），
+每個學期一份 manifest 記錄各頁面對應的內容；修正解析程式後可直接由封存重建學期資料，不需重新連線
+
+目錄結構:
+    page_archive/<學期>/manifest.json
+    page_archive/<學期>/published.json   最近一次成功發佈時各頁面的 SHA-256 與資料版本號
+    page_archive/<學期>/objects/<sha256 前 2 碼>/<sha256>.gz
+
+使用方式:
+    python3 page_archive.py list
+    python3 page_archive.py replay 114下
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+# 封存目錄；設為空字串時不封存
+DEFAULT_ROOT = os.getenv('JKES_PAGE_ARCHIVE', 'page_archive')
+
+# 學校網站的頁面編碼
+PAGE_ENCODING = 'big5'
+
+
+def content_digest(content: bytes) -> str:
+    """頁面內容的 SHA-256（封存檔名）"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def decode_page(content: bytes) -> str:
+    """與 requests 以 big5 解碼 response.text 的方式相同"""
+    return str(content, PAGE_ENCODING, errors='replace')
+
+
+class PageArchive:
+    """以學期分開保存的內容定址頁面封存"""
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _semester_dir(self, semester: str) -> str:
+        return os.path.join(self.root, semester)
+
+    def _object_path(self, semester: str, digest: str) -> str:
+        return os.path.join(self._semester_dir(semester), 'objects', digest[:2], f"{digest}.gz")
+
+    def _manifest_path(self, semester: str) -> str:
+        return os.path.join(self._semester_dir(semester), 'manifest.json')
+
+    def _published_path(self, semester: str) -> str:
+        return os.path.join(self._semester_dir(semester), 'published.json')
+
+    def _write_json(self, path: str, data: Dict):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, semester: str, content: bytes) -> str:
+        """保存一個頁面內容，回傳其 SHA-256；相同內容已存在時不重複寫入"""
+        digest = content_digest(content)
+        path = self._object_path(semester, digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, 'wb') as f:
+                # mtime=0：相同內容壓縮後的檔案也相同
+                f.write(gzip.compress(content, mtime=0))
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, semester: str, digest: str) -> bytes:
+        """讀取頁面內容並驗證雜湊"""
+        with open(self._object_path(semester, digest), 'rb') as f:
+            content = gzip.decompress(f.read())
+        if content_digest(content) != digest:
+            raise ValueError(f"封存的頁面內容與雜湊不符：{digest}")
+        return content
+
+    def save_pages(self, semester: str, pages: Dict[str, Dict]):
+        """
+        保存一次爬取抓到的頁面並更新 manifest（同一頁面以這次的內容為準，其他頁面保留）
+        :param pages: {頁面: {'content': bytes, 'fetched_at': ISO 時間, 其他欄位...}}
+        """
+        entries = {}
+        for page, info in pages.items():
+            entry = {key: value for key, value in info.items() if key != 'content'}
+            entry['sha256'] = self.put(semester, info['content'])
+            entry['bytes'] = len(info['content'])
+            entries[page] = entry
+
+        with self._lock:
+            manifest = self.load_manifest(semester) or {'semester': semester, 'pages': {}}
+            manifest['pages'].update(entries)
+            manifest['updated_at'] = datetime.now().isoformat(timespec='seconds')
+            self._write_json(self._manifest_path(semester), manifest)
+
+    def load_manifest(self, semester: str) -> Optional[Dict]:
+        """讀取學期的 manifest，不存在時回傳 None"""
+        return self._read_json(self._manifest_path(semester))
+
+    def save_published(self, semester: str, digests: Dict[str, str], generation: int):
+        """
+        記錄成功發佈的學期資料來自哪些頁面（只在發佈後呼叫；中止或放棄的爬取不更新）
+        manifest 記錄的是最近抓到的頁面，不一定已發佈
+        :param digests: {頁面: SHA-256}
+        :param generation: 發佈後的資料版本號
+        """
+        with self._lock:
+            self._write_json(self._published_path(semester), {
+                'semester': semester,
+                'generation': generation,
+                'pages': dict(digests),
+                'published_at': datetime.now().isoformat(timespec='seconds'),
+            })
+
+    def load_published(self, semester: str) -> Optional[Dict]:
+        """讀取學期最近一次發佈時的頁面，沒有紀錄時回傳 None"""
+        return self._read_json(self._published_path(semester))
+
+    def read_page(self, semester: str, page: str) -> Optional[str]:
+        """讀取 manifest 中某頁面的 HTML，沒有封存時回傳 None"""
+        manifest = self.load_manifest(semester)
+        entry = (manifest or {}).get('pages', {}).get(page)
+        if entry is None:
+            return None
+        return decode_page(self.get(semester, entry['sha256']))
+
+    def semesters(self) -> List[str]:
+        """有 manifest 的學期"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(self._manifest_path(name)))
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('list', 'replay'):
+        print(__doc__)
+        return
+
+    archive = PageArchive()
+    if sys.argv[1] == 'list':
+        for semester in archive.semesters():
+            manifest = archive.load_manifest(semester)
+            pages = manifest['pages']
+            total = sum(entry['bytes'] for entry in pages.values())
+            print(f"{semester}: {len(pages)} 個頁面，{total / 1024:.1f} KB（更新於 {manifest.get('updated_at')}）")
+    else:
+        from club_crawler import ClubCrawler
+
+        semester_id, updated = ClubCrawler('', '').crawl_all_data(replay=sys.argv[2])
+        if updated:
+            print(f"\n已由封存重建學期資料 (semester_id: {semester_id})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+跨程序共用的請求速率限制（token bucket）
+爬蟲、search_classid.py 與 streamlit_app.py 的即時搜尋都透過同一個本機 SQLite 檔取得 token，
+多位使用者或排程爬取同時進行時，對學校網站的總請求速率仍不超過設定值
+
+設定（環境變數）:
+    JKES_RATE_LIMIT       每秒請求數（預設 3，約等於原本每個請求間隔 0.3 秒）
+    JKES_RATE_BURST       可累積的 token 數（預設 3）
+    JKES_RATE_LIMIT_FILE  共用的 SQLite 檔（預設為系統暫存目錄下的 jkes_rate_limit.db）
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+
+DEFAULT_RATE = float(os.getenv('JKES_RATE_LIMIT', '3'))
+DEFAULT_BURST = float(os.getenv('JKES_RATE_BURST', '3'))
+DEFAULT_PATH = os.getenv('JKES_RATE_LIMIT_FILE',
+                         os.path.join(tempfile.gettempdir(), 'jkes_rate_limit.db'))
+
+
+class RateLimiter:
+    """
+    以 SQLite 檔保存 token 數與上次補充時間的 token bucket
+    每次取 token 在 BEGIN IMMEDIATE 交易中讀取、補充、扣除，多個程序之間不會重複使用同一個 token；
+    使用 time.time()，不同程序的時間基準一致
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                 bucket: str = 'jkes', clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.path = path
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.bucket = bucket
+        self.clock = clock
+        self.sleep = sleep
+        self.total_wait = 0.0  # 這個物件累計等待的秒數
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            self._conn = conn
+        return self._conn
+
+    def _try_acquire(self) -> float:
+        """嘗試取得一個 token：成功時回傳 0，否則回傳需要等待的秒數"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = self.clock()
+                row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE name = ?',
+                                   (self.bucket,)).fetchone()
+                if row is None:
+                    tokens = self.burst
+                else:
+                    # 時鐘倒退時不補充
+                    tokens = min(self.burst, row[0] + max(now - row[1], 0) * self.rate)
+
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+
+                conn.execute('INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                             (self.bucket, tokens, now))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+        return wait
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        等待直到取得一個 token
+        :param timeout: 最多等待秒數，超過時拋出 TimeoutError
+        :return: 等待的秒數
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                self.total_wait += waited
+                return waited
+            if timeout is not None and waited + wait > timeout:
+                self.total_wait += waited
+                raise TimeoutError(f"等待請求額度超過 {timeout} 秒")
+            self.sleep(wait)
+            waited += wait
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 每個程序共用一個限制器（同一個檔案）
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(path: str = DEFAULT_PATH) -> RateLimiter:
+    """取得共用的限制器"""
+    with _limiters_lock:
+        limiter = _limiters.get(path)
+        if limiter is None:
+            limiter = _limiters[path] = RateLimiter(path)
+        return limiter
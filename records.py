@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+查詢結果與爬蟲解析結果的資料型別
+以 NamedTuple 取代每列一個 dict：欄位名稱只存在類別上，每筆資料只是一個 tuple
+仍可用 record['欄位'] 讀取，既有以 dict 方式存取的程式不需修改；
+pd.DataFrame(records) 會直接以欄位名稱作為欄名
+"""
+
+from typing import NamedTuple, Optional
+
+
+def _getitem(self, key):
+    """支援 record['欄位'] 與 record[0] 兩種存取方式"""
+    if isinstance(key, str):
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+    return tuple.__getitem__(self, key)
+
+
+def _get(self, key, default=None):
+    """與 dict.get 相同"""
+    if key in self._fields:
+        return getattr(self, key)
+    return default
+
+
+def _keys(self):
+    return self._fields
+
+
+def _to_dict(self) -> dict:
+    """轉為 dict（輸出 JSON 時使用）"""
+    return dict(zip(self._fields, self))
+
+
+def record(cls):
+    """類別裝飾器：讓 NamedTuple 也能以 dict 的方式存取（record['欄位']、get、keys、to_dict）"""
+    cls.__getitem__ = _getitem
+    cls.get = _get
+    cls.keys = _keys
+    cls.to_dict = _to_dict
+    return cls
+
+
+@record
+class RosterEntry(NamedTuple):
+    """list.asp 名單頁面中的一位學生"""
+    student_id: str
+    name: str
+    grade: str
+    seat: str
+    club_number: Optional[str]
+
+
+@record
+class SearchResult(NamedTuple):
+    """search_student / get_student_history 的一筆結果"""
+    semester: str
+    class_id: int
+    club_number: str
+    club_name: str
+    student_id: Optional[str]
+    student_name: str
+    grade: Optional[str]
+    seat_number: Optional[str]
+
+
+@record
+class RosterRow(NamedTuple):
+    """get_grade_roster 的一筆結果"""
+    grade_year: Optional[int]
+    class_num: Optional[int]
+    seat_number: Optional[str]
+    student_id: Optional[str]
+    student_name: str
+    grade: Optional[str]
+    class_id: int
+    club_number: str
+    club_name: str
+
+
+@record
+class ClubRecord(NamedTuple):
+    """get_clubs 的一筆結果（一個社團與人數）"""
+    id: int
+    class_id: int
+    club_number: str
+    club_name: str
+    student_count: int
+
+
+@record
+class StudentSummary(NamedTuple):
+    """find_students 的一筆結果（一位學生）"""
+    student_id: str
+    student_name: str
+    grade_year: Optional[int]
+    class_num: Optional[int]
+    last_semester: Optional[str]
+    semester_count: int
+
+
+@record
+class SemesterChange(NamedTuple):
+    """學期間的一筆異動；clubs 為以逗號分隔的社團編號"""
+    change_type: str          # joined / dropped / changed
+    student_id: Optional[str]
+    student_name: str
+    grade_year: Optional[int]
+    class_num: Optional[int]
+    old_clubs: Optional[str]  # 前一學期的社團（joined 時為 None）
+    new_clubs: Optional[str]  # 本學期的社團（dropped 時為 None）
+
+
+@record
+class ClubGradeCount(NamedTuple):
+    """get_club_grade_stats 的一筆結果（某社團某年級的人數）"""
+    class_id: int
+    club_number: str
+    club_name: str
+    grade_year: int   # 無法判斷年級時為 0
+    student_count: int
+
+
+@record
+class ClassParticipation(NamedTuple):
+    """get_class_participation 的一筆結果（某班參加社團的情形）"""
+    grade_year: int
+    class_num: int
+    participants: int
+    enrollments: int
+    # 參加者中最大的座號：只是班級人數的下限（沒參加社團的學生不在資料中），無法據以計算參加率
+    max_seat_number: Optional[int]
+
+
+@record
+class SemesterRecord(NamedTuple):
+    """get_all_semesters 的一筆結果"""
+    id: int
+    semester: str
+    year: int
+    term: str
+    last_updated: Optional[str]
+    source_date: Optional[str]
+
+    @classmethod
+    def from_mapping(cls, row) -> 'SemesterRecord':
+        """由 dict（例如 Google Sheets 的一列）建立，缺少的欄位為 None"""
+        return cls(*(row.get(field) for field in cls._fields))
+
+
+class Page(NamedTuple):
+    """分頁查詢的一頁：items 為該頁資料，next_cursor 為下一頁的游標（沒有下一頁時為 None）"""
+    items: list
+    next_cursor: Optional[str]
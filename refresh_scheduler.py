@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+排程背景更新
+以服務帳號定期爬取，更新後預先建立搜尋用的姓名 filter、姓名索引檔並讀取常用資料，
+家長查詢時幾乎不會遇到需要爬取的情況
+
+排程:
+- 每天 JKES_REFRESH_AT（預設 02:30）完整更新一次：先抓齊各頁面，與上次發佈時相同就不解析、不發佈，快取不會失效
+- 密集期間每 JKES_BURST_MINUTES 分鐘（預設 60）執行一次：
+  - 依學期日曆已進入新學期、但還沒有該學期的資料 → 只確認網站上的學期（main.asp），換學期時立即完整爬取
+  - 學期日期（source_date）前後 JKES_BURST_DAYS 天內（預設 14）→ 完整更新（選課名單變動頻繁）
+
+設定（環境變數）:
+    JKES_USERNAME / JKES_PASSWORD  服務帳號（必填）
+
+使用方式:
+    python3 refresh_scheduler.py         # 持續執行
+    python3 refresh_scheduler.py --once            # 依目前排程狀態執行一次後結束（給 cron 每小時使用）：
+                                                   # 密集期間依其類型，其餘時間只確認學期
+    python3 refresh_scheduler.py --once --refresh  # 完整更新一次後結束（給 cron 每天使用）
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from club_crawler import ClubCrawler
+from instrumentation import recorder
+from name_index import default_index_path, export_name_index, get_name_index
+from snapshots import current_snapshot, snapshot_name
+try:
+    from cloud_database import CloudDatabase as Database
+except ImportError:
+    from club_database import ClubDatabase as Database
+
+
+DEFAULT_REFRESH_AT = os.getenv('JKES_REFRESH_AT', '02:30')
+DEFAULT_BURST_MINUTES = int(os.getenv('JKES_BURST_MINUTES', '60'))
+DEFAULT_BURST_DAYS = int(os.getenv('JKES_BURST_DAYS', '14'))
+
+# 每次最多等待這麼久就重新計算下次執行時間（學期狀態或系統時間可能已改變）
+MAX_SLEEP_SECONDS = 60 * 60
+
+KIND_LABELS = {'refresh': '完整更新', 'check': '確認學期'}
+
+
+class RefreshScheduler:
+    """決定何時更新、執行更新並預熱快取"""
+
+    def __init__(self, username: str, password: str, refresh_at: str = DEFAULT_REFRESH_AT,
+                 burst_minutes: int = DEFAULT_BURST_MINUTES, burst_days: int = DEFAULT_BURST_DAYS,
+                 db=None, crawler_factory: Callable[..., ClubCrawler] = ClubCrawler,
+                 clock: Callable[[], datetime] = datetime.now, sleep: Callable[[float], None] = time.sleep):
+        """
+        :param refresh_at: 每天完整更新的時間（"HH:MM"）
+        :param crawler_factory: 建立爬蟲的函式（測試用），以 (username, password, db=) 呼叫
+        """
+        hour, minute = (int(part) for part in refresh_at.split(':'))
+        self.refresh_time = (hour, minute)
+        self.username = username
+        self.password = password
+        self.burst_interval = timedelta(minutes=burst_minutes)
+        self.burst_days = burst_days
+        self.db = db if db is not None else Database()
+        self.crawler_factory = crawler_factory
+        self.clock = clock
+        self.sleep = sleep
+        self.last_run: Optional[datetime] = None
+        self.last_result: Optional[Dict] = None
+
+    def burst_mode(self, now: datetime) -> Optional[str]:
+        """
+        密集期間的類型
+        :return: 'check'（等待新學期）、'refresh'（學期日期前後）或 None（不在密集期間）
+        """
+        semester = self.db.get_current_semester(now.strftime("%Y/%m/%d"))
+        if semester is None or not self.db.is_semester_cached(semester.id):
+            return 'check'
+
+        try:
+            start = datetime.strptime(semester.source_date, "%Y/%m/%d")
+        except (TypeError, ValueError):
+            return None
+
+        return 'refresh' if abs((now - start).days) <= self.burst_days else None
+
+    def _next_nightly(self, now: datetime) -> datetime:
+        hour, minute = self.refresh_time
+        nightly = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return nightly if nightly > now else nightly + timedelta(days=1)
+
+    def next_run(self, now: datetime) -> Tuple[datetime, str]:
+        """下次執行的時間與類型（'refresh' 或 'check'）"""
+        nightly = self._next_nightly(now)
+        mode = self.burst_mode(now)
+        if mode is not None:
+            due = now if self.last_run is None else max(self.last_run + self.burst_interval, now)
+            if due < nightly:
+                return due, mode
+
+        return nightly, 'refresh'
+
+    def run(self, kind: str = 'refresh') -> Dict:
+        """
+        執行一次更新並預熱快取
+        :param kind: 'refresh' 重新爬取（頁面與上次發佈時相同則不發佈）；'check' 只在網站換學期時爬取
+        """
+        print(f"\n🕑 {self.clock():%Y-%m-%d %H:%M} 排程{KIND_LABELS[kind]}")
+        crawler = self.crawler_factory(self.username, self.password, db=self.db)
+
+        if kind == 'check':
+            # 每次都向網站確認目前的學期
+            crawler.semester_recheck = 0
+            semester_id, updated = crawler.crawl_all_data()
+        else:
+            semester_id, updated = crawler.crawl_all_data(refresh=True)
+        self.last_run = self.clock()
+
+        summary = crawler.last_summary or {}
+        self.last_result = {
+            'mode': kind,
+            'semester': summary.get('semester'),
+            'semester_id': semester_id,
+            'updated': updated,
+            'aborted': summary.get('aborted'),
+            'warmed': self.warm(),
+        }
+        recorder.log_event('scheduled_refresh', **self.last_result)
+        return self.last_result
+
+    def warm(self) -> Dict:
+        """
+        預熱搜尋用的快取：重建過期的姓名 filter、姓名索引檔與資料庫快照（網頁各程序直接使用），
+        並查詢最新學期的常用資料，讓資料庫頁面進入系統快取
+        Google Sheets 後端沒有這些檔案，不需預熱
+        """
+        db = getattr(self.db, 'db', self.db)  # CloudDatabase 代理實際的資料庫
+        db_path = getattr(db, 'db_path', None)
+        warmed = {}
+        if not db_path:
+            return warmed
+
+        with recorder.span('warm') as event:
+            try:
+                # 姓名 filter 不存在或過期時重建
+                db.init_database()
+
+                generation = db.get_data_generation()
+                index = get_name_index(default_index_path(db_path))
+                if index is None or index.generation != generation:
+                    stats = export_name_index(db_path)
+                    warmed['name_index'] = stats['records']
+                warmed['generation'] = generation
+
+                # 快照落後（例如由其他方式寫入）時重新發佈
+                snapshot_dir = os.getenv('JKES_SNAPSHOT_DIR')
+                snapshot = current_snapshot(snapshot_dir) if snapshot_dir else None
+                if snapshot_dir and (snapshot is None or
+                                     os.path.basename(snapshot) != snapshot_name(generation)):
+                    warmed['snapshot'] = db.publish_snapshot()
+
+                semesters = db.get_all_semesters()
+                if semesters:
+                    semester_id = semesters[0].id
+                    clubs = db.get_clubs(semester_id)
+                    db.get_club_grade_stats(semester_id)
+                    db.get_class_participation(semester_id)
+                    if clubs:
+                        db.get_club_roster(semester_id, clubs[0].club_number)
+                    warmed['semester'] = semesters[0].semester
+                    warmed['clubs'] = len(clubs)
+            except Exception as e:
+                print(f"⚠️ 預熱快取失敗: {e}")
+                warmed['error'] = str(e)
+            event.update(warmed)
+
+        if 'error' not in warmed:
+            print(f"🔥 已預熱快取（資料版本 {warmed['generation']}）")
+        return warmed
+
+    def run_forever(self):
+        """依排程持續執行"""
+        print(f"⏰ 排程更新啟動：每天 {self.refresh_time[0]:02d}:{self.refresh_time[1]:02d} 完整更新，"
+              f"密集期間每 {int(self.burst_interval.total_seconds() // 60)} 分鐘")
+        self.warm()
+
+        announced = None
+        while True:
+            now = self.clock()
+            when, kind = self.next_run(now)
+            wait = (when - now).total_seconds()
+            if wait > 0:
+                if (when, kind) != announced:
+                    print(f"⏰ 下次{KIND_LABELS[kind]}：{when:%Y-%m-%d %H:%M}")
+                    announced = (when, kind)
+                self.sleep(min(wait, MAX_SLEEP_SECONDS))
+                continue
+
+            try:
+                self.run(kind)
+            except Exception as e:
+                print(f"⚠️ 排程更新失敗: {e}")
+                self.last_run = self.clock()
+
+
+def main():
+    username = os.getenv('JKES_USERNAME')
+    password = os.getenv('JKES_PASSWORD')
+    if not username or not password:
+        print("⚠️ 請設定環境變數 JKES_USERNAME 與 JKES_PASSWORD")
+        print(__doc__)
+        sys.exit(1)
+
+    scheduler = RefreshScheduler(username, password)
+    if '--once' in sys.argv:
+        kind = 'refresh' if '--refresh' in sys.argv else scheduler.burst_mode(datetime.now()) or 'check'
+        result = scheduler.run(kind)
+        sys.exit(1 if result['aborted'] else 0)
+
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        print("\n排程更新已停止")
+
+
+if __name__ == "__main__":
+    main()
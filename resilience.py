@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+爬取學校網站時的錯誤處理
+- RetryPolicy: 暫時性錯誤（連線失敗、逾時、5xx、429）以指數退避加隨機抖動重試
+- ErrorBudget: 每次爬取可容許的失敗 ClassID 數，超過時中止，不發佈不完整的學期資料
+- CircuitBreaker: 連續失敗達門檻時開啟，暫停送出請求一段時間後再以一個請求試探
+"""
+
+import random
+import threading
+import time
+from typing import Callable, List, Optional
+
+import requests
+
+
+class TransientHTTPError(Exception):
+    """伺服器回應暫時性錯誤（5xx 或 429），可以重試"""
+
+    def __init__(self, status_code: int, url: str = ''):
+        super().__init__(f"HTTP {status_code} {url}".strip())
+        self.status_code = status_code
+
+
+class CircuitOpenError(Exception):
+    """斷路器開啟中，暫停送出請求"""
+
+    def __init__(self, remaining: float):
+        super().__init__(f"伺服器暫時無回應，{remaining:.1f} 秒後再試")
+        self.remaining = remaining
+
+
+class CrawlAborted(Exception):
+    """爬取中止（錯誤預算用完或伺服器持續無回應），暫存資料不會發佈"""
+
+
+# 可以重試的錯誤
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, TransientHTTPError)
+
+
+def check_response(response):
+    """5xx 與 429 視為暫時性錯誤"""
+    if response.status_code >= 500 or response.status_code == 429:
+        raise TransientHTTPError(response.status_code, getattr(response, 'url', ''))
+    return response
+
+
+class RetryPolicy:
+    """指數退避加上 full jitter：第 n 次重試前等待 0 ~ min(max_delay, base_delay * 2^n) 秒"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 8.0,
+                 retry_on=RETRYABLE_ERRORS, sleep: Callable[[float], None] = time.sleep,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失敗（從 0 起算）後的等待秒數"""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func: Callable, *args, on_retry: Optional[Callable] = None, **kwargs):
+        """
+        呼叫 func，遇到可重試的錯誤時等待後重試，次數用完時拋出最後一次的錯誤
+        :param on_retry: on_retry(第幾次重試, 錯誤, 等待秒數)，用於記錄
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                return func(*args, **kwargs)
+            except self.retry_on as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                delay = self.backoff(attempt)
+                if on_retry:
+                    on_retry(attempt + 1, e, delay)
+                self.sleep(delay)
+
+
+class ErrorBudget:
+    """
+    每次爬取可容許的失敗數；重試後仍失敗的 ClassID 才計入
+    之後重新爬取成功的 ClassID 不再列為未完成，但仍佔用預算
+    """
+
+    def __init__(self, max_failures: int = 5):
+        self.max_failures = max_failures
+        self.failures: List = []   # 每次失敗（同一個 ClassID 可能出現多次）
+        self.unresolved: List = []  # 目前仍未成功的 ClassID
+
+    def record_failure(self, key):
+        self.failures.append(key)
+        if key not in self.unresolved:
+            self.unresolved.append(key)
+
+    def record_success(self, key):
+        if key in self.unresolved:
+            self.unresolved.remove(key)
+
+    @property
+    def exhausted(self) -> bool:
+        return len(self.failures) > self.max_failures
+
+
+class CircuitBreaker:
+    """
+    斷路器
+    - closed: 正常送出請求，連續失敗 failure_threshold 次時開啟
+    - open: 拒絕請求（CircuitOpenError），reset_timeout 秒後轉為 half_open
+    - half_open: 放行一個試探請求，成功則關閉，失敗則再次開啟
+    可由多個抓取執行緒共用
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.consecutive_failures = 0
+        self.open_count = 0  # 開啟過的次數
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self.remaining() <= 0:
+                self._state = self.HALF_OPEN
+            return self._state
+
+    def remaining(self) -> float:
+        """距離可以試探的秒數"""
+        if self._state != self.OPEN:
+            return 0.0
+        return max(self._opened_at + self.reset_timeout - self.clock(), 0.0)
+
+    def before_call(self):
+        """送出請求前檢查，開啟中時拋出 CircuitOpenError"""
+        with self._lock:
+            if self.state == self.OPEN:
+                raise CircuitOpenError(self.remaining())
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._state == self.OPEN:
+                # 開啟前已送出的請求陸續失敗，不重複計算開啟次數
+                return
+            if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+                self.open_count += 1
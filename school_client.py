@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+學校網站的登入與 session 管理
+- 由登入後的回應判斷是否成功（出現登出連結、不再出現密碼欄位），帳密錯誤時拋出 LoginError
+- 記住成功的登入欄位名稱，下次直接使用，不必逐一嘗試
+- 登入後的 cookies 存在 session 檔中，有效期間內再次爬取直接沿用，不需重新登入
+  （以帳號與密碼的 HMAC 為鍵，密碼不符時找不到保存的 session，必須真的登入）
+- 沿用的 session 已被伺服器登出時（頁面又出現登入表單），自動重新登入一次
+- 指定 rate_limiter 時，每個請求（含登入）先取得跨程序共用的請求額度
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+
+BASE_URL = "http://www2.jkes.tp.edu.tw"
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+
+# session 檔位置（內含登入後的 cookies，不含密碼）
+DEFAULT_SESSION_FILE = os.getenv('JKES_SESSION_FILE', '.school_session.json')
+
+# 沒有設定到期時間的 cookies（ASP session）在伺服器端約 20 分鐘沒有使用即失效
+SESSION_TTL = 20 * 60
+
+# 網站可能使用的登入欄位名稱（帳號, 密碼）
+LOGIN_FIELD_SETS = [
+    ('username', 'password'),
+    ('userid', 'pwd'),
+    ('account', 'password'),
+]
+
+_PASSWORD_INPUT = re.compile(r'<input[^>]*type\s*=\s*["\']?password', re.IGNORECASE)
+_LOGOUT_LINK = re.compile(r'登出|logout', re.IGNORECASE)
+
+
+class LoginError(Exception):
+    """登入失敗（帳號或密碼錯誤）"""
+
+
+def is_login_page(html: str) -> bool:
+    """頁面是否為登入表單（含密碼欄位）"""
+    return bool(_PASSWORD_INPUT.search(html or ''))
+
+
+def is_logged_in(html: str) -> bool:
+    """登入後的回應：出現登出連結，或不再出現登入表單"""
+    return bool(_LOGOUT_LINK.search(html or '')) or not is_login_page(html)
+
+
+class SchoolClient:
+    """已登入的學校網站連線"""
+
+    def __init__(self, username: str, password: str, base_url: str = BASE_URL,
+                 session_file: Optional[str] = DEFAULT_SESSION_FILE, timeout: float = 10,
+                 session: Optional[requests.Session] = None, rate_limiter=None):
+        """
+        :param session_file: session 檔路徑，None 表示不保存
+        :param session: 自訂的 session 物件（測試用）
+        :param rate_limiter: rate_limiter.RateLimiter，None 表示不限制
+        """
+        self.username = username
+        self.password = password
+        self.base_url = base_url.rstrip('/')
+        self.session_file = session_file
+        self.timeout = timeout
+        self.session = session or self._new_session()
+        self.rate_limiter = rate_limiter
+        self.logged_in = False
+        self.reused = False  # 本次是否沿用已保存的 session
+        self.login_requests = 0
+        self.rate_limit_wait = 0.0  # 等待請求額度的累計秒數
+        self._lock = threading.Lock()
+        self._login_lock = threading.Lock()
+
+    @staticmethod
+    def _new_session() -> requests.Session:
+        session = requests.Session()
+        session.headers.update({'User-Agent': USER_AGENT})
+        return session
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.acquire()
+            with self._lock:
+                self.rate_limit_wait += waited
+        return getattr(self.session, method)(url, **kwargs)
+
+    @property
+    def _session_key(self) -> str:
+        # 以密碼為金鑰對網址與帳號做 HMAC：不以明碼保存帳密，
+        # 且只有帳密都相同時才會沿用保存的 session
+        message = f"{self.base_url}|{self.username}".encode('utf-8')
+        digest = hmac.new(self.password.encode('utf-8'), message, hashlib.sha256).hexdigest()
+        return f"{self.base_url}|{digest}"
+
+    def _load_store(self) -> Dict:
+        if not self.session_file:
+            return {}
+        try:
+            with open(self.session_file, 'r', encoding='utf-8') as f:
+                store = json.load(f)
+            return store if isinstance(store, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_store(self, store: Dict):
+        if not self.session_file:
+            return
+        tmp_path = f"{self.session_file}.tmp{os.getpid()}"
+        try:
+            # cookies 等同登入憑證，只允許擁有者讀取
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(store, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.session_file)
+        except OSError as e:
+            print(f"⚠️ 無法寫入 session 檔 {self.session_file}: {e}")
+
+    def _remembered_fields(self) -> Optional[Tuple[str, str]]:
+        fields = self._load_store().get('fields', {}).get(self.base_url)
+        return tuple(fields) if fields else None
+
+    def _restore_session(self) -> bool:
+        """載入保存的 cookies；已過期或不存在時回傳 False"""
+        saved = self._load_store().get('sessions', {}).get(self._session_key)
+        if not saved:
+            return False
+
+        now = time.time()
+        if now - saved.get('last_used', 0) > SESSION_TTL:
+            return False
+
+        cookies = [c for c in saved.get('cookies', []) if not c.get('expires') or c['expires'] > now]
+        if not cookies:
+            return False
+
+        for cookie in cookies:
+            self.session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''),
+                                     path=cookie.get('path', '/'), expires=cookie.get('expires'))
+        return True
+
+    def save(self, fields: Optional[Tuple[str, str]] = None):
+        """保存目前的 cookies（與成功的登入欄位），並更新最後使用時間"""
+        if not self.session_file or not self.logged_in:
+            return
+
+        store = self._load_store()
+        if fields:
+            store.setdefault('fields', {})[self.base_url] = list(fields)
+
+        cookies: List[Dict] = [
+            {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path, 'expires': c.expires}
+            for c in self.session.cookies
+        ]
+        store.setdefault('sessions', {})[self._session_key] = {
+            'cookies': cookies,
+            'last_used': time.time(),
+        }
+        self._write_store(store)
+
+    def forget(self):
+        """刪除保存的 session（例如確定已被登出）"""
+        store = self._load_store()
+        if store.get('sessions', {}).pop(self._session_key, None) is not None:
+            self._write_store(store)
+
+    def login(self, force: bool = False) -> requests.Session:
+        """
+        登入；有同一組帳密未過期的 session 時直接沿用，不送出任何請求
+        :param force: 忽略保存的 session，重新登入
+        :raises LoginError: 所有登入欄位都無法登入
+        """
+        if not force and self._restore_session():
+            self.logged_in = True
+            self.reused = True
+            return self.session
+
+        self.session.cookies.clear()
+        self.logged_in = False
+        self.reused = False
+        login_url = f"{self.base_url}/index.asp"
+
+        # 先試上次成功的欄位，失敗時才訪問首頁並逐一嘗試
+        remembered = self._remembered_fields()
+        attempts = ([remembered] if remembered else []) + [
+            fields for fields in LOGIN_FIELD_SETS if fields != remembered]
+
+        for index, fields in enumerate(attempts):
+            if index == (1 if remembered else 0):
+                # 首頁可能會先設定 cookies
+                self.login_requests += 1
+                self._request('get', login_url, timeout=self.timeout)
+
+            user_field, password_field = fields
+            self.login_requests += 1
+            response = self._request('post', login_url, timeout=self.timeout,
+                                     data={user_field: self.username, password_field: self.password})
+            response.encoding = 'big5'
+            if response.status_code == 200 and is_logged_in(response.text):
+                self.logged_in = True
+                self.save(fields)
+                return self.session
+
+        self.forget()
+        raise LoginError("登入失敗，請確認帳號密碼")
+
+    def get(self, page: str, **kwargs) -> requests.Response:
+        """
+        取得頁面（page 為相對路徑如 'main.asp'，或完整網址）
+        沿用的 session 已失效時重新登入並再取一次
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        url = page if page.startswith(('http://', 'https://')) else f"{self.base_url}/{page}"
+        response = self._request('get', url, **kwargs)
+
+        if response.status_code == 200 and is_login_page(response.text):
+            # 多個執行緒同時發現失效時只重新登入一次
+            cookies_before = dict(self.session.cookies)
+            with self._login_lock:
+                if dict(self.session.cookies) == cookies_before:
+                    print("⚠️ session 已失效，重新登入")
+                    self.login(force=True)
+            response = self._request('get', url, **kwargs)
+
+        return response
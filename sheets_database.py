@@ -7,9 +7,22 @@
 import os
 import json
 import re
-from typing import Optional, List, Dict, Tuple
+import time
+import weakref
+from typing import Optional, List, Dict, Tuple, Iterator
 from datetime import datetime
 import streamlit as st
+from instrumentation import recorder
+from bloom_filter import NameFilters
+from records import (Page, SearchResult, RosterRow, ClubRecord, StudentSummary, SemesterRecord,
+                     SemesterChange, ClubGradeCount, ClassParticipation)
+
+
+# 姓名 filter 依連線物件保存（st.connection 在各次重新執行間共用），{conn: (建立時間, NameFilters)}
+_name_filters = weakref.WeakKeyDictionary()
+
+# 與 st.connection 讀取快取相同量級的有效期限；其他程序寫入工作表時最多延遲這段時間才會反映
+NAME_FILTER_TTL = 600
 
 
 class SheetsDatabase:
@@ -18,9 +31,20 @@ class SheetsDatabase:
     透過 Streamlit 的 connection 功能自動處理認證
     """
 
-    def __init__(self):
-        """初始化 Google Sheets 連接"""
-        self.use_sheets = self._try_init_sheets()
+    def __init__(self, conn=None):
+        """
+        初始化 Google Sheets 連接
+        :param conn: 自訂連線物件（需提供 read/update），例如 fake_gsheets.FakeGSheetsConnection
+        """
+        self._staging = {}       # run_id -> 暫存中的社團與學生
+        self._staging_seq = 0
+        self._generation = 0     # 本程序寫入工作表的次數，作為資料版本號
+
+        if conn is not None:
+            self.conn = conn
+            self.use_sheets = True
+        else:
+            self.use_sheets = self._try_init_sheets()
 
         if not self.use_sheets:
             # 如果無法使用 Google Sheets，回退到本地 SQLite
@@ -69,13 +93,43 @@ class SheetsDatabase:
             return None
 
         try:
-            df = self.conn.read(worksheet=sheet_name)
+            with recorder.span('sheets_read', worksheet=sheet_name) as event:
+                df = self.conn.read(worksheet=sheet_name)
+                event['rows'] = len(df)
+            recorder.count('sheets_rows_read', len(df))
             return df
         except:
             # 工作表不存在，建立空的
             import pandas as pd
             return pd.DataFrame()
 
+    def _update_sheet(self, sheet_name: str, df):
+        """覆寫整張工作表"""
+        with recorder.span('sheets_update', worksheet=sheet_name, rows=len(df)):
+            self.conn.update(worksheet=sheet_name, data=df)
+        recorder.count('sheets_rows_written', len(df))
+        self._generation += 1
+
+        if sheet_name in ("students", "clubs"):
+            _name_filters.pop(self.conn, None)
+
+    def _cached_name_filters(self) -> Optional[NameFilters]:
+        """取得尚未過期的姓名 filter"""
+        cached = _name_filters.get(self.conn)
+        if cached is None or time.monotonic() - cached[0] > NAME_FILTER_TTL:
+            return None
+        return cached[1]
+
+    def _store_name_filters(self, students_df, clubs_df):
+        """由學生與社團工作表建立各學期與所有學期的姓名 filter"""
+        rows = []
+        if not students_df.empty and not clubs_df.empty:
+            merged = students_df[['club_id', 'student_name']].merge(
+                clubs_df[['id', 'semester_id']], left_on='club_id', right_on='id')
+            rows = zip(merged['semester_id'], merged['student_name'].astype(str))
+
+        _name_filters[self.conn] = (time.monotonic(), NameFilters.build(rows, self._generation))
+
     def get_or_create_semester(self, date_str: str) -> int:
         """取得或建立學期"""
         if not self.use_sheets:
@@ -105,7 +159,7 @@ class SheetsDatabase:
         }])
 
         updated_df = pd.concat([df, new_row], ignore_index=True) if not df.empty else new_row
-        self.conn.update(worksheet="semesters", data=updated_df)
+        self._update_sheet("semesters", updated_df)
 
         return new_id
 
@@ -120,6 +174,22 @@ class SheetsDatabase:
 
         return len(df[df['semester_id'] == semester_id]) > 0
 
+    def get_current_semester(self, today: Optional[str] = None) -> Optional[SemesterRecord]:
+        """依學期判斷規則找出今天所屬、且已建立的學期"""
+        if not self.use_sheets:
+            return self.db.get_current_semester(today)
+
+        year, term = self.parse_semester_from_date(today or datetime.now().strftime("%Y/%m/%d"))
+        df = self._get_or_create_sheet("semesters")
+        if df.empty or 'source_date' not in df.columns:
+            return None
+
+        matched = df[(df['semester'] == f"{year}{term}") & df['source_date'].notna()]
+        if matched.empty:
+            return None
+
+        return SemesterRecord.from_mapping(matched.iloc[0].to_dict())
+
     def save_club(self, semester_id: int, class_id: int, club_number: str, club_name: str) -> int:
         """儲存社團"""
         if not self.use_sheets:
@@ -136,7 +206,7 @@ class SheetsDatabase:
                 # 更新
                 df.loc[(df['semester_id'] == semester_id) & (df['class_id'] == class_id),
                        ['club_number', 'club_name']] = [club_number, club_name]
-                self.conn.update(worksheet="clubs", data=df)
+                self._update_sheet("clubs", df)
                 return club_id
 
         # 建立新社團
@@ -150,7 +220,7 @@ class SheetsDatabase:
         }])
 
         updated_df = pd.concat([df, new_row], ignore_index=True) if not df.empty else new_row
-        self.conn.update(worksheet="clubs", data=updated_df)
+        self._update_sheet("clubs", updated_df)
 
         return new_id
 
@@ -174,21 +244,33 @@ class SheetsDatabase:
         }])
 
         updated_df = pd.concat([df, new_row], ignore_index=True) if not df.empty else new_row
-        self.conn.update(worksheet="students", data=updated_df)
+        self._update_sheet("students", updated_df)
 
     def search_student(self, student_name: str, semester_id: Optional[int] = None,
-                      grade: Optional[str] = None) -> List[Dict]:
+                      grade: Optional[str] = None, grade_year: Optional[int] = None,
+                      class_num: Optional[int] = None) -> List[SearchResult]:
         """搜尋學生"""
         if not self.use_sheets:
-            return self.db.search_student(student_name, semester_id, grade)
+            return self.db.search_student(student_name, semester_id, grade, grade_year, class_num)
+
+        from club_database import parse_grade
 
         import pandas as pd
 
+        # 姓名一定不存在時直接回傳，不讀取任何工作表
+        filters = self._cached_name_filters()
+        if filters is not None and not filters.may_contain(student_name, semester_id):
+            recorder.count('search.bloom_skip')
+            return []
+
         # 讀取所有相關資料
         students_df = self._get_or_create_sheet("students")
         clubs_df = self._get_or_create_sheet("clubs")
         semesters_df = self._get_or_create_sheet("semesters")
 
+        if filters is None:
+            self._store_name_filters(students_df, clubs_df)
+
         if students_df.empty:
             return []
 
@@ -198,6 +280,14 @@ class SheetsDatabase:
         if grade:
             filtered = filtered[filtered['grade'] == grade]
 
+        if grade_year is not None or class_num is not None:
+            parsed = filtered['grade'].map(parse_grade)
+            if grade_year is not None:
+                filtered = filtered[parsed.map(lambda g: g[0] == grade_year)]
+                parsed = parsed[filtered.index]
+            if class_num is not None:
+                filtered = filtered[parsed.map(lambda g: g[1] == class_num)]
+
         if filtered.empty:
             return []
 
@@ -221,20 +311,340 @@ class SheetsDatabase:
             if semester.empty:
                 continue
 
-            results.append({
-                'semester': semester.iloc[0]['semester'],
-                'class_id': int(club_row['class_id']),
-                'club_number': club_row['club_number'],
-                'club_name': club_row['club_name'],
-                'student_id': student['student_id'],
-                'student_name': student['student_name'],
-                'grade': student['grade'],
-                'seat_number': student['seat_number']
-            })
+            results.append(SearchResult(
+                semester.iloc[0]['semester'],
+                int(club_row['class_id']),
+                club_row['club_number'],
+                club_row['club_name'],
+                student['student_id'],
+                student['student_name'],
+                student['grade'],
+                student['seat_number']
+            ))
+
+        return results
+
+    def _list_page(self, items: list, after: Optional[str], limit: int) -> Page:
+        """
+        工作表每次都整張讀取，分頁直接切割結果列表（游標為位置）
+        介面與 ClubDatabase 的分頁方法相同
+        """
+        from club_database import CursorError, decode_cursor, encode_cursor
+
+        start = 0
+        if after:
+            values = decode_cursor(after)
+            if len(values) != 1 or not isinstance(values[0], int):
+                raise CursorError(f"分頁游標不符: {after}")
+            start = values[0]
+        end = start + limit
+        return Page(items[start:end], encode_cursor([end]) if end < len(items) else None)
+
+    def search_student_page(self, student_name: str, semester_id: Optional[int] = None,
+                            grade: Optional[str] = None, grade_year: Optional[int] = None,
+                            class_num: Optional[int] = None, after: Optional[str] = None,
+                            limit: int = 50) -> Page:
+        """分頁搜尋學生"""
+        if not self.use_sheets:
+            return self.db.search_student_page(student_name, semester_id, grade, grade_year,
+                                               class_num, after, limit)
+
+        results = self.search_student(student_name, semester_id, grade, grade_year, class_num)
+        return self._list_page(results, after, limit)
+
+    def iter_search_student(self, student_name: str, semester_id: Optional[int] = None,
+                            grade: Optional[str] = None, grade_year: Optional[int] = None,
+                            class_num: Optional[int] = None,
+                            batch_size: int = 500) -> Iterator[SearchResult]:
+        """逐筆產生搜尋結果"""
+        if not self.use_sheets:
+            return self.db.iter_search_student(student_name, semester_id, grade, grade_year,
+                                               class_num, batch_size)
+
+        return iter(self.search_student(student_name, semester_id, grade, grade_year, class_num))
+
+    def _student_rows(self, students_df):
+        """學生資料附上社團與學期欄位，依學期由新到舊排序"""
+        clubs_df = self._get_or_create_sheet("clubs")
+        semesters_df = self._get_or_create_sheet("semesters")
+
+        merged = students_df.merge(
+            clubs_df.rename(columns={'id': 'club_id'}), on='club_id'
+        ).merge(
+            semesters_df.rename(columns={'id': 'semester_id'}), on='semester_id'
+        )
+        merged['sort_key'] = merged['year'].astype(int) * 2 + (merged['term'] == '下').astype(int)
+        return merged.sort_values(['sort_key', 'class_id'], ascending=[False, True])
+
+    def get_clubs(self, semester_id: int) -> List[ClubRecord]:
+        """取得某學期的所有社團與人數"""
+        if not self.use_sheets:
+            return self.db.get_clubs(semester_id)
+
+        clubs_df = self._get_or_create_sheet("clubs")
+        if clubs_df.empty:
+            return []
+        students_df = self._get_or_create_sheet("students")
+
+        clubs_df = clubs_df[clubs_df['semester_id'] == semester_id].sort_values('class_id')
+        counts = students_df['club_id'].value_counts() if not students_df.empty else {}
+
+        return [
+            ClubRecord(int(club['id']), int(club['class_id']), club['club_number'], club['club_name'],
+                       int(counts.get(club['id'], 0)))
+            for _, club in clubs_df.iterrows()
+        ]
+
+    def get_club_roster(self, semester_id: int, club_number: str) -> List[RosterRow]:
+        """取得某學期某社團的學生名單"""
+        if not self.use_sheets:
+            return self.db.get_club_roster(semester_id, club_number)
+
+        from club_database import parse_grade
+
+        clubs_df = self._get_or_create_sheet("clubs")
+        students_df = self._get_or_create_sheet("students")
+        if clubs_df.empty or students_df.empty:
+            return []
+
+        club = clubs_df[(clubs_df['semester_id'] == semester_id) & (clubs_df['club_number'] == club_number)]
+        if club.empty:
+            return []
+        club = club.iloc[0]
+
+        results = []
+        for _, student in students_df[students_df['club_id'] == club['id']].sort_values('id').iterrows():
+            grade_year, class_num = parse_grade(student['grade'])
+            results.append(RosterRow(
+                grade_year,
+                class_num,
+                student['seat_number'],
+                student['student_id'],
+                student['student_name'],
+                student['grade'],
+                int(club['class_id']),
+                club['club_number'],
+                club['club_name']
+            ))
+
+        return results
+
+    def diff_semesters(self, old_semester_id: int, new_semester_id: int) -> List[SemesterChange]:
+        """兩個學期間的異動（比對方式同 ClubDatabase：學號，沒有學號時以姓名加年級）"""
+        if not self.use_sheets:
+            return self.db.diff_semesters(old_semester_id, new_semester_id)
+
+        from club_database import parse_grade
+
+        students_df = self._get_or_create_sheet("students")
+        clubs_df = self._get_or_create_sheet("clubs")
+        semesters_df = self._get_or_create_sheet("semesters")
+        if students_df.empty or clubs_df.empty:
+            return []
+
+        students_df = students_df.assign(student_id=students_df['student_id'].fillna('').astype(str))
+        years = dict(zip(semesters_df['id'], semesters_df['year'].astype(int)))
+        club_numbers = dict(zip(clubs_df['id'], clubs_df['club_number']))
+        delta = years.get(new_semester_id, 0) - years.get(old_semester_id, 0)
+
+        def collect(semester_id, grade_delta):
+            """{比對鍵: (學號, 姓名, 年級, 班級, 社團編號列表)}"""
+            club_ids = clubs_df[clubs_df['semester_id'] == semester_id]['id']
+            students = {}
+            for _, student in students_df[students_df['club_id'].isin(club_ids)].iterrows():
+                grade_year, class_num = parse_grade(student['grade'])
+                student_id = student['student_id']
+                if student_id:
+                    key = f"id:{student_id}"
+                else:
+                    key = f"name:{student['student_name']}:" + (
+                        str(grade_year + grade_delta) if grade_year is not None else '')
+                entry = students.setdefault(
+                    key, (student_id or None, student['student_name'], grade_year, class_num, []))
+                entry[4].append(club_numbers[student['club_id']])
+            return students
+
+        current = collect(new_semester_id, 0)
+        previous = collect(old_semester_id, delta)
+
+        changes = []
+        for key, (student_id, name, grade_year, class_num, clubs) in current.items():
+            clubs = ','.join(sorted(clubs))
+            if key not in previous:
+                changes.append(SemesterChange('joined', student_id, name, grade_year, class_num, None, clubs))
+            else:
+                old_clubs = ','.join(sorted(previous[key][4]))
+                if old_clubs != clubs:
+                    changes.append(SemesterChange('changed', student_id, name, grade_year, class_num,
+                                                  old_clubs, clubs))
+        for key, (student_id, name, grade_year, class_num, clubs) in previous.items():
+            if key not in current:
+                changes.append(SemesterChange('dropped', student_id, name, grade_year, class_num,
+                                              ','.join(sorted(clubs)), None))
+
+        return sorted(changes, key=lambda c: (c.change_type, c.grade_year or 0, c.class_num or 0,
+                                               c.student_name))
+
+    def _previous_semester_id(self, semester_id: int) -> Optional[int]:
+        """有資料的前一個學期"""
+        clubs_df = self._get_or_create_sheet("clubs")
+        if clubs_df.empty:
+            return None
+
+        semesters = self.get_all_semesters()
+        with_data = set(clubs_df['semester_id'])
+        ids = [s.id for s in semesters]
+        if semester_id not in ids:
+            return None
+        for semester in semesters[ids.index(semester_id) + 1:]:
+            if semester.id in with_data:
+                return semester.id
+        return None
+
+    def get_semester_changes(self, semester_id: int,
+                             change_type: Optional[str] = None) -> List[SemesterChange]:
+        """某學期與前一學期相比的異動"""
+        if not self.use_sheets:
+            return self.db.get_semester_changes(semester_id, change_type)
+
+        previous_id = self._previous_semester_id(semester_id)
+        if previous_id is None:
+            return []
+
+        changes = self.diff_semesters(previous_id, semester_id)
+        return [c for c in changes if not change_type or c.change_type == change_type]
+
+    def get_change_summary(self, semester_id: int) -> Dict:
+        """某學期異動的人數統計"""
+        if not self.use_sheets:
+            return self.db.get_change_summary(semester_id)
+
+        summary = {'previous_semester_id': self._previous_semester_id(semester_id),
+                   'joined': 0, 'dropped': 0, 'changed': 0}
+        if summary['previous_semester_id'] is not None:
+            for change in self.diff_semesters(summary['previous_semester_id'], semester_id):
+                summary[change.change_type] += 1
+        return summary
+
+    def _semester_enrollments(self, semester_id: int):
+        """某學期的學生與所屬社團（含拆出的年級、班級），沒有資料時回傳 None"""
+        from club_database import parse_grade
+
+        clubs_df = self._get_or_create_sheet("clubs")
+        students_df = self._get_or_create_sheet("students")
+        if clubs_df.empty or students_df.empty:
+            return None
+
+        clubs_df = clubs_df[clubs_df['semester_id'] == semester_id]
+        merged = students_df.merge(clubs_df.rename(columns={'id': 'club_id'}), on='club_id')
+        if merged.empty:
+            return None
+
+        merged['student_id'] = merged['student_id'].fillna('').astype(str)
+        parsed = [parse_grade(grade) for grade in merged['grade']]
+        merged['grade_year'] = [grade_year for grade_year, _ in parsed]
+        merged['class_num'] = [class_num for _, class_num in parsed]
+        return merged
+
+    def get_club_grade_stats(self, semester_id: int) -> List[ClubGradeCount]:
+        """某學期各社團各年級的人數"""
+        if not self.use_sheets:
+            return self.db.get_club_grade_stats(semester_id)
+
+        merged = self._semester_enrollments(semester_id)
+        if merged is None:
+            return []
+
+        merged['grade_year'] = merged['grade_year'].fillna(0).astype(int)
+        counts = merged.groupby(['class_id', 'club_number', 'club_name', 'grade_year']).size()
+        return [
+            ClubGradeCount(int(class_id), club_number, club_name, int(grade_year), int(count))
+            for (class_id, club_number, club_name, grade_year), count in sorted(counts.items())
+        ]
+
+    def get_class_participation(self, semester_id: int,
+                                grade_year: Optional[int] = None) -> List[ClassParticipation]:
+        """某學期各班參加社團的人數與最大座號"""
+        if not self.use_sheets:
+            return self.db.get_class_participation(semester_id, grade_year)
+
+        merged = self._semester_enrollments(semester_id)
+        if merged is None:
+            return []
+
+        merged = merged.dropna(subset=['grade_year', 'class_num'])
+        if grade_year is not None:
+            merged = merged[merged['grade_year'] == grade_year]
+
+        results = []
+        for (year, class_num), group in merged.groupby(['grade_year', 'class_num']):
+            keys = {f"id:{row['student_id']}" if row['student_id'] else f"name:{row['student_name']}"
+                    for _, row in group.iterrows()}
+            seats = [int(seat) for seat in group['seat_number'] if str(seat).isdigit()]
+            max_seat = max(seats) if seats and max(seats) > 0 else None
+            results.append(ClassParticipation(int(year), int(class_num), len(keys), len(group), max_seat))
+        return results
+
+    def find_students(self, student_name: str) -> List[StudentSummary]:
+        """依姓名找出所有不同的學生（以學號區分同名學生）"""
+        if not self.use_sheets:
+            return self.db.find_students(student_name)
+
+        from club_database import parse_grade
+
+        students_df = self._get_or_create_sheet("students")
+        if students_df.empty:
+            return []
+
+        matched = students_df[students_df['student_name'] == student_name]
+        if matched.empty:
+            return []
+
+        rows = self._student_rows(matched)
+        results = []
+        for student_id, group in rows.groupby('student_id', sort=False):
+            latest = group.iloc[0]
+            grade_year, class_num = parse_grade(latest['grade'])
+            results.append(StudentSummary(
+                student_id,
+                latest['student_name'],
+                grade_year,
+                class_num,
+                latest['semester'],
+                group['semester_id'].nunique()
+            ))
 
         return results
 
-    def get_all_semesters(self) -> List[Dict]:
+    def get_student_history(self, student_id: str) -> List[SearchResult]:
+        """取得某位學生（以學號識別）歷年參加的所有社團"""
+        if not self.use_sheets:
+            return self.db.get_student_history(student_id)
+
+        students_df = self._get_or_create_sheet("students")
+        if students_df.empty:
+            return []
+
+        matched = students_df[students_df['student_id'].astype(str) == str(student_id)]
+        if matched.empty:
+            return []
+
+        results = []
+        for _, row in self._student_rows(matched).iterrows():
+            results.append(SearchResult(
+                row['semester'],
+                int(row['class_id']),
+                row['club_number'],
+                row['club_name'],
+                row['student_id'],
+                row['student_name'],
+                row['grade'],
+                row['seat_number']
+            ))
+
+        return results
+
+    def get_all_semesters(self) -> List[SemesterRecord]:
         """取得所有學期"""
         if not self.use_sheets:
             return self.db.get_all_semesters()
@@ -245,7 +655,21 @@ class SheetsDatabase:
 
         df = df.sort_values(['year', 'term'], ascending=[False, False])
 
-        return df.to_dict('records')
+        return [SemesterRecord.from_mapping(row) for row in df.to_dict('records')]
+
+    def get_semesters_page(self, after: Optional[str] = None, limit: int = 20) -> Page:
+        """分頁取得學期列表"""
+        if not self.use_sheets:
+            return self.db.get_semesters_page(after, limit)
+
+        return self._list_page(self.get_all_semesters(), after, limit)
+
+    def iter_semesters(self, batch_size: int = 100) -> Iterator[SemesterRecord]:
+        """逐筆產生學期"""
+        if not self.use_sheets:
+            return self.db.iter_semesters(batch_size)
+
+        return iter(self.get_all_semesters())
 
     def clear_semester_data(self, semester_id: int):
         """清除學期資料"""
@@ -264,12 +688,12 @@ class SheetsDatabase:
         # 刪除學生
         if not students_df.empty and clubs_to_delete:
             students_df = students_df[~students_df['club_id'].isin(clubs_to_delete)]
-            self.conn.update(worksheet="students", data=students_df)
+            self._update_sheet("students", students_df)
 
         # 刪除社團
         if not clubs_df.empty:
             clubs_df = clubs_df[clubs_df['semester_id'] != semester_id]
-            self.conn.update(worksheet="clubs", data=clubs_df)
+            self._update_sheet("clubs", clubs_df)
 
     def update_semester_timestamp(self, semester_id: int):
         """更新學期時間戳"""
@@ -279,4 +703,105 @@ class SheetsDatabase:
         df = self._get_or_create_sheet("semesters")
         if not df.empty:
             df.loc[df['id'] == semester_id, 'last_updated'] = datetime.now().isoformat()
-            self.conn.update(worksheet="semesters", data=df)
+            self._update_sheet("semesters", df)
+
+    def get_data_generation(self) -> int:
+        """取得資料版本號"""
+        if not self.use_sheets:
+            return self.db.get_data_generation()
+
+        return self._generation
+
+    def begin_staging(self, semester_id: int) -> int:
+        """開始暫存寫入：爬取期間資料只保留在記憶體，發佈時才寫入工作表"""
+        if not self.use_sheets:
+            return self.db.begin_staging(semester_id)
+
+        self._staging_seq += 1
+        run_id = self._staging_seq
+        self._staging[run_id] = {'semester_id': semester_id, 'clubs': []}
+        return run_id
+
+    def stage_club(self, run_id: int, class_id: int, club_number: str, club_name: str,
+                   students: List[Tuple]) -> int:
+        """暫存一個社團及其學生 [(student_name, student_id, grade, seat_number)]"""
+        if not self.use_sheets:
+            return self.db.stage_club(run_id, class_id, club_number, club_name, students)
+
+        # 同一個 ClassID 再次暫存時取代先前的社團與學生
+        clubs = self._staging[run_id]['clubs']
+        clubs[:] = [club for club in clubs if club[0] != class_id]
+        clubs.append((class_id, club_number, club_name, list(students)))
+        return len(clubs)
+
+    def publish_staging(self, run_id: int) -> Tuple[int, int]:
+        """
+        以暫存資料取代該學期資料
+        每張工作表只讀取一次、students 只寫入一次（原本每筆學生都要讀寫整張 students 工作表）
+        """
+        if not self.use_sheets:
+            return self.db.publish_staging(run_id)
+
+        import pandas as pd
+
+        run = self._staging.pop(run_id)
+        semester_id = run['semester_id']
+        if not run['clubs']:
+            raise ValueError(f"暫存資料為空，不發佈 (run_id={run_id})")
+
+        clubs_df = self._get_or_create_sheet("clubs")
+        students_df = self._get_or_create_sheet("students")
+
+        # 移除舊版本的學生（舊社團要等新學生寫入後才移除）
+        old_club_ids = [] if clubs_df.empty else clubs_df[clubs_df['semester_id'] == semester_id]['id'].tolist()
+        if not students_df.empty:
+            students_df = students_df[~students_df['club_id'].isin(old_club_ids)]
+
+        # 新 ID 接續現有最大值，避免與尚未移除的舊資料衝突
+        next_club_id = 1 if clubs_df.empty else int(clubs_df['id'].max()) + 1
+        next_student_id = 1 if students_df.empty else int(students_df['id'].max()) + 1
+
+        new_clubs = []
+        new_students = []
+        for class_id, club_number, club_name, students in sorted(run['clubs']):
+            club_id = next_club_id + len(new_clubs)
+            new_clubs.append({
+                'id': club_id,
+                'semester_id': semester_id,
+                'class_id': class_id,
+                'club_number': club_number,
+                'club_name': club_name
+            })
+            for student_name, student_id, grade, seat_number in students:
+                new_students.append({
+                    'id': next_student_id + len(new_students),
+                    'club_id': club_id,
+                    'student_id': student_id if student_id else '',
+                    'student_name': student_name,
+                    'grade': grade if grade else '',
+                    'seat_number': seat_number if seat_number else ''
+                })
+
+        clubs_df = pd.concat([clubs_df, pd.DataFrame(new_clubs)], ignore_index=True)
+        students_df = pd.concat([students_df, pd.DataFrame(new_students)], ignore_index=True)
+
+        # Google Sheets 無法跨工作表交易，分三次寫入，每個中間狀態的學生都找得到所屬社團：
+        # 1. 新舊社團並存（社團列表短暫出現重複、新社團尚無學生，搜尋仍是舊資料）
+        # 2. 以新學生取代舊學生（搜尋改為新資料，舊社團沒有學生）
+        # 3. 移除舊社團
+        self._update_sheet("clubs", clubs_df)
+        self._update_sheet("students", students_df)
+        if old_club_ids:
+            clubs_df = clubs_df[~clubs_df['id'].isin(old_club_ids)]
+            self._update_sheet("clubs", clubs_df)
+        self.update_semester_timestamp(semester_id)
+        self._store_name_filters(students_df, clubs_df)
+
+        return len(new_clubs), len(new_students)
+
+    def discard_staging(self, run_id: int):
+        """放棄暫存資料"""
+        if not self.use_sheets:
+            return self.db.discard_staging(run_id)
+
+        self._staging.pop(run_id, None)
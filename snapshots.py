@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+唯讀資料庫快照
+每次發佈學期資料後，以 SQLite backup API 將 club_data.db 複製為該資料版本號的快照檔
+（club-g<版本號>.db，複製後改為唯讀），再以 os.replace 原子性地更新 CURRENT 指標。
+多個網頁／API 程序以 immutable=1、mode=ro 開啟快照：不需要鎖、不讀 -wal/-shm，
+與爬蟲的寫入完全無關，讀取吞吐量隨程序數增加；CURRENT 改變後各程序的下一次查詢改用新快照
+
+設定（環境變數）:
+    JKES_SNAPSHOT_DIR  快照目錄；設定後發佈學期資料時自動產生快照，網頁改由快照查詢
+
+使用方式:
+    python3 snapshots.py publish [club_data.db] [快照目錄]
+    python3 snapshots.py current [快照目錄]
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+from typing import Optional
+
+from club_database import ClubDatabase
+
+
+DEFAULT_SNAPSHOT_DIR = os.getenv('JKES_SNAPSHOT_DIR') or None
+
+# 保留的快照數（舊快照可能仍被其他程序開啟；刪除後已開啟的連線仍可讀到結束）
+KEEP_SNAPSHOTS = 3
+
+POINTER_FILE = 'CURRENT'
+_SNAPSHOT_NAME = re.compile(r'^club-g(\d+)\.db$')
+
+_publish_lock = threading.Lock()
+
+
+def snapshot_name(generation: int) -> str:
+    return f"club-g{generation}.db"
+
+
+def current_snapshot(snapshot_dir: str) -> Optional[str]:
+    """CURRENT 指向的快照檔路徑，沒有快照時回傳 None"""
+    try:
+        with open(os.path.join(snapshot_dir, POINTER_FILE), 'r', encoding='utf-8') as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+
+    path = os.path.join(snapshot_dir, name)
+    return path if _SNAPSHOT_NAME.match(name) and os.path.exists(path) else None
+
+
+def open_snapshot(path: str) -> sqlite3.Connection:
+    """以唯讀、immutable 模式開啟快照（SQLite 不檢查檔案變更、不取得任何鎖）"""
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro&immutable=1", uri=True,
+                           check_same_thread=False)
+
+
+def _snapshot_generation(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM meta WHERE key = 'data_generation'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def publish_snapshot(db_path: str, snapshot_dir: str) -> str:
+    """
+    將資料庫複製為目前資料版本號的快照並切換 CURRENT 指標
+    backup 期間讀到的是一致的版本；該版本的快照已存在時不重複複製
+    :return: 快照檔路徑
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    with _publish_lock:
+        tmp_path = os.path.join(snapshot_dir, f".club-{os.getpid()}-{threading.get_ident()}.db.tmp")
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.backup(target)
+            # 快照不使用 WAL：唯讀開啟時不需要 -wal/-shm 檔
+            target.execute('PRAGMA journal_mode=DELETE')
+            generation = _snapshot_generation(target)
+        except BaseException:
+            target.close()
+            os.remove(tmp_path)
+            raise
+        finally:
+            target.close()
+            source.close()
+
+        path = os.path.join(snapshot_dir, snapshot_name(generation))
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, path)
+
+        # 原子切換指標：讀取端只會看到舊的或新的快照名稱
+        pointer_tmp = os.path.join(snapshot_dir, f".{POINTER_FILE}.{os.getpid()}.tmp")
+        with open(pointer_tmp, 'w', encoding='utf-8') as f:
+            f.write(snapshot_name(generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_tmp, os.path.join(snapshot_dir, POINTER_FILE))
+
+        _remove_old_snapshots(snapshot_dir, generation)
+
+    return path
+
+
+def _remove_old_snapshots(snapshot_dir: str, current_generation: int):
+    generations = sorted(
+        (int(match.group(1)) for match in map(_SNAPSHOT_NAME.match, os.listdir(snapshot_dir)) if match),
+        reverse=True)
+    for generation in generations[KEEP_SNAPSHOTS:]:
+        if generation != current_generation:
+            try:
+                os.remove(os.path.join(snapshot_dir, snapshot_name(generation)))
+            except OSError:
+                pass
+
+
+class SnapshotDatabase(ClubDatabase):
+    """
+    由唯讀快照查詢的 ClubDatabase（供網頁、API 等只讀取的程序使用）
+    每個執行緒各自開啟快照；CURRENT 指標改變後下一次查詢改開新快照。
+    寫入方法仍寫到主資料庫，但要等下一次發佈快照後才查得到
+    """
+
+    def __init__(self, db_path: str = 'club_data.db', snapshot_dir: Optional[str] = DEFAULT_SNAPSHOT_DIR,
+                 slow_query_ms: Optional[float] = None):
+        if not snapshot_dir:
+            raise ValueError("未指定快照目錄")
+        self.snapshot_dir = snapshot_dir
+        self._local = threading.local()
+        super().__init__(db_path, slow_query_ms)
+
+    def init_database(self):
+        """唯讀程序不執行 migration（快照由已更新的主資料庫複製）"""
+        if current_snapshot(self.snapshot_dir) is None:
+            raise FileNotFoundError(f"{self.snapshot_dir} 沒有資料庫快照")
+
+    def _pointer_key(self):
+        try:
+            stat = os.stat(os.path.join(self.snapshot_dir, POINTER_FILE))
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _read_conn(self):
+        key = self._pointer_key()
+        cached = getattr(self._local, 'snapshot', None)
+        if cached is not None and (cached[0] == key or key is None):
+            return cached[1]
+
+        path = current_snapshot(self.snapshot_dir)
+        if path is None:
+            if cached is not None:
+                return cached[1]
+            raise FileNotFoundError(f"{self.snapshot_dir} 沒有資料庫快照")
+
+        if cached is not None:
+            cached[1].close()
+        conn = open_snapshot(path)
+        self._local.snapshot = (key, conn, _snapshot_generation(conn))
+        return conn
+
+    def close(self):
+        """關閉本執行緒開啟的快照（之後的查詢會重新開啟）"""
+        cached = getattr(self._local, 'snapshot', None)
+        if cached is not None:
+            self._local.snapshot = None
+            cached[1].close()
+        super().close()
+
+    def _name_filters(self):
+        """姓名 filter 由主資料庫產生，版本號與快照相同時才能使用"""
+        filters = super()._name_filters()
+        self._read_conn()
+        if filters is not None and filters.generation != self._local.snapshot[2]:
+            return None
+        return filters
+
+
+def reader_for(db):
+    """設定了快照目錄且已有快照時，回傳由快照查詢的資料庫，否則回傳原本的資料庫"""
+    inner = getattr(db, 'db', db)  # CloudDatabase 代理實際的資料庫
+    if not DEFAULT_SNAPSHOT_DIR or type(inner) is not ClubDatabase:
+        return db
+
+    try:
+        return SnapshotDatabase(inner.db_path, DEFAULT_SNAPSHOT_DIR, inner.slow_query_ms)
+    except FileNotFoundError:
+        return db
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('publish', 'current'):
+        print(__doc__)
+        return
+
+    if sys.argv[1] == 'publish':
+        db_path = sys.argv[2] if len(sys.argv) > 2 else 'club_data.db'
+        ClubDatabase(db_path)  # 套用尚未執行的 migration
+        snapshot_dir = sys.argv[3] if len(sys.argv) > 3 else (DEFAULT_SNAPSHOT_DIR or f"{db_path}.snapshots")
+        path = publish_snapshot(db_path, snapshot_dir)
+        print(f"✓ 已發佈快照 {path}（{os.path.getsize(path) / 1024:.1f} KB）")
+    else:
+        snapshot_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SNAPSHOT_DIR
+        path = current_snapshot(snapshot_dir) if snapshot_dir else None
+        print(path or "⚠️ 沒有快照")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,14 +4,13 @@
 """
 
 import streamlit as st
-import requests
+from school_client import SchoolClient, LoginError
+from rate_limiter import get_rate_limiter
 from bs4 import BeautifulSoup
-import time
 import pandas as pd
 
 # 設定
 BASE_URL = "http://www2.jkes.tp.edu.tw"
-LOGIN_URL = f"{BASE_URL}/index.asp"
 LIST_URL = f"{BASE_URL}/list.asp"
 
 # 搜尋範圍
@@ -48,36 +47,13 @@ def get_club_names(session):
 
 
 def create_session(username, password):
-    """建立並登入 session"""
-    session = requests.Session()
-
-    # 設定 headers 模擬瀏覽器
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    })
-
-    # 先訪問首頁取得可能的 cookies
-    try:
-        session.get(LOGIN_URL, timeout=10)
-    except Exception as e:
-        st.warning(f"訪問首頁時發生錯誤: {e}")
-
-    # 嘗試登入（網站可能需要不同的欄位名稱）
-    login_attempts = [
-        {'username': username, 'password': password},
-        {'userid': username, 'pwd': password},
-        {'account': username, 'password': password},
-    ]
-
-    for login_data in login_attempts:
-        try:
-            response = session.post(LOGIN_URL, data=login_data, timeout=10)
-            if response.status_code == 200:
-                break
-        except Exception as e:
-            continue
-
-    return session
+    """
+    登入並回傳已登入的 SchoolClient（有未過期的 session 時直接沿用）；帳密錯誤時拋出 LoginError
+    每個請求都先取得與爬蟲等其他程序共用的請求額度
+    """
+    client = SchoolClient(username, password, base_url=BASE_URL, rate_limiter=get_rate_limiter())
+    client.login()
+    return client
 
 
 def search_class(session, class_id, target_name):
@@ -151,7 +127,11 @@ def main():
 
         # 建立 session 並登入
         with st.spinner("正在登入系統..."):
-            session = create_session(username, password)
+            try:
+                session = create_session(username, password)
+            except LoginError as e:
+                st.error(f"⚠️ {e}")
+                return
 
         # 取得社團名稱對照表
         with st.spinner("正在載入社團列表..."):
@@ -186,9 +166,6 @@ def main():
                     '網址': f"{LIST_URL}?ClassID={class_id}"
                 })
 
-            # 避免請求太頻繁
-            time.sleep(0.3)
-
         # 完成搜尋
         progress_bar.progress(1.0)
         status_text.text("搜尋完成！")
@@ -4,6 +4,8 @@
 專為 iPhone 和 Mac 優化的響應式設計
 """
 
+from collections import defaultdict
+
 import streamlit as st
 import pandas as pd
 try:
@@ -11,6 +13,9 @@ try:
 except ImportError:
     from club_database import ClubDatabase as Database
 from club_crawler import ClubCrawler
+from debug_panel import debug_panel_enabled, render_debug_panel
+from name_index import default_index_path, export_name_index, get_name_index
+from snapshots import reader_for
 
 
 def apply_mobile_styles():
@@ -149,8 +154,8 @@ def main():
     # 套用手機優化樣式
     apply_mobile_styles()
 
-    # 初始化資料庫
-    db = Database()
+    # 初始化資料庫（設定 JKES_SNAPSHOT_DIR 時由唯讀快照查詢，不與爬蟲的寫入互相影響）
+    db = reader_for(Database())
 
     # 標題
     st.markdown("""
@@ -164,7 +169,7 @@ def main():
     st.markdown("### 🔍 快速搜尋")
 
     # 搜尋模式選擇（用 tabs 取代 radio）
-    tab1, tab2 = st.tabs(["⚡ 快速搜尋", "🔄 完整搜尋"])
+    tab1, tab2, tab3, tab4 = st.tabs(["⚡ 快速搜尋", "🔄 完整搜尋", "📋 社團名單", "📊 統計"])
 
     with tab1:
         quick_search_ui(db)
@@ -172,6 +177,17 @@ def main():
     with tab2:
         full_search_ui(db)
 
+    with tab3:
+        browse_clubs_ui(db)
+
+    with tab4:
+        stats_ui(db)
+
+    # 除錯面板含其他使用者的查詢內容，只在設定 JKES_DEBUG_PANEL 時顯示
+    if debug_panel_enabled():
+        with st.sidebar:
+            render_debug_panel()
+
 
 def quick_search_ui(db):
     """快速搜尋介面"""
@@ -215,10 +231,9 @@ def quick_search_ui(db):
         with col2:
             class_num = st.selectbox("班級", ["不限", "1", "2", "3", "4", "5", "6"])
 
-        if grade != "不限" and class_num != "不限":
-            grade_filter = f"{grade}年{class_num}班"
-        else:
-            grade_filter = None
+        # 年級、班級可單獨篩選（例如「三年級全部」）
+        grade_year = int(grade) if grade != "不限" else None
+        class_filter = int(class_num) if class_num != "不限" else None
 
     # 搜尋按鈕
     if st.button("🔍 開始搜尋", type="primary", key="quick_search_btn"):
@@ -236,10 +251,141 @@ def quick_search_ui(db):
 
         # 搜尋
         with st.spinner("🔎 搜尋中..."):
-            results = db.search_student(student_name, semester_id, grade_filter if 'grade_filter' in locals() else None)
+            results = search_student_cached(db, student_name, semester_id,
+                                            grade_year=grade_year, class_num=class_filter)
 
         # 顯示結果
         display_results_mobile(results, student_name)
+        display_name_collisions(db, student_name)
+
+
+def display_name_collisions(db, student_name):
+    """同名但學號不同的學生分開列出，並可查看各自的歷年社團"""
+    students = db.find_students(student_name)
+    if len(students) < 2:
+        return
+
+    st.warning(f"⚠️ 有 {len(students)} 位同名學生，以上結果可能包含不同學生")
+    for student in students:
+        if student['grade_year'] is not None and student['class_num'] is not None:
+            grade = f"{student['grade_year']}年{student['class_num']}班"
+        else:
+            grade = "年級不明"
+        label = f"學號 {student['student_id']}｜最近 {student['last_semester']} {grade}"
+        with st.expander(label):
+            history = db.get_student_history(student['student_id'])
+            st.dataframe(pd.DataFrame(history)[['semester', 'club_number', 'club_name', 'grade']],
+                         use_container_width=True, hide_index=True)
+
+
+def search_student_cached(db, student_name, semester_id=None, grade_year=None, class_num=None):
+    """有最新的姓名索引檔時直接由索引檔查詢（各程序共用頁面快取），否則查詢資料庫"""
+    db_path = getattr(db, 'db_path', None)
+    if db_path:
+        index = get_name_index(default_index_path(db_path))
+        if index is not None and index.generation == db.get_data_generation():
+            return index.search_student(student_name, semester_id,
+                                        grade_year=grade_year, class_num=class_num)
+
+    return db.search_student(student_name, semester_id, grade_year=grade_year, class_num=class_num)
+
+
+def refresh_name_index(db):
+    """資料更新後重新匯出姓名索引檔（僅 SQLite 後端）"""
+    db_path = getattr(db, 'db_path', None)
+    if not db_path:
+        return
+
+    try:
+        export_name_index(db_path)
+    except Exception as e:
+        print(f"⚠️ 匯出姓名索引檔失敗: {e}")
+
+
+def browse_clubs_ui(db):
+    """社團名單瀏覽介面（使用已儲存的資料，不需重新爬取）"""
+    semesters = db.get_all_semesters()
+
+    if not semesters:
+        st.warning("⚠️ 資料庫中沒有資料，請先使用「完整搜尋」建立資料")
+        return
+
+    semester = st.selectbox("📅 選擇學期", semesters, format_func=lambda s: s.semester,
+                            key="browse_semester")
+    clubs = db.get_clubs(semester.id)
+
+    if not clubs:
+        st.info("ℹ️ 這個學期沒有社團資料")
+        return
+
+    club = st.selectbox("🎨 選擇社團", clubs, key="browse_club",
+                        format_func=lambda c: f"{c.club_number} {c.club_name}（{c.student_count} 人）")
+
+    roster = db.get_club_roster(semester.id, club.club_number)
+    st.markdown(f"### {club.club_name}")
+    st.caption(f"編號 {club.club_number}｜共 {len(roster)} 位學生")
+
+    if roster:
+        st.dataframe(
+            pd.DataFrame(roster)[['grade', 'seat_number', 'student_name', 'student_id']].rename(
+                columns={'grade': '班級', 'seat_number': '座號', 'student_name': '姓名', 'student_id': '學號'}),
+            use_container_width=True, hide_index=True)
+
+    summary = db.get_change_summary(semester.id)
+    if summary['previous_semester_id'] is not None:
+        with st.expander(f"🔁 與上學期比較（新加入 {summary['joined']}、"
+                         f"未續報 {summary['dropped']}、換社團 {summary['changed']}）"):
+            labels = {'joined': '新加入', 'dropped': '未續報', 'changed': '換社團'}
+            changes = db.get_semester_changes(semester.id)
+            if changes:
+                df = pd.DataFrame(changes)
+                df['change_type'] = df['change_type'].map(labels)
+                st.dataframe(
+                    df[['change_type', 'student_name', 'grade_year', 'class_num', 'old_clubs', 'new_clubs']].rename(
+                        columns={'change_type': '異動', 'student_name': '姓名', 'grade_year': '年級',
+                                 'class_num': '班', 'old_clubs': '上學期社團', 'new_clubs': '本學期社團'}),
+                    use_container_width=True, hide_index=True)
+
+
+def stats_ui(db):
+    """社團統計介面（只讀取發佈時計算好的統計表）"""
+    semesters = db.get_all_semesters()
+
+    if not semesters:
+        st.warning("⚠️ 資料庫中沒有資料，請先使用「完整搜尋」建立資料")
+        return
+
+    semester = st.selectbox("📅 選擇學期", semesters, format_func=lambda s: s.semester,
+                            key="stats_semester")
+    grade_stats = db.get_club_grade_stats(semester.id)
+
+    if not grade_stats:
+        st.info("ℹ️ 這個學期沒有社團資料")
+        return
+
+    # 社團 × 年級人數
+    st.markdown("#### 🎨 各社團各年級人數")
+    df = pd.DataFrame(grade_stats)
+    df['grade_year'] = df['grade_year'].map(lambda year: f"{year}年級" if year else "未知")
+    table = df.pivot_table(index=['club_number', 'club_name'], columns='grade_year',
+                           values='student_count', aggfunc='sum', fill_value=0)
+    table['合計'] = table.sum(axis=1)
+    table.index.names = ['編號', '社團']
+    table.columns.name = '年級'
+    st.dataframe(table, use_container_width=True)
+
+    # 各班參加情形
+    st.markdown("#### 🏫 各班參加情形")
+    participation = db.get_class_participation(semester.id)
+    if participation:
+        df = pd.DataFrame(participation)
+        df['class'] = df['grade_year'].astype(str) + "年" + df['class_num'].astype(str) + "班"
+        st.dataframe(
+            df[['class', 'participants', 'enrollments', 'max_seat_number']].rename(
+                columns={'class': '班級', 'participants': '參加人數', 'enrollments': '報名社團數',
+                         'max_seat_number': '最大座號（班級人數下限）'}),
+            use_container_width=True, hide_index=True)
+        st.caption("資料只包含參加社團的學生，無法得知班級實際人數與參加率；最大座號僅為班級人數的下限")
 
 
 def full_search_ui(db):
@@ -284,10 +430,14 @@ def full_search_ui(db):
         progress_bar.progress(0.3)
 
         semester_id, updated = crawler.crawl_all_data(force_update=force_update)
+        st.session_state['last_crawl_summary'] = crawler.last_summary
         progress_bar.progress(0.9)
 
-        if updated:
+        if crawler.last_summary.get('aborted'):
+            st.error(f"⚠️ 爬取中止：{crawler.last_summary['aborted']}，保留原有資料")
+        elif updated:
             st.success("✅ 資料已更新！")
+            refresh_name_index(db)
         else:
             st.info("ℹ️ 使用快取資料")
 
@@ -312,16 +462,18 @@ def display_results_mobile(results, student_name):
         </div>
         """, unsafe_allow_html=True)
 
-        # 依學期分組顯示
-        df = pd.DataFrame(results)
-        semesters = df['semester'].unique()
+        # 依學期分組顯示（直接使用查詢結果，不另建 DataFrame）
+        by_semester = defaultdict(list)
+        for row in results:
+            by_semester[row.semester].append(row)
+        semesters = list(by_semester)
 
         for semester in sorted(semesters, reverse=True):
-            semester_data = df[df['semester'] == semester]
+            semester_data = by_semester[semester]
 
             st.markdown(f"### 📅 {semester} 學期")
 
-            for idx, row in semester_data.iterrows():
+            for row in semester_data:
                 # 每個社團一張卡片
                 with st.container():
                     st.markdown(f"""
@@ -330,9 +482,9 @@ def display_results_mobile(results, student_name):
                                 box-shadow: 0 2px 4px rgba(0,0,0,0.05);'>
                         <div style='display: flex; justify-content: space-between; align-items: center;'>
                             <div>
-                                <h4 style='margin: 0; color: #667eea;'>{row['club_name']}</h4>
+                                <h4 style='margin: 0; color: #667eea;'>{row.club_name}</h4>
                                 <p style='margin: 0.25rem 0 0 0; color: #666; font-size: 0.9rem;'>
-                                    編號: {row['club_number']} | 班級: {row['grade']}
+                                    編號: {row.club_number} | 班級: {row.grade}
                                 </p>
                             </div>
                         </div>
@@ -348,7 +500,8 @@ def display_results_mobile(results, student_name):
         with col2:
             st.metric("涵蓋學期", len(semesters))
         with col3:
-            most_common = df['semester'].mode()[0] if len(df) > 0 else "N/A"
+            counts = {semester: len(rows) for semester, rows in by_semester.items()}
+            most_common = max(sorted(counts), key=counts.get) if counts else "N/A"
             st.metric("主要學期", most_common)
 
     else:
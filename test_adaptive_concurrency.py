@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+測試 AIMD 並行數控制器
+"""
+
+import threading
+import time
+
+from adaptive_concurrency import AIMDController
+
+
+def test_additive_increase():
+    controller = AIMDController(initial=1, max_limit=4)
+    for _ in range(1 + 2 + 3 + 10):
+        controller.record(50)
+    assert controller.limit == 4
+    assert controller.snapshot()['increases'] == 3
+
+
+def test_multiplicative_decrease_once_per_batch():
+    controller = AIMDController(initial=8, max_limit=8)
+    issued = []
+    for _ in range(4):
+        with controller.slot() as issued_at:
+            issued.append(issued_at)
+    controller.record(50, issued_at=issued[0])
+
+    # 同一批請求接連變慢只減少一次
+    for issued_at in issued:
+        controller.record(5000, issued_at=issued_at)
+    assert controller.limit == 4 and controller.decreases == 1
+
+    # 減少之後才發出的請求失敗時再減少
+    with controller.slot() as issued_at:
+        controller.record(0, ok=False, issued_at=issued_at)
+    assert controller.limit == 2
+
+    snapshot = controller.snapshot()
+    assert snapshot['baseline_ms'] == 50 and snapshot['decreases'] == 2
+
+
+def test_slot_limits_parallelism():
+    controller = AIMDController(initial=2, max_limit=2)
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with controller.slot():
+            with lock:
+                peak.append(controller.in_flight)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+    assert controller.in_flight == 0
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+測試唯讀 JSON API（使用暫存資料庫，在本機啟動服務）
+"""
+
+import http.client
+import json
+import os
+import tempfile
+import threading
+from urllib.parse import quote
+
+from api_server import APIServer
+from club_database import ClubDatabase
+
+
+def _request(port, path, method='GET', headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        body = response.read()
+        return response.status, dict(response.getheaders()), json.loads(body) if body else None
+    finally:
+        conn.close()
+
+
+def _with_server(test):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ClubDatabase(os.path.join(tmp, 'club.db'))
+        semester_id = db.get_or_create_semester("2026/3/1")
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 1, "1-1", "創意DIY手作A班", [("黃語涵", "112136", "3年3班", "16"),
+                                                         ("林家耀", "112140", "3年3班", "20")])
+        db.publish_staging(run_id)
+
+        server = APIServer(('127.0.0.1', 0), db, workers=2)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            test(server.server_address[1], db, semester_id)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def test_endpoints():
+    def check(port, db, semester_id):
+        status, _, semesters = _request(port, '/api/semesters')
+        assert status == 200 and semesters[0]['semester'] == "114下"
+
+        status, _, clubs = _request(port, f'/api/semesters/{semester_id}/clubs')
+        assert status == 200 and clubs[0]['club_number'] == "1-1"
+
+        status, _, roster = _request(port, f'/api/semesters/{semester_id}/clubs/{quote("1-1")}/roster')
+        assert [row['student_name'] for row in roster] == ["黃語涵", "林家耀"]
+
+        status, _, page = _request(port, f'/api/search?name={quote("黃語涵")}&limit=1')
+        assert status == 200 and page['items'][0]['club_name'] == "創意DIY手作A班"
+        assert page['next_cursor'] is None
+
+        assert _request(port, '/api/search')[0] == 400
+        assert _request(port, f'/api/search?name={quote("黃語涵")}&limit=abc')[0] == 400
+        status, _, error = _request(port, f'/api/search?name={quote("黃語涵")}&semester_id=abc')
+        assert status == 400 and error['error'] == "semester_id 必須是整數"
+        status, _, error = _request(port, f'/api/search?name={quote("黃語涵")}&after=abc')
+        assert status == 400 and error['error'] == "after 不是有效的游標"
+        assert _request(port, '/api/nothing')[0] == 404
+        status, headers, _ = _request(port, '/api/semesters', method='POST')
+        assert status == 405 and headers['Allow'] == 'GET, HEAD'
+
+    _with_server(check)
+
+
+def test_etag_and_generation_cache():
+    def check(port, db, semester_id):
+        path = f'/api/search?name={quote("黃語涵")}'
+        status, headers, first = _request(port, path)
+        etag = headers['ETag']
+
+        # 內容未變：304，不回傳內容
+        status, headers, body = _request(port, path, headers={'If-None-Match': etag})
+        assert status == 304 and body is None and headers['ETag'] == etag
+
+        # 資料更新後快取失效，回傳新內容與新的 ETag
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 2, "1-2", "直排輪初階", [("黃語涵", "112136", "3年3班", "16")])
+        db.publish_staging(run_id)
+
+        status, headers, second = _request(port, path, headers={'If-None-Match': etag})
+        assert status == 200 and headers['ETag'] != etag
+        assert [row['club_number'] for row in second['items']] == ["1-2"]
+        assert first['items'][0]['club_number'] == "1-1"
+
+    _with_server(check)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
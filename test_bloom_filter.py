@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+測試姓名 Bloom filter 與資料庫的快速略過（使用暫存資料庫，不影響 club_data.db）
+"""
+
+import os
+import tempfile
+
+from bloom_filter import ALL_SEMESTERS, NameFilters, normalize_name
+from club_database import ClubDatabase
+from fake_gsheets import FakeGSheetsConnection
+from sheets_database import SheetsDatabase
+
+
+def test_normalize_name():
+    assert normalize_name(" 黃　語涵 ") == "黃語涵"
+    assert normalize_name("ＡＢＣ") == "ABC"
+
+
+def test_filters_round_trip():
+    names = [f"學生{i:04d}" for i in range(500)]
+    filters = NameFilters.build([(1 + i % 2, name) for i, name in enumerate(names)], generation=7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'names.bloom')
+        filters.save(path)
+        loaded = NameFilters.load(path)
+
+    assert loaded.generation == 7
+    assert all(loaded.may_contain(name) for name in names)
+    assert loaded.may_contain("學生0001", 2) and loaded.may_contain(" 學生0001")
+    assert not loaded.may_contain("學生0001", 3)
+
+    false_positives = sum(loaded.may_contain(f"路人{i}") for i in range(2000))
+    assert false_positives < 100
+    assert set(loaded.filters) == {ALL_SEMESTERS, 1, 2}
+
+
+def test_database_skips_missing_names():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ClubDatabase(os.path.join(tmp, 'club.db'))
+        semester_id = db.get_or_create_semester("2026/3/1")
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 1, "1-1", "社團", [("黃語涵", "112136", "3年3班", "16")])
+        db.publish_staging(run_id)
+
+        assert os.path.exists(db.name_filter_path)
+        assert not db._name_filters().may_contain("不存在")
+        assert len(db.search_student("黃語涵")) == 1
+
+        # 逐筆寫入時 filter 先移除，新姓名不會被略過
+        club_id = db.save_club(semester_id, 2, "1-2", "社團")
+        db.save_student(club_id, "陳胤侖", "113001", "1年5班", "1")
+        assert db._name_filters() is None
+        db.update_semester_timestamp(semester_id)
+        assert db._name_filters().may_contain("陳胤侖", semester_id)
+        assert len(db.search_student("陳胤侖")) == 1
+
+
+def test_filter_rebuilt_only_when_generation_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'club.db')
+        db = ClubDatabase(db_path)
+        semester_id = db.get_or_create_semester("2026/3/1")
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 1, "1-1", "社團", [("黃語涵", "112136", "3年3班", "16")])
+        db.publish_staging(run_id)
+
+        rebuilds = []
+        rebuild = ClubDatabase.rebuild_name_filters
+        ClubDatabase.rebuild_name_filters = lambda self: (rebuilds.append(self.db_path), rebuild(self))
+        try:
+            for _ in range(3):
+                ClubDatabase(db_path)
+            assert rebuilds == []
+
+            # 資料庫版本改變（例如檔案被替換）時重建一次
+            os.remove(db.name_filter_path)
+            ClubDatabase(db_path)
+            ClubDatabase(db_path)
+            assert rebuilds == [db_path]
+
+            # 無法寫入 filter 時，同一版本不在每次建立時重試
+            os.remove(db.name_filter_path)
+            os.mkdir(db.name_filter_path)
+            ClubDatabase(db_path)
+            ClubDatabase(db_path)
+            assert len(rebuilds) == 2
+        finally:
+            ClubDatabase.rebuild_name_filters = rebuild
+
+
+def test_clear_semester_trims_filter():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ClubDatabase(os.path.join(tmp, 'club.db'))
+        fall_id = db.get_or_create_semester("2025/9/1")
+        spring_id = db.get_or_create_semester("2026/3/1")
+        for semester_id, name in ((fall_id, "陳胤侖"), (spring_id, "黃語涵")):
+            run_id = db.begin_staging(semester_id)
+            db.stage_club(run_id, 1, "1-1", "社團", [(name, None, "3年3班", "16")])
+            db.publish_staging(run_id)
+
+        # 清除學期時不重新掃描搜尋表，只移除該學期的 filter
+        rebuilds = []
+        rebuild = ClubDatabase.rebuild_name_filters
+        ClubDatabase.rebuild_name_filters = lambda self: rebuilds.append(self.db_path)
+        try:
+            db.clear_semester_data(spring_id)
+        finally:
+            ClubDatabase.rebuild_name_filters = rebuild
+        assert rebuilds == []
+
+        filters = db._name_filters()
+        assert filters.generation == db.get_data_generation()
+        assert set(filters.filters) == {ALL_SEMESTERS, fall_id}
+        assert not filters.may_contain("黃語涵", spring_id)
+        assert db.search_student("黃語涵") == []
+        assert len(db.search_student("陳胤侖")) == 1
+
+
+def test_sheets_miss_without_reads():
+    conn = FakeGSheetsConnection()
+    db = SheetsDatabase(conn=conn)
+    run_id = db.begin_staging(db.get_or_create_semester("2026/3/1"))
+    db.stage_club(run_id, 1, "1-1", "社團", [("黃語涵", "112136", "3年3班", "16")])
+    db.publish_staging(run_id)
+
+    conn.reset_stats()
+    assert db.search_student("不存在的學生") == []
+    assert conn.stats()['total_calls'] == 0
+    assert len(db.search_student("黃語涵")) == 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
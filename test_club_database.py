@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+測試 ClubDatabase 的寫入與查詢（使用暫存資料庫，不影響 club_data.db）
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+import club_database
+from club_database import ClubDatabase
+from instrumentation import recorder
+
+
+def _new_database(tmp):
+    db = ClubDatabase(os.path.join(tmp, 'club.db'))
+    semester_id = db.get_or_create_semester("2026/3/1")
+    return db, semester_id
+
+
+def test_publish_staging_replaces_semester():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 1, "1-1", "創意DIY手作A班", [("黃語涵", "112136", "3年3班", "16")])
+        assert db.publish_staging(run_id) == (1, 1)
+        generation = db.get_data_generation()
+
+        # 重新爬取期間，搜尋仍看到舊資料
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 2, "1-2", "直排輪初階", [("黃語涵", "112136", "3年3班", "16")])
+        assert [r['club_number'] for r in db.search_student("黃語涵")] == ["1-1"]
+
+        db.publish_staging(run_id)
+        assert [r['club_number'] for r in db.search_student("黃語涵")] == ["1-2"]
+        assert db.get_data_generation() > generation
+
+
+def test_restage_class_replaces_students():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+
+        # 同一個 ClassID 暫存兩次（例如重試），只發佈第二次的名單
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 1, "1-1", "圍棋", [("黃語涵", "112136", "3年3班", "16"),
+                                                ("陳胤侖", "113001", "1年5班", "2")])
+        db.stage_club(run_id, 1, "1-1", "圍棋", [("黃語涵", "112136", "3年3班", "16")])
+        assert db.publish_staging(run_id) == (1, 1)
+
+        assert [r.student_name for r in db.get_club_roster(semester_id, "1-1")] == ["黃語涵"]
+        assert db.search_student("陳胤侖") == []
+
+        conn = sqlite3.connect(db.db_path)
+        assert conn.execute("SELECT COUNT(*) FROM staging_students").fetchone()[0] == 0
+        conn.close()
+
+
+def test_current_semester_from_calendar():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+
+        assert db.get_current_semester("2026/6/30").id == semester_id
+        assert db.get_current_semester("2026/6/30").source_date == "2026/3/1"
+        assert db.get_current_semester("2026/7/1") is None
+        assert db.get_current_semester("2025/12/31") is None
+
+
+def test_empty_staging_is_not_published():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 1, "1-1", "創意DIY手作A班", [("黃語涵", "112136", "3年3班", "16")])
+        db.publish_staging(run_id)
+
+        run_id = db.begin_staging(semester_id)
+        try:
+            db.publish_staging(run_id)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("空的暫存資料不應發佈")
+
+        db.discard_staging(run_id)
+        assert len(db.search_student("黃語涵")) == 1
+
+
+def test_grade_filters():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 1, "1-1", "創意DIY手作A班", [
+            ("黃語涵", "112136", "3年3班", "16"),
+            ("陳家耀", "111138", "4年1班", "03"),
+            ("左惟寧", "111044", "4年2班", "19"),
+        ])
+        db.publish_staging(run_id)
+
+        assert len(db.search_student("黃語涵", grade="3年3班")) == 1
+        assert len(db.search_student("黃語涵", grade_year=3)) == 1
+        assert db.search_student("黃語涵", grade_year=3, class_num=1) == []
+
+        assert [r['student_name'] for r in db.get_grade_roster(semester_id, 4)] == ["陳家耀", "左惟寧"]
+        assert [r['student_name'] for r in db.get_grade_roster(semester_id, 4, 2)] == ["左惟寧"]
+
+
+def test_student_identity_history():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, spring_id = _new_database(tmp)
+        fall_id = db.get_or_create_semester("2025/9/1")
+
+        for semester_id, club_number, grade in ((fall_id, "1-1", "2年3班"), (spring_id, "1-2", "3年3班")):
+            run_id = db.begin_staging(semester_id)
+            db.stage_club(run_id, 1, club_number, "社團", [("黃語涵", "112136", grade, "16"),
+                                                          ("黃語涵", "113001", "1年1班", "2")])
+            db.publish_staging(run_id)
+
+        # 同名不同學號的學生分開列出
+        students = {s['student_id']: s for s in db.find_students("黃語涵")}
+        assert set(students) == {"112136", "113001"}
+        assert students["112136"]['grade_year'] == 3
+        assert students["112136"]['last_semester'] == "114下"
+        assert students["112136"]['semester_count'] == 2
+
+        history = db.get_student_history("112136")
+        assert [(h['semester'], h['club_number']) for h in history] == [("114下", "1-2"), ("114上", "1-1")]
+
+        # 清除學期後歷程同步更新
+        db.clear_semester_data(spring_id)
+        assert [h['semester'] for h in db.get_student_history("112136")] == ["114上"]
+        assert db.find_students("黃語涵")[0]['last_semester'] == "114上"
+        assert db.find_students("黃語涵")[0]['semester_count'] == 1
+
+
+def test_search_order_by_semester():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+        old_id = db.get_or_create_semester("2011/3/1")
+
+        for sid, class_ids in ((old_id, (2,)), (semester_id, (3, 1))):
+            run_id = db.begin_staging(sid)
+            for class_id in class_ids:
+                db.stage_club(run_id, class_id, f"1-{class_id}", "社團",
+                              [("黃語涵", "112136", "3年3班", "16")])
+            db.publish_staging(run_id)
+
+        # 依學年排序（字串排序會把 99下 排在 114下 之前），同學期依 ClassID 排序
+        results = db.search_student("黃語涵")
+        assert [(r.semester, r.class_id) for r in results] == [("114下", 1), ("114下", 3), ("99下", 2)]
+        assert [r.class_id for r in db.search_student("黃語涵", semester_id=old_id)] == [2]
+
+
+def test_keyset_pagination():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+        run_id = db.begin_staging(semester_id)
+        for class_id in range(1, 8):
+            db.stage_club(run_id, class_id, f"1-{class_id}", "社團",
+                          [("黃語涵", "112136", "3年3班", "16"), (f"學生{class_id}", None, None, None)])
+        db.publish_staging(run_id)
+
+        full = db.search_student("黃語涵")
+        page = db.search_student_page("黃語涵", limit=3)
+        pages = [page.items]
+        while page.next_cursor:
+            page = db.search_student_page("黃語涵", after=page.next_cursor, limit=3)
+            pages.append(page.items)
+        assert [len(items) for items in pages] == [3, 3, 1]
+        assert sum(pages, []) == full
+        assert list(db.iter_search_student("黃語涵", batch_size=2)) == full
+
+        # 年級、座號為 NULL 的學生也能正確分頁
+        roster = db.get_grade_roster(semester_id)
+        assert list(db.iter_grade_roster(semester_id, batch_size=4)) == roster
+        assert len(roster) == 14
+
+        assert [s.semester for s in db.iter_semesters(batch_size=1)] == ["114下"]
+        try:
+            db.search_student_page("黃語涵", after="not-a-cursor")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("應該拋出 ValueError")
+
+
+def test_club_roster_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 7, "1-7", "直排輪初階", [("黃語涵", "112136", "3年3班", "16"),
+                                                      ("陳胤侖", "113001", "1年5班", "2")])
+        db.stage_club(run_id, 1, "1-1", "創意DIY手作A班", [("林家耀", "113002", "1年2班", "3")])
+        db.publish_staging(run_id)
+
+        assert [(c.club_number, c.student_count) for c in db.get_clubs(semester_id)] == [("1-1", 1), ("1-7", 2)]
+
+        recorder.reset()
+        roster = db.get_club_roster(semester_id, "1-7")
+        assert [r.student_name for r in roster] == ["黃語涵", "陳胤侖"]
+        assert db.get_club_roster(semester_id, "1-1")[0].grade_year == 1
+        assert db.get_club_roster(semester_id, "9-9") == []
+        assert recorder.summary()['counters'] == {'roster_cache.miss': 1, 'roster_cache.hit': 2}
+
+        # 重新發佈後快取失效
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 7, "1-7", "直排輪初階", [("黃語涵", "112136", "3年3班", "16")])
+        db.publish_staging(run_id)
+        assert len(db.get_club_roster(semester_id, "1-7")) == 1
+
+
+def test_semester_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ClubDatabase(os.path.join(tmp, 'club.db'))
+
+        def publish(date, clubs):
+            semester_id = db.get_or_create_semester(date)
+            run_id = db.begin_staging(semester_id)
+            for class_id, (club_number, students) in enumerate(clubs, start=1):
+                db.stage_club(run_id, class_id, club_number, "社團", students)
+            db.publish_staging(run_id)
+            return semester_id
+
+        fall = publish("2025/9/1", [("1-1", [("黃語涵", "1", "2年3班", "1"), ("林家耀", "3", "2年3班", "2")]),
+                                    ("1-2", [("陳胤侖", None, "2年3班", "3")])])
+        spring = publish("2026/3/1", [("1-2", [("黃語涵", "1", "2年3班", "1"), ("陳胤侖", None, "2年3班", "3"),
+                                               ("張品妍", "4", "1年1班", "4")])])
+
+        changes = {(c.change_type, c.student_name): c for c in db.get_semester_changes(spring)}
+        assert set(changes) == {("changed", "黃語涵"), ("joined", "張品妍"), ("dropped", "林家耀")}
+        assert (changes[("changed", "黃語涵")].old_clubs, changes[("changed", "黃語涵")].new_clubs) == ("1-1", "1-2")
+        assert db.get_change_summary(spring) == {'previous_semester_id': fall, 'joined': 1,
+                                                  'dropped': 1, 'changed': 1}
+        assert db.get_semester_changes(fall) == []
+
+        # 沒有學號的學生以姓名加年級比對，跨學年時年級加一
+        next_fall = publish("2026/9/1", [("1-2", [("陳胤侖", None, "3年1班", "3")])])
+        assert [(c.change_type, c.student_name) for c in db.get_semester_changes(next_fall)] == [
+            ("dropped", "張品妍"), ("dropped", "黃語涵")]
+
+        # 重新發佈前一學期時，下一學期的異動一併更新
+        publish("2026/3/1", [("1-2", [("陳胤侖", None, "2年3班", "3")])])
+        assert db.get_semester_changes(next_fall) == []
+        assert [(c.change_type, c.student_name) for c in db.diff_semesters(fall, next_fall)] == [
+            ("dropped", "林家耀"), ("dropped", "黃語涵")]
+
+
+def test_semester_changes_club_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ClubDatabase(os.path.join(tmp, 'club.db'))
+        students = [(f"學生{n}", str(n), "2年3班", str(n)) for n in range(200)]
+
+        def publish(date, club_numbers):
+            semester_id = db.get_or_create_semester(date)
+            run_id = db.begin_staging(semester_id)
+            for class_id, club_number in enumerate(club_numbers, start=1):
+                db.stage_club(run_id, class_id, club_number, "社團", students)
+            db.publish_staging(run_id)
+            return semester_id
+
+        # 社團的寫入順序不同，串接結果仍依社團編號排序，相同的社團組合不算換社團
+        publish("2025/9/1", ["1-3", "1-1", "1-2"])
+        spring = publish("2026/3/1", ["1-2", "1-3", "1-1", "1-4"])
+
+        changes = db.get_semester_changes(spring)
+        assert len(changes) == len(students)
+        assert {(c.change_type, c.old_clubs, c.new_clubs) for c in changes} == {
+            ("changed", "1-1,1-2,1-3", "1-1,1-2,1-3,1-4")}
+
+
+def test_club_stats():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ClubDatabase(os.path.join(tmp, 'club.db'))
+        semester_id = db.get_or_create_semester("2026/3/1")
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 1, "1-1", "圍棋", [("黃語涵", "112136", "3年3班", "16"),
+                                                ("陳胤侖", "113001", "1年5班", "2"),
+                                                ("林家耀", None, "3年3班", "20")])
+        db.stage_club(run_id, 2, "1-2", "直排輪", [("黃語涵", "112136", "3年3班", "16")])
+        db.publish_staging(run_id)
+
+        assert [(s.club_number, s.grade_year, s.student_count) for s in db.get_club_grade_stats(semester_id)] == [
+            ("1-1", 1, 1), ("1-1", 3, 2), ("1-2", 3, 1)]
+
+        participation = db.get_class_participation(semester_id)
+        assert [(p.grade_year, p.class_num, p.participants, p.enrollments, p.max_seat_number)
+                for p in participation] == [(1, 5, 1, 1, 2), (3, 3, 2, 3, 20)]
+        assert db.get_class_participation(semester_id, grade_year=1) == participation[:1]
+
+        db.clear_semester_data(semester_id)
+        assert db.get_club_grade_stats(semester_id) == []
+        assert db.get_class_participation(semester_id) == []
+
+
+def test_read_connections_closed():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+        opened = []
+
+        def query():
+            db.is_semester_cached(semester_id)
+            opened.append(db._read_conn())
+
+        # 執行緒結束時關閉該執行緒的查詢連線
+        worker = threading.Thread(target=query)
+        worker.start()
+        worker.join()
+        del worker
+
+        # 明確關閉後，下一次查詢重新開啟
+        query()
+        db.close()
+        assert db.is_semester_cached(semester_id) is False
+
+        for conn in opened:
+            try:
+                conn.execute("SELECT 1")
+            except sqlite3.ProgrammingError:
+                pass
+            else:
+                raise AssertionError("查詢連線應已關閉")
+
+
+def test_query_latency_histogram():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, semester_id = _new_database(tmp)
+        recorder.reset()
+        for _ in range(20):
+            db.is_semester_cached(semester_id)
+
+        histogram = recorder.histograms()['query.is_semester_cached']
+        assert histogram['count'] == 20
+        assert sum(histogram['buckets'].values()) == 20
+        assert 0 < histogram['p50_ms'] <= histogram['p95_ms'] <= histogram['p99_ms']
+        assert histogram['max_ms'] <= histogram['p99_ms']  # 百分位數為所在桶的上界
+
+
+def test_slow_query_log():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'club.db')
+        db = ClubDatabase(path)
+        run_id = db.begin_staging(db.get_or_create_semester("2026/3/1"))
+        db.stage_club(run_id, 1, "1-1", "圍棋", [("黃語涵", "112136", "3年3班", "16")])
+        db.publish_staging(run_id)
+        club_database.slow_queries.clear()
+
+        # 門檻以上才記錄
+        ClubDatabase(path, slow_query_ms=60_000).search_student("黃語涵")
+        assert len(club_database.slow_queries) == 0
+
+        db = ClubDatabase(path, slow_query_ms=0)
+        db.search_student("黃語涵")
+        entry = club_database.slow_queries[-1]
+        assert entry['query'] == 'search_student' and entry['params'][0] == "黃語涵"
+        assert entry['plan'] and all(isinstance(step, str) for step in entry['plan'])
+
+        # 具名參數保留名稱與值
+        old_id = db.get_or_create_semester("2025/9/1")
+        new_id = db.get_or_create_semester("2026/3/1")
+        db.diff_semesters(old_id, new_id)
+        entry = club_database.slow_queries[-1]
+        assert entry['query'] == 'diff_semesters'
+        assert isinstance(entry['params'], dict) and new_id in entry['params'].values()
+
+        # 只保留最近 100 筆
+        for _ in range(150):
+            db.is_semester_cached(new_id)
+        assert len(club_database.slow_queries) == 100
+        assert all(e['query'] == 'is_semester_cached' for e in club_database.slow_queries)
+
+        # 寫入紀錄檔時每筆一行 JSON
+        db.slow_query_log = os.path.join(tmp, 'slow.jsonl')
+        db.search_student("黃語涵")
+        with open(db.slow_query_log, encoding='utf-8') as f:
+            assert json.loads(f.readline())['query'] == 'search_student'
+        club_database.slow_queries.clear()
+
+
+def test_slow_query_env():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'club.db')
+        original = os.environ.get('CLUB_SLOW_QUERY_MS')
+        try:
+            os.environ['CLUB_SLOW_QUERY_MS'] = '25'
+            assert ClubDatabase(path).slow_query_ms == 25
+
+            # 設定錯誤時不記錄慢查詢，而不是無法建立資料庫
+            os.environ['CLUB_SLOW_QUERY_MS'] = '25ms'
+            assert ClubDatabase(path).slow_query_ms is None
+        finally:
+            if original is None:
+                os.environ.pop('CLUB_SLOW_QUERY_MS', None)
+            else:
+                os.environ['CLUB_SLOW_QUERY_MS'] = original
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+測試資料表版本管理（使用暫存資料庫，不影響 club_data.db）
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from bench_utils import build_legacy_database
+from club_database import ClubDatabase
+from db_migrations import latest_version, get_schema_version, run_migrations
+
+
+def _index_names(db_path):
+    conn = sqlite3.connect(db_path)
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    return names
+
+
+def test_fresh_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'club.db')
+        ClubDatabase(db_path)
+
+        conn = sqlite3.connect(db_path)
+        assert get_schema_version(conn) == latest_version()
+        recorded = [row[0] for row in conn.execute('SELECT version FROM schema_migrations ORDER BY version')]
+        conn.close()
+
+        assert recorded == list(range(1, latest_version() + 1))
+        assert run_migrations(db_path) == []
+
+
+def test_legacy_database_upgrade():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'legacy.db')
+        info = build_legacy_database(db_path, num_semesters=2, clubs_per_semester=5, students_per_club=5)
+
+        assert 'idx_grade' in _index_names(db_path)
+
+        db = ClubDatabase(db_path)
+        indexes = _index_names(db_path)
+        assert 'idx_grade' not in indexes
+        assert 'idx_students_grade_class' in indexes
+
+        # 既有資料保留
+        assert len(db.get_all_semesters()) == 2
+        assert db.search_student(info['sample_names'][0])
+
+        # 年級班級已拆為整數欄位
+        conn = sqlite3.connect(db_path)
+        missing = conn.execute('SELECT COUNT(*) FROM students WHERE grade_year IS NULL').fetchone()[0]
+        indexed = conn.execute('SELECT COUNT(*) FROM search_index').fetchone()[0]
+        conn.close()
+        assert missing == 0
+
+        # 既有學生都已寫入搜尋表
+        assert indexed == info['students']
+        assert db.get_club_grade_stats(db.get_all_semesters()[0].id)
+
+
+def test_interrupted_backfill_resumes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'legacy.db')
+        info = build_legacy_database(db_path, num_semesters=1, clubs_per_semester=3, students_per_club=4)
+        ClubDatabase(db_path)
+
+        # 模擬資料表已更新、但重建衍生資料表前中斷
+        conn = sqlite3.connect(db_path)
+        conn.execute('DELETE FROM search_index')
+        conn.execute("INSERT INTO meta (key, value) VALUES ('derived_tables_stale', '1')")
+        conn.commit()
+        conn.close()
+
+        assert run_migrations(db_path) == []
+        conn = sqlite3.connect(db_path)
+        indexed = conn.execute('SELECT COUNT(*) FROM search_index').fetchone()[0]
+        pending = conn.execute("SELECT COUNT(*) FROM meta WHERE key = 'derived_tables_stale'").fetchone()[0]
+        conn.close()
+        assert indexed == info['students'] and pending == 0
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
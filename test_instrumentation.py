@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+測試計時區段、計數器與延遲直方圖
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from instrumentation import LatencyHistogram, Recorder
+
+
+def test_counters():
+    recorder = Recorder()
+    recorder.count('pages')
+    recorder.count('bytes', 1200)
+    recorder.count('bytes', 300)
+    assert recorder.summary()['counters'] == {'pages': 1, 'bytes': 1500}
+
+    recorder.reset()
+    assert recorder.summary()['counters'] == {}
+
+
+def test_span_timing():
+    recorder = Recorder()
+    with recorder.span('fetch', page='main.asp') as event:
+        time.sleep(0.01)
+        event['bytes'] = 42
+
+    stats = recorder.summary()['spans']['fetch']
+    assert stats['count'] == 1 and stats['errors'] == 0
+    assert stats['total_ms'] >= 10 and stats['max_ms'] == stats['total_ms']
+    assert recorder.recent_events()[0]['page'] == 'main.asp'
+    assert recorder.recent_events()[0]['bytes'] == 42
+
+    # 區塊內拋出例外時仍記錄耗時，並標記錯誤
+    try:
+        with recorder.span('fetch'):
+            raise TimeoutError()
+    except TimeoutError:
+        pass
+    stats = recorder.summary()['spans']['fetch']
+    assert stats['count'] == 2 and stats['errors'] == 1
+    assert recorder.recent_events()[0]['error'] == 'TimeoutError'
+
+
+def test_nested_spans():
+    recorder = Recorder()
+    with recorder.span('crawl'):
+        for _ in range(3):
+            with recorder.span('parse'):
+                time.sleep(0.002)
+
+    spans = recorder.summary()['spans']
+    assert spans['parse']['count'] == 3 and spans['crawl']['count'] == 1
+    assert spans['crawl']['total_ms'] >= spans['parse']['total_ms']
+    # 內層先結束，先記錄
+    assert [e['span'] for e in recorder.recent_events()] == ['crawl', 'parse', 'parse', 'parse']
+
+
+def test_parent_recorder():
+    parent = Recorder()
+    child = Recorder(parent=parent)
+    with child.span('fetch'):
+        pass
+    child.count('retries', 2)
+    child.observe('query.search_student', 3)
+
+    assert parent.summary()['spans']['fetch']['count'] == 1
+    assert parent.summary()['counters'] == {'retries': 2}
+    assert parent.histograms()['query.search_student']['count'] == 1
+
+    # 重設每次爬取的收集器不影響上層的累計
+    child.reset()
+    assert child.summary()['spans'] == {} and parent.summary()['spans']['fetch']['count'] == 1
+
+
+def test_event_log():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'metrics.jsonl')
+        recorder = Recorder(log_path=path)
+        with recorder.span('login'):
+            pass
+        recorder.log_event('crawl', mode='refresh', updated=False)
+
+        with open(path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        assert [line.get('span') or line.get('event') for line in lines] == ['login', 'crawl']
+        assert lines[1]['mode'] == 'refresh' and 'ts' in lines[1]
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram(buckets=(1, 10, 100))
+    assert histogram.percentile(50) == 0.0
+
+    for ms, n in ((0.5, 50), (5, 45), (50, 4), (500, 1)):
+        for _ in range(n):
+            histogram.observe(ms)
+
+    # 回傳所在桶的上界；超過最後一桶時回傳最大值
+    assert histogram.percentile(50) == 1
+    assert histogram.percentile(51) == 10
+    assert histogram.percentile(95) == 10
+    assert histogram.percentile(99) == 100
+    assert histogram.percentile(100) == 500
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100 and snapshot['max_ms'] == 500
+    assert snapshot['avg_ms'] == round((0.5 * 50 + 5 * 45 + 50 * 4 + 500) / 100, 3)
+    assert snapshot['buckets'] == {'<=1': 50, '<=10': 45, '<=100': 4, '>100': 1}
+
+
+def test_histogram_bucket_edges():
+    histogram = LatencyHistogram(buckets=(1, 10))
+    histogram.observe(1)  # 等於上界時歸入該桶
+    histogram.observe(10)
+    assert histogram.counts == [1, 1, 0]
+    assert histogram.percentile(50) == 1 and histogram.percentile(100) == 10
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+測試姓名索引檔的匯出與查詢（使用暫存資料庫，不影響 club_data.db）
+"""
+
+import os
+import tempfile
+
+from club_database import ClubDatabase
+from name_index import NameIndex, export_name_index, get_name_index
+
+
+def _published_database(tmp):
+    db = ClubDatabase(os.path.join(tmp, 'club.db'))
+    for date, grade in (("2025/9/1", "2年3班"), ("2026/3/1", "3年3班")):
+        run_id = db.begin_staging(db.get_or_create_semester(date))
+        db.stage_club(run_id, 2, "1-2", "直排輪初階", [("黃語涵", "112136", grade, "16"),
+                                                      ("陳胤侖", "113001", "1年5班", None)])
+        db.stage_club(run_id, 1, "1-1", "創意DIY手作A班", [("黃語涵", "112136", grade, "16")])
+        db.publish_staging(run_id)
+    return db
+
+
+def test_matches_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _published_database(tmp)
+        stats = export_name_index(db.db_path)
+        assert stats['names'] == 2
+        assert stats['generation'] == db.get_data_generation()
+
+        with NameIndex(stats['path']) as index:
+            for name in ("黃語涵", "陳胤侖", "不存在"):
+                for filters in ({}, {'semester_id': 1}, {'grade_year': 3}, {'grade': "3年3班"},
+                                {'grade': "三年三班"}, {'grade_year': 2, 'class_num': 3}):
+                    assert index.search_student(name, **filters) == db.search_student(name, **filters)
+
+            assert index.search_student("陳胤侖")[0].seat_number is None
+
+
+def test_reopens_after_export():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _published_database(tmp)
+        path = export_name_index(db.db_path)['path']
+        index = get_name_index(path)
+        assert get_name_index(path) is index
+
+        db.clear_semester_data(1)
+        export_name_index(db.db_path)
+        reopened = get_name_index(path)
+        assert reopened is not index
+        assert reopened.generation == db.get_data_generation()
+        assert len(reopened.search_student("黃語涵")) == 2
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+測試頁面封存與由封存重建學期（不連線學校網站，使用暫存資料庫）
+"""
+
+import os
+import tempfile
+
+from page_archive import PageArchive
+from test_resilience import FakeSession, _crawler
+
+
+def test_archive_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = PageArchive(tmp)
+        page = '<h3>社團編號 1-1</h3>圍棋'.encode('big5')
+        archive.save_pages('114下', {
+            'list.asp?ClassID=1': {'content': page, 'fetched_at': '2026-03-01T08:00:00', 'class_id': 1},
+            'list.asp?ClassID=2': {'content': page, 'fetched_at': '2026-03-01T08:00:01', 'class_id': 2},
+        })
+
+        manifest = archive.load_manifest('114下')
+        entries = manifest['pages']
+        # 相同內容只存一份
+        assert entries['list.asp?ClassID=1']['sha256'] == entries['list.asp?ClassID=2']['sha256']
+        objects = [name for _, _, files in os.walk(os.path.join(tmp, '114下', 'objects')) for name in files]
+        assert len(objects) == 1
+        assert archive.read_page('114下', 'list.asp?ClassID=2') == '<h3>社團編號 1-1</h3>圍棋'
+        assert entries['list.asp?ClassID=1']['class_id'] == 1
+
+        # 之後的爬取只更新抓到的頁面
+        archive.save_pages('114下', {'main.asp': {'content': b'2026/3/1', 'fetched_at': '2026-03-02T08:00:00'}})
+        assert len(archive.load_manifest('114下')['pages']) == 3
+        assert archive.semesters() == ['114下']
+        assert archive.read_page('114下', 'list.asp?ClassID=9') is None
+        assert archive.load_manifest('113上') is None
+
+
+def test_replay_rebuilds_semester_without_network():
+    with tempfile.TemporaryDirectory() as tmp:
+        crawler = _crawler(tmp, FakeSession())
+        semester_id, updated = crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True)
+        assert updated
+        semester = crawler.last_summary['semester']
+        assert set(crawler.archive.load_manifest(semester)['pages']) == {
+            'main.asp', 'list.asp?ClassID=1', 'list.asp?ClassID=2', 'list.asp?ClassID=3'}
+        expected = crawler.db.search_student('學生2', semester_id)
+
+        # 清空資料後由封存重建；沒有 session 也不需要登入
+        crawler.db.clear_semester_data(semester_id)
+        crawler.create_session = None
+        crawler.client = None
+        replay_id, updated = crawler.crawl_all_data(replay=semester)
+
+        assert updated and replay_id == semester_id
+        assert [c.club_number for c in crawler.db.get_clubs(semester_id)] == ["1-1", "1-2"]
+        assert crawler.db.get_clubs(semester_id)[1].club_name == "直排輪"
+        assert crawler.db.search_student('學生2', semester_id) == expected
+
+        missing_id, updated = crawler.crawl_all_data(replay='99上')
+        assert missing_id is None and not updated
+        assert crawler.last_summary['aborted']
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
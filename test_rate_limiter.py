@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+測試跨程序共用的 token bucket（使用暫存檔）
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+from rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_burst_then_rate():
+    with tempfile.TemporaryDirectory() as tmp:
+        clock = FakeClock()
+        limiter = RateLimiter(os.path.join(tmp, 'rate.db'), rate=2, burst=3, clock=clock, sleep=clock.sleep)
+
+        waits = [limiter.acquire() for _ in range(5)]
+        assert waits[:3] == [0, 0, 0]
+        assert waits[3] == waits[4] == 0.5
+        assert limiter.total_wait == 1.0
+
+        # 閒置後最多累積 burst 個 token
+        clock.now += 60
+        assert [limiter.acquire() for _ in range(3)] == [0, 0, 0]
+        try:
+            limiter.acquire(timeout=0.1)
+        except TimeoutError:
+            pass
+        else:
+            raise AssertionError("超過等待上限時應拋出 TimeoutError")
+
+
+def test_shared_between_instances():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rate.db')
+        clock = FakeClock()
+        first = RateLimiter(path, rate=1, burst=2, clock=clock, sleep=clock.sleep)
+        second = RateLimiter(path, rate=1, burst=2, clock=clock, sleep=clock.sleep)
+
+        assert first.acquire() == 0
+        assert second.acquire() == 0
+        # 兩個物件共用同一個 bucket，第三個請求必須等待
+        assert first.acquire() == 1.0
+
+
+def _worker(path, count):
+    limiter = RateLimiter(path, rate=20, burst=1)
+    for _ in range(count):
+        limiter.acquire()
+
+
+def test_shared_between_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rate.db')
+        start = time.time()
+        processes = [multiprocessing.Process(target=_worker, args=(path, 5)) for _ in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        # 共 10 個請求、每秒 20 個、只能累積 1 個：至少需要 9 / 20 秒
+        assert time.time() - start >= 0.45
+        assert all(process.exitcode == 0 for process in processes)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
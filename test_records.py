@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+測試 records.py 的結果型別與爬蟲解析結果
+"""
+
+import pandas as pd
+
+from club_crawler import parse_class_page
+from records import RosterEntry, SearchResult, SemesterRecord
+
+
+def test_dict_style_access():
+    result = SearchResult("114下", 1, "1-1", "創意DIY手作A班", "112136", "黃語涵", "3年3班", "16")
+
+    assert result['club_name'] == result.club_name == result[3]
+    assert result.get('missing', 'x') == 'x'
+    assert dict(result) == result.to_dict()
+    assert list(pd.DataFrame([result]).columns) == list(SearchResult._fields)
+    assert not hasattr(result, '__dict__')
+
+    try:
+        result['missing']
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("應該拋出 KeyError")
+
+
+def test_semester_from_mapping():
+    record = SemesterRecord.from_mapping({'id': 1, 'semester': "114下", 'year': 114, 'term': "下"})
+    assert record.source_date is None
+    assert record['semester'] == "114下"
+
+
+def test_parse_class_page():
+    html = ("<h3>社團編號 1-7</h3><table>"
+            "<tr><td>序號</td><td>學號</td><td>班級</td><td>座號</td><td>姓名</td></tr>"
+            "<tr><td>1</td><td>112136</td><td>3年3班</td><td>16</td><td>黃語涵</td></tr>"
+            "</table>")
+    assert parse_class_page(html) == [RosterEntry("112136", "黃語涵", "3年3班", "16", "1-7")]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
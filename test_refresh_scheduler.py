@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+測試排程背景更新的排程判斷與快取預熱（不連線學校網站，使用暫存資料庫）
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+from club_database import ClubDatabase
+from name_index import default_index_path, get_name_index
+from refresh_scheduler import RefreshScheduler
+from test_resilience import FakeSession, _crawler
+
+
+def _scheduler(tmp, session, now):
+    db = ClubDatabase(os.path.join(tmp, 'club.db'))
+
+    return RefreshScheduler('user', 'password', refresh_at='02:30', burst_minutes=60, burst_days=14,
+                            db=db, crawler_factory=lambda username, password, db: _crawler(tmp, session, db),
+                            clock=lambda: now[0])
+
+
+def test_schedule_follows_semester_calendar():
+    with tempfile.TemporaryDirectory() as tmp:
+        now = [datetime(2026, 3, 5, 10, 0)]
+        scheduler = _scheduler(tmp, FakeSession(), now)
+
+        # 還沒有這學期的資料：立即確認網站上的學期
+        assert scheduler.next_run(now[0]) == (now[0], 'check')
+
+        result = scheduler.run('check')
+        assert result['updated'] and result['semester'] == '114下'
+
+        # 學期日期（2026/3/1）前後 14 天內：每小時完整更新
+        assert scheduler.next_run(now[0]) == (datetime(2026, 3, 5, 11, 0), 'refresh')
+
+        # 之後只剩每天一次
+        now[0] = datetime(2026, 4, 20, 10, 0)
+        assert scheduler.next_run(now[0]) == (datetime(2026, 4, 21, 2, 30), 'refresh')
+
+        # 依日曆已進入新學期，網站仍是 114下：每小時確認一次
+        now[0] = datetime(2026, 8, 1, 10, 0)
+        assert scheduler.burst_mode(now[0]) == 'check'
+
+
+def test_refresh_warms_caches():
+    with tempfile.TemporaryDirectory() as tmp:
+        now = [datetime(2026, 3, 5, 2, 30)]
+        session = FakeSession()
+        scheduler = _scheduler(tmp, session, now)
+
+        result = scheduler.run('refresh')
+        assert result['updated'] and not result['aborted']
+
+        db = scheduler.db
+        index = get_name_index(default_index_path(db.db_path))
+        assert index is not None and index.generation == db.get_data_generation()
+        assert [r.club_number for r in index.search_student('學生2')] == ['1-2']
+        assert result['warmed']['clubs'] == 2
+
+        # 頁面沒有變動：不發佈，索引檔仍有效，不需重新匯出
+        result = scheduler.run('refresh')
+        assert not result['updated']
+        assert 'name_index' not in result['warmed']
+        assert get_name_index(default_index_path(db.db_path)).generation == db.get_data_generation()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+測試重試、錯誤預算、斷路器與爬蟲的中止處理（不連線學校網站，使用暫存資料庫）
+"""
+
+import os
+import random
+import tempfile
+
+import club_crawler
+from club_crawler import ClubCrawler
+from club_database import ClubDatabase
+from page_archive import PageArchive
+from school_client import SchoolClient
+from resilience import (CircuitBreaker, CircuitOpenError, ErrorBudget, RetryPolicy,
+                        TransientHTTPError)
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200, url=''):
+        self.text = text
+        self.content = text.encode('big5')  # 學校網站的頁面為 big5
+        self.status_code = status_code
+        self.url = url
+        self.encoding = None
+
+
+MAIN_PAGE = ("預計2026/3/1 <table><tr><td>1-1</td><td>圍棋</td></tr>"
+             "<tr><td>1-2</td><td>直排輪</td></tr></table>")
+
+
+class FakeSession:
+    """依 ClassID 回傳名單頁；failures 記錄各 ClassID（或 'main.asp'）還要失敗幾次"""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.names = {}  # {ClassID: 學生姓名}，預設為 學生<ClassID>
+        self.main_page = MAIN_PAGE
+        self.requests = 0
+
+    def get(self, url, timeout=None):
+        self.requests += 1
+        if 'main.asp' in url:
+            if self.failures.get('main.asp', 0):
+                self.failures['main.asp'] -= 1
+                return FakeResponse("err", 503, url)
+            return FakeResponse(self.main_page)
+        class_id = int(url.rsplit('=', 1)[1])
+        if self.failures.get(class_id, 0):
+            self.failures[class_id] -= 1
+            return FakeResponse("err", 503, url)
+        if class_id > 2:
+            return FakeResponse("<h3>無資料</h3>")
+        name = self.names.get(class_id, f"學生{class_id}")
+        return FakeResponse(f"<h3>社團編號 1-{class_id}</h3><table><tr><td>1</td><td>11200{class_id}</td>"
+                            f"<td>3年3班</td><td>{class_id}</td><td>{name}</td></tr></table>")
+
+
+def _crawler(tmp, session, db=None):
+    crawler = ClubCrawler('user', 'password', db=db or ClubDatabase(os.path.join(tmp, 'club.db')))
+    crawler.archive = PageArchive(os.path.join(tmp, 'page_archive'))
+    crawler.create_session = lambda: setattr(
+        crawler, 'client', SchoolClient('user', 'password', session_file=None, session=session))
+    crawler.retry_policy = RetryPolicy(max_attempts=3, sleep=lambda seconds: None)
+    return crawler
+
+
+def test_retry_policy():
+    delays = []
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TransientHTTPError(503)
+        return 'ok'
+
+    policy = RetryPolicy(max_attempts=4, base_delay=1, max_delay=3, sleep=delays.append, rng=random.Random(1))
+    assert policy.call(flaky) == 'ok'
+    assert len(calls) == 3 and len(delays) == 2
+    assert 0 <= delays[0] <= 1 and 0 <= delays[1] <= 2
+    assert all(policy.backoff(10) <= 3 for _ in range(20))
+
+    try:
+        RetryPolicy(max_attempts=2, sleep=delays.append).call(lambda: 1 / 0)
+    except ZeroDivisionError:
+        pass
+    else:
+        raise AssertionError("不可重試的錯誤應直接拋出")
+
+
+def test_error_budget():
+    budget = ErrorBudget(max_failures=2)
+    budget.record_failure(3)
+    budget.record_failure(3)
+    budget.record_success(3)
+    assert budget.unresolved == [] and not budget.exhausted
+    budget.record_failure(4)
+    assert budget.exhausted and budget.unresolved == [4]
+
+
+def test_circuit_breaker():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    try:
+        breaker.before_call()
+    except CircuitOpenError as e:
+        assert e.remaining == 10
+    else:
+        raise AssertionError("斷路器開啟時應拒絕請求")
+
+    now[0] = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.open_count == 2
+
+    now[0] = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_crawl_retries_transient_failures():
+    with tempfile.TemporaryDirectory() as tmp:
+        # ClassID 2 第一輪重試用完仍失敗，最後再試一次時成功
+        crawler = _crawler(tmp, FakeSession({1: 1, 2: 3}))
+        semester_id, updated = crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True)
+
+        assert updated
+        assert [c.club_number for c in crawler.db.get_clubs(semester_id)] == ["1-1", "1-2"]
+        assert crawler.last_summary['counters']['retries'] == 3
+        assert crawler.last_summary['failed_classes'] == []
+
+
+def test_crawl_aborts_without_publishing():
+    with tempfile.TemporaryDirectory() as tmp:
+        crawler = _crawler(tmp, FakeSession({2: 100}))
+        semester_id, updated = crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True)
+
+        assert not updated
+        assert crawler.last_summary['failed_classes'] == [2]
+        assert "ClassID [2]" in crawler.last_summary['aborted']
+        assert crawler.db.get_clubs(semester_id) == []
+
+
+def test_crawl_aborts_without_main_page():
+    with tempfile.TemporaryDirectory() as tmp:
+        session = FakeSession()
+        crawler = _crawler(tmp, session)
+        semester_id, updated = crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True)
+        assert updated
+        generation = crawler.db.get_data_generation()
+
+        # main.asp 持續失敗：不改用當天日期，也不把社團發佈成「未知社團」
+        session.failures['main.asp'] = 100
+        assert crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True) == (None, False)
+        assert "main.asp" in crawler.last_summary['aborted']
+
+        # 取得學期日期後社團列表才失敗：中止，保留原有資料
+        get_semester_date = crawler.get_semester_date
+        crawler.get_semester_date = lambda: '2026/3/1'
+        assert crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True) == (semester_id, False)
+        assert "main.asp" in crawler.last_summary['aborted']
+        crawler.get_semester_date = get_semester_date
+
+        # 頁面改版解析不到社團列表或學期日期：同樣中止
+        session.failures.clear()
+        session.main_page = "預計2026/3/1 <p>維護中</p>"
+        assert crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True) == (semester_id, False)
+        assert "社團列表" in crawler.last_summary['aborted']
+        session.main_page = "<p>維護中</p>"
+        assert crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True) == (None, False)
+        assert "學期日期" in crawler.last_summary['aborted']
+
+        assert crawler.db.get_data_generation() == generation
+        assert [c.club_name for c in crawler.db.get_clubs(semester_id)] == ["圍棋", "直排輪"]
+
+
+def test_cached_semester_skips_network():
+    with tempfile.TemporaryDirectory() as tmp:
+        session = FakeSession()
+        crawler = _crawler(tmp, session)
+        semester_id, updated = crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True)
+        assert updated
+
+        # 日曆上仍是網站日期 2026/3/1 所屬的學期：完全不連線
+        current_semester = crawler.db.get_current_semester
+        crawler.db.get_current_semester = lambda: current_semester('2026/5/20')
+        session.requests = 0
+        assert crawler.crawl_all_data(class_id_range=range(1, 4)) == (semester_id, False)
+        assert session.requests == 0
+        assert crawler.last_summary['counters']['network_skipped'] == 1
+
+        # 日曆上已換學期：連線確認網站仍是原學期後，短時間內不再連線
+        crawler.db.get_current_semester = lambda: current_semester('2026/8/20')
+        club_crawler._confirmed_semesters.clear()
+        assert crawler.crawl_all_data(class_id_range=range(1, 4)) == (semester_id, False)
+        assert session.requests == 1
+        assert crawler.crawl_all_data(class_id_range=range(1, 4)) == (semester_id, False)
+        assert session.requests == 1
+
+        # 重新爬取一定連線；頁面與上次發佈時相同則不發佈
+        generation = crawler.db.get_data_generation()
+        assert crawler.crawl_all_data(class_id_range=range(1, 4), refresh=True) == (semester_id, False)
+        assert session.requests > 1
+        assert crawler.last_summary['counters']['unchanged'] == 1
+        assert crawler.db.get_data_generation() == generation
+
+        # 強制更新一定重新發佈（例如修正解析程式後）
+        assert crawler.crawl_all_data(class_id_range=range(1, 4), force_update=True) == (semester_id, True)
+        assert crawler.db.get_data_generation() > generation
+
+
+def test_refresh_after_aborted_crawl():
+    with tempfile.TemporaryDirectory() as tmp:
+        session = FakeSession()
+        crawler = _crawler(tmp, session)
+        semester_id, updated = crawler.crawl_all_data(class_id_range=range(1, 4), refresh=True)
+        assert updated
+
+        # ClassID 1 的名單改變，但 ClassID 2 持續失敗：中止，已抓到的新頁面仍存入封存
+        session.names[1] = "新學生"
+        session.failures[2] = 100
+        assert crawler.crawl_all_data(class_id_range=range(1, 4), refresh=True) == (semester_id, False)
+        assert crawler.last_summary['aborted']
+        assert crawler.db.search_student("新學生") == []
+
+        # 下次更新與上次「發佈」的頁面比較，而不是與封存中最近抓到的頁面比較
+        session.failures.clear()
+        assert crawler.crawl_all_data(class_id_range=range(1, 4), refresh=True) == (semester_id, True)
+        assert [r.club_number for r in crawler.db.search_student("新學生")] == ["1-1"]
+
+        # 沒有變動時只抓頁面，不解析名單頁、不寫入資料庫
+        assert crawler.crawl_all_data(class_id_range=range(1, 4), refresh=True) == (semester_id, False)
+        assert crawler.last_summary['counters']['unchanged'] == 1
+        assert crawler.last_summary['spans']['parse']['count'] == 1  # 只有 main.asp 的社團列表
+        assert 'db_write' not in crawler.last_summary['spans']
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+測試學校網站登入判斷與 session 保存（不連線學校網站）
+"""
+
+import os
+import tempfile
+
+import school_client
+from requests.cookies import RequestsCookieJar
+from school_client import LoginError, SchoolClient, is_logged_in
+
+LOGIN_FORM = '<form><input name="userid"><input type="password" name="pwd"></form>'
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+        self.encoding = None
+
+
+class FakeSite:
+    """只接受 userid/pwd 欄位的登入頁；登入後設定 ASPSESSIONID"""
+
+    def __init__(self, password='secret'):
+        self.password = password
+        self.cookies = RequestsCookieJar()
+        self.requests = []
+        self.valid_sessions = set()
+
+    def post(self, url, data=None, timeout=None):
+        self.requests.append(('POST', tuple(sorted(data))))
+        if data.get('userid') == 'teacher' and data.get('pwd') == self.password:
+            token = f"s{len(self.requests)}"
+            self.valid_sessions.add(token)
+            self.cookies.set('ASPSESSIONID', token, domain='www2.jkes.tp.edu.tw', path='/')
+            return FakeResponse('<a href="logout.asp">登出</a>')
+        return FakeResponse(LOGIN_FORM)
+
+    def get(self, url, timeout=None):
+        self.requests.append(('GET', url.rsplit('/', 1)[1]))
+        if url.endswith('index.asp'):
+            return FakeResponse(LOGIN_FORM)
+        if self.cookies.get('ASPSESSIONID') not in self.valid_sessions:
+            return FakeResponse(LOGIN_FORM)
+        return FakeResponse('<table>名單</table>')
+
+
+def test_login_detection():
+    assert not is_logged_in(LOGIN_FORM)
+    assert is_logged_in('<a href="logout.asp">登出</a>')
+
+
+def test_bad_credentials():
+    site = FakeSite(password='other')
+    client = SchoolClient('teacher', 'secret', session_file=None, session=site)
+    try:
+        client.login()
+    except LoginError:
+        pass
+    else:
+        raise AssertionError("帳密錯誤時應拋出 LoginError")
+    assert not client.logged_in
+
+
+def test_session_reuse():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.json')
+        site = FakeSite()
+        first = SchoolClient('teacher', 'secret', session_file=path, session=site)
+        first.login()
+        assert first.login_requests == 3  # 首頁 + 兩組欄位各一次 POST（第二組成功）
+        assert oct(os.stat(path).st_mode & 0o777) == '0o600'
+
+        # 沿用保存的 cookies，不送出任何登入請求
+        reused = SchoolClient('teacher', 'secret', session_file=path, session=FakeSite())
+        reused.session.valid_sessions = site.valid_sessions
+        reused.login()
+        assert reused.reused and reused.login_requests == 0
+        assert reused.get('main.asp').text == '<table>名單</table>'
+
+        # session 過期後直接使用記住的欄位，一次 POST 即可
+        original_ttl = school_client.SESSION_TTL
+        school_client.SESSION_TTL = -1
+        try:
+            expired = SchoolClient('teacher', 'secret', session_file=path, session=FakeSite())
+            expired.login()
+        finally:
+            school_client.SESSION_TTL = original_ttl
+        assert not expired.reused and expired.login_requests == 1
+
+
+def test_wrong_password_does_not_reuse_session():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.json')
+        site = FakeSite()
+        SchoolClient('teacher', 'secret', session_file=path, session=site).login()
+
+        # 同帳號但密碼錯誤：不可沿用保存的 session，必須真的登入並失敗
+        intruder = SchoolClient('teacher', 'wrong', session_file=path, session=FakeSite())
+        intruder.session.valid_sessions = site.valid_sessions
+        try:
+            intruder.login()
+        except LoginError:
+            pass
+        else:
+            raise AssertionError("密碼錯誤時不應沿用已保存的 session")
+        assert not intruder.reused and not intruder.logged_in
+        assert intruder.login_requests > 0
+
+        # 密碼錯誤的嘗試不影響正確帳密保存的 session
+        owner = SchoolClient('teacher', 'secret', session_file=path, session=FakeSite())
+        owner.login()
+        assert owner.reused
+
+
+def test_relogin_when_server_dropped_session():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.json')
+        SchoolClient('teacher', 'secret', session_file=path, session=FakeSite()).login()
+
+        # 伺服器已不認得保存的 session，取頁面時重新登入
+        site = FakeSite()
+        client = SchoolClient('teacher', 'secret', session_file=path, session=site)
+        client.login()
+        assert client.reused
+        assert client.get('list.asp?ClassID=1').text == '<table>名單</table>'
+        assert ('POST', ('pwd', 'userid')) in site.requests
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
@@ -3,9 +3,14 @@
 測試學期判斷邏輯
 """
 
+import os
+import tempfile
+
 from club_database import ClubDatabase
 
-db = ClubDatabase()
+# 使用暫存資料庫，不影響 club_data.db
+_tmp = tempfile.TemporaryDirectory()
+db = ClubDatabase(os.path.join(_tmp.name, 'club.db'))
 
 # 測試案例
 test_cases = [
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+測試 SheetsDatabase（使用 FakeGSheetsConnection，不需網路）
+"""
+
+from fake_gsheets import FakeGSheetsConnection, WorksheetNotFound
+from sheets_database import SheetsDatabase
+
+
+def test_round_trip():
+    conn = FakeGSheetsConnection()
+    db = SheetsDatabase(conn=conn)
+
+    semester_id = db.get_or_create_semester("2026/3/1")
+    assert db.get_or_create_semester("2026/3/1") == semester_id
+    assert not db.is_semester_cached(semester_id)
+
+    club_id = db.save_club(semester_id, 1, "1-1", "創意DIY手作A班")
+    db.save_student(club_id, "黃語涵", "112136", "3年3班", "16")
+
+    assert db.is_semester_cached(semester_id)
+    assert db.get_current_semester("2026/5/1").id == semester_id
+    assert db.get_current_semester("2026/9/1") is None
+
+    results = db.search_student("黃語涵")
+    assert len(results) == 1
+    assert results[0]['semester'] == "114下"
+    assert results[0]['club_name'] == "創意DIY手作A班"
+    assert db.search_student("黃語涵", grade="1年1班") == []
+
+
+def test_publish_staging():
+    conn = FakeGSheetsConnection()
+    db = SheetsDatabase(conn=conn)
+    semester_id = db.get_or_create_semester("2026/3/1")
+
+    # 每次寫入工作表後，所有學生的社團都必須存在
+    update = conn.update
+
+    def checked_update(worksheet=None, data=None, **kwargs):
+        result = update(worksheet=worksheet, data=data, **kwargs)
+        if worksheet in ("clubs", "students"):
+            club_ids = set(conn.read(worksheet="clubs")['id'])
+            assert set(conn.read(worksheet="students")['club_id']) <= club_ids
+        return result
+
+    conn.update = checked_update
+
+    for club_number, updates in (("1-1", 3), ("1-2", 4)):
+        run_id = db.begin_staging(semester_id)
+        db.stage_club(run_id, 1, club_number, "社團", [("黃語涵", "112136", "3年3班", "16")])
+        conn.reset_stats()
+        assert db.publish_staging(run_id) == (1, 1)
+
+        # 學期時間戳另外讀寫 semesters；取代舊資料時 clubs 多寫一次以移除舊社團
+        assert conn.stats()['updates'] == updates
+
+    assert [r['club_number'] for r in db.search_student("黃語涵")] == ["1-2"]
+    assert [c['club_number'] for c in db.get_clubs(semester_id)] == ["1-2"]
+
+    # 同一個 ClassID 再次暫存時取代先前的名單
+    run_id = db.begin_staging(semester_id)
+    db.stage_club(run_id, 1, "1-1", "社團", [("黃語涵", "112136", "3年3班", "16"),
+                                            ("陳胤侖", "113001", "1年5班", "2")])
+    db.stage_club(run_id, 1, "1-1", "社團", [("陳胤侖", "113001", "1年5班", "2")])
+    assert db.publish_staging(run_id) == (1, 1)
+    assert db.search_student("黃語涵") == []
+    assert [r['club_number'] for r in db.search_student("陳胤侖")] == ["1-1"]
+
+
+def test_student_history():
+    db = SheetsDatabase(conn=FakeGSheetsConnection())
+
+    for date, grade in (("2025/9/1", "2年3班"), ("2026/3/1", "2年3班")):
+        run_id = db.begin_staging(db.get_or_create_semester(date))
+        db.stage_club(run_id, 1, "1-1", "社團", [("黃語涵", "112136", grade, "16"),
+                                                 ("黃語涵", "113001", "1年1班", "2")])
+        db.publish_staging(run_id)
+
+    students = db.find_students("黃語涵")
+    assert sorted(s['student_id'] for s in students) == ["112136", "113001"]
+    history = db.get_student_history("112136")
+    assert [h['semester'] for h in history] == ["114下", "114上"]
+
+
+def test_pagination():
+    db = SheetsDatabase(conn=FakeGSheetsConnection())
+    run_id = db.begin_staging(db.get_or_create_semester("2026/3/1"))
+    for class_id in range(1, 6):
+        db.stage_club(run_id, class_id, f"1-{class_id}", "社團", [("黃語涵", "112136", "3年3班", "16")])
+    db.publish_staging(run_id)
+
+    first = db.search_student_page("黃語涵", limit=3)
+    second = db.search_student_page("黃語涵", after=first.next_cursor, limit=3)
+    assert second.next_cursor is None
+    assert first.items + second.items == db.search_student("黃語涵")
+    assert list(db.iter_semesters()) == db.get_all_semesters()
+
+
+def test_club_roster():
+    db = SheetsDatabase(conn=FakeGSheetsConnection())
+    semester_id = db.get_or_create_semester("2026/3/1")
+    run_id = db.begin_staging(semester_id)
+    db.stage_club(run_id, 7, "1-7", "直排輪初階", [("黃語涵", "112136", "3年3班", "16"),
+                                                  ("陳胤侖", "113001", "1年5班", "2")])
+    db.publish_staging(run_id)
+
+    assert [(c.club_number, c.student_count) for c in db.get_clubs(semester_id)] == [("1-7", 2)]
+    roster = db.get_club_roster(semester_id, "1-7")
+    assert [(r.student_name, r.grade_year) for r in roster] == [("黃語涵", 3), ("陳胤侖", 1)]
+
+
+def test_semester_changes():
+    db = SheetsDatabase(conn=FakeGSheetsConnection())
+    fall = db.get_or_create_semester("2025/9/1")
+    spring = db.get_or_create_semester("2026/3/1")
+    for semester_id, clubs in ((fall, [(1, "1-1", "圍棋", [("黃語涵", "112136", "2年3班", "16"),
+                                                         ("林家耀", None, "2年1班", "3")])]),
+                               (spring, [(2, "1-2", "直排輪", [("黃語涵", "112136", "2年3班", "16"),
+                                                              ("陳胤侖", "113001", "1年5班", "2")])])):
+        run_id = db.begin_staging(semester_id)
+        for class_id, number, name, students in clubs:
+            db.stage_club(run_id, class_id, number, name, students)
+        db.publish_staging(run_id)
+
+    changes = db.get_semester_changes(spring)
+    assert [(c.change_type, c.student_name, c.old_clubs, c.new_clubs) for c in changes] == [
+        ("changed", "黃語涵", "1-1", "1-2"), ("dropped", "林家耀", "1-1", None),
+        ("joined", "陳胤侖", None, "1-2")]
+    assert db.get_change_summary(spring) == {'previous_semester_id': fall,
+                                             'joined': 1, 'dropped': 1, 'changed': 1}
+    assert db.get_semester_changes(fall) == []
+
+
+def test_club_stats():
+    db = SheetsDatabase(conn=FakeGSheetsConnection())
+    semester_id = db.get_or_create_semester("2026/3/1")
+    run_id = db.begin_staging(semester_id)
+    db.stage_club(run_id, 1, "1-1", "圍棋", [("黃語涵", "112136", "3年3班", "16"),
+                                            ("陳胤侖", "113001", "1年5班", "2"),
+                                            ("林家耀", None, "3年3班", "20")])
+    db.stage_club(run_id, 2, "1-2", "直排輪", [("黃語涵", "112136", "3年3班", "16")])
+    db.publish_staging(run_id)
+
+    assert [(s.club_number, s.grade_year, s.student_count) for s in db.get_club_grade_stats(semester_id)] == [
+        ("1-1", 1, 1), ("1-1", 3, 2), ("1-2", 3, 1)]
+    assert [(p.grade_year, p.class_num, p.participants, p.enrollments, p.max_seat_number)
+            for p in db.get_class_participation(semester_id)] == [(1, 5, 1, 1, 2), (3, 3, 2, 3, 20)]
+
+
+def test_call_counting():
+    conn = FakeGSheetsConnection(latency=0.5)
+    db = SheetsDatabase(conn=conn)
+
+    db.get_all_semesters()
+    stats = conn.stats()
+    assert stats['reads'] == 1
+    assert stats['updates'] == 0
+    assert stats['simulated_seconds'] == 0.5
+
+    conn.reset_stats()
+    assert conn.stats()['total_calls'] == 0
+
+
+def test_missing_worksheet():
+    conn = FakeGSheetsConnection(worksheets={})
+    try:
+        conn.read(worksheet="students")
+    except WorksheetNotFound:
+        pass
+    else:
+        raise AssertionError("應該拋出 WorksheetNotFound")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+測試唯讀資料庫快照的發佈、指標切換與快照查詢（使用暫存資料庫）
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import snapshots
+from club_database import ClubDatabase
+from snapshots import SnapshotDatabase, current_snapshot, open_snapshot, publish_snapshot
+
+
+def _publish_club(db, semester_id, class_id, club_number):
+    run_id = db.begin_staging(semester_id)
+    db.stage_club(run_id, class_id, club_number, f"社團{club_number}", [("黃語涵", "112136", "3年3班", "16")])
+    db.publish_staging(run_id)
+
+
+def test_publish_and_switch_snapshots():
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_dir = os.path.join(tmp, 'snapshots')
+        db = ClubDatabase(os.path.join(tmp, 'club.db'))
+        semester_id = db.get_or_create_semester("2026/3/1")
+        _publish_club(db, semester_id, 1, "1-1")
+
+        path = publish_snapshot(db.db_path, snapshot_dir)
+        assert current_snapshot(snapshot_dir) == path
+        assert os.path.basename(path) == f"club-g{db.get_data_generation()}.db"
+
+        reader = SnapshotDatabase(db.db_path, snapshot_dir)
+        assert [r.club_number for r in reader.search_student("黃語涵")] == ["1-1"]
+        assert reader.get_data_generation() == db.get_data_generation()
+
+        # 快照為唯讀
+        conn = open_snapshot(path)
+        try:
+            conn.execute("DELETE FROM clubs")
+        except sqlite3.OperationalError:
+            pass
+        else:
+            raise AssertionError("快照應為唯讀")
+        finally:
+            conn.close()
+
+        # 主資料庫更新後，發佈新快照前讀取端仍看到舊版本
+        _publish_club(db, semester_id, 2, "1-2")
+        assert [r.club_number for r in reader.search_student("黃語涵")] == ["1-1"]
+
+        publish_snapshot(db.db_path, snapshot_dir)
+        assert [r.club_number for r in reader.search_student("黃語涵")] == ["1-2"]
+        assert reader.get_data_generation() == db.get_data_generation()
+
+
+def test_publish_staging_publishes_snapshot():
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_dir = os.path.join(tmp, 'snapshots')
+        os.environ['JKES_SNAPSHOT_DIR'] = snapshot_dir
+        try:
+            db = ClubDatabase(os.path.join(tmp, 'club.db'))
+            semester_id = db.get_or_create_semester("2026/3/1")
+            for class_id in range(1, 6):
+                _publish_club(db, semester_id, class_id, f"1-{class_id}")
+                assert current_snapshot(snapshot_dir).endswith(f"club-g{db.get_data_generation()}.db")
+        finally:
+            del os.environ['JKES_SNAPSHOT_DIR']
+
+        # 只保留最近的快照
+        kept = [name for name in os.listdir(snapshot_dir) if name.endswith('.db')]
+        assert len(kept) == snapshots.KEEP_SNAPSHOTS
+
+
+def test_reader_requires_snapshot():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ClubDatabase(os.path.join(tmp, 'club.db'))
+        try:
+            SnapshotDatabase(db.db_path, os.path.join(tmp, 'snapshots'))
+        except FileNotFoundError:
+            pass
+        else:
+            raise AssertionError("沒有快照時應拋出 FileNotFoundError")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("✅ 所有測試通過！")